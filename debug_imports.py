@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
 qa_chain.py의 import 문제 진단 스크립트
+(임포트 속도는 python -m src.preprocessing.import_budget 으로 진입점별로 측정합니다.)
 """
 
 print("🔍 qa_chain.py import 문제 진단 시작!")
@@ -1,19 +1,11 @@
 import streamlit as st
 from langchain_core.messages.chat import ChatMessage
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import load_prompt
-from langchain_teddynote.prompts import load_prompt
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
 from langchain.memory import ConversationSummaryBufferMemory
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_teddynote import logging
 from dotenv import load_dotenv
 import os
-import pickle
-import yaml
+
+from src.preprocessing.rag_engine import get_engine
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 1. 환경 변수 및 로깅 설정
@@ -238,54 +230,22 @@ def add_message(role: str, content: str):
 # ─────────────────────────────────────────────────────────────────────────────
 # 5. HR Documents → FAISS Retriever 생성 (무거운 작업 캐시)
 # ─────────────────────────────────────────────────────────────────────────────
-@st.cache_resource(show_spinner="HR 문서를 처리중입니다...")
 def create_retriever():
-    """기존에 전처리된 documents.pkl에서 FAISS 검색기를 생성합니다."""
+    """공용 RagEngine의 FAISS 인덱스로 검색기를 생성합니다. (인덱스는 프로세스당 한 번만 구축)"""
     
     try:
-        # 1) 전처리된 문서 로드
-        documents_path = os.path.join("data", "processed", "documents.pkl")
-        
-        if not os.path.exists(documents_path):
-            st.error(f"❌ 문서 파일을 찾을 수 없습니다: {documents_path}")
-            return None
-            
-        with open(documents_path, 'rb') as f:
-            documents = pickle.load(f)
-        
-        st.info(f"✅ {len(documents)}개의 HR 문서를 로드했습니다.")
-        
-        # 2) 텍스트 분할 (임베딩 최적화를 위한 청크 생성)
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500, 
-            chunk_overlap=100
-        )
-        split_docs = splitter.split_documents(documents)
-        
-        st.info(f"✅ 문서를 {len(split_docs)}개의 청크로 분할했습니다.")
-        
-        # 3) 임베딩 생성 (OpenAI)
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        
-        if openai_api_key:
-            embeddings = OpenAIEmbeddings()
-            st.info("✅ OpenAI 임베딩을 사용합니다.")
-        else:
+        if not os.getenv("OPENAI_API_KEY"):
             st.error("❌ API 키가 설정되지 않았습니다.")
             return None
         
-        # 4) FAISS 인덱스 생성
-        vectorstore = FAISS.from_documents(
-            documents=split_docs,
-            embedding=embeddings
-        )
-        
-        # 5) 검색기(retriever)로 변환
-        retriever = vectorstore.as_retriever(search_kwargs={"k": k})
-        
-        st.success("✅ FAISS 검색기 생성 완료!")
+        engine = get_engine()
+        engine.load_index()  # 공용 인덱스 최초 1회 로드 (이후 세션은 재사용)
+        retriever = engine.as_retriever(k)
         return retriever
         
+    except FileNotFoundError:
+        st.error(f"❌ 문서 파일을 찾을 수 없습니다: {os.path.join('data', 'processed', 'documents.pkl')}")
+        return None
     except Exception as e:
         st.error(f"❌ 검색기 생성 중 오류: {str(e)}")
         return None
@@ -294,66 +254,28 @@ def create_retriever():
 # 6. LangChain RAG 체인 생성 함수
 # ─────────────────────────────────────────────────────────────────────────────
 def create_chain(retriever, model="gpt-3.5-turbo"):
-    """RAG 체인을 생성합니다."""
+    """
+    RAG 체인을 생성합니다. (공용 RagEngine의 프롬프트/LLM 사용)
+    retriever/model은 기본값이며, 실행 시 k와 model을 넘기면 체인을 다시 만들지 않고 요청마다 적용됩니다.
+    """
     
     try:
-        # 1) 프롬프트 생성 (YAML 파일에서 로드)
-        from langchain_core.prompts import ChatPromptTemplate
+        engine = get_engine()
         
-        # YAML 파일에서 프롬프트 템플릿 로드
-        prompt_path = "src/prompt/qa_prompt.yaml"
-        try:
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                prompt_config = yaml.safe_load(f)
-                template = prompt_config['qa_template']
-        except FileNotFoundError:
-            st.error(f"❌ 프롬프트 파일을 찾을 수 없습니다: {prompt_path}")
-            return None
-        except Exception as e:
-            st.error(f"❌ 프롬프트 파일 로드 실패: {e}")
+        # 1) 프롬프트 로드 확인 (src/prompt/qa_prompt.yaml, 프로세스당 한 번만 컴파일)
+        if engine.prompt is None:
             return None
-
-        prompt = ChatPromptTemplate.from_template(template)
         
-        # 2) LLM 생성 (temperature 고정: 0)
-        if model.startswith("gpt"):
-            llm = ChatOpenAI(
-                model=model, 
-                temperature=0,
-                streaming=True  # 스트리밍 활성화
-            )
-        elif model.startswith("claude"):
-            from langchain_anthropic import ChatAnthropic
-            llm = ChatAnthropic(
-                model=model,
-                temperature=0,
-                streaming=True  # 스트리밍 활성화
-            )
-        else:
-            llm = ChatOpenAI(
-                model="gpt-3.5-turbo", 
-                temperature=0,
-                streaming=True
-            )
-        
-        # 3) 문서 포맷팅 함수
-        def format_docs(docs):
-            if not docs:
-                return "관련 문서를 찾을 수 없습니다."
-            
-            formatted_docs = []
-            for i, doc in enumerate(docs, 1):
-                source = doc.metadata.get('source', '알 수 없음')
-                source_type = doc.metadata.get('source_type', '알 수 없음')
-                doc_info = f"[문서 {i}] ({source}, {source_type})\n{doc.page_content}\n"
-                formatted_docs.append(doc_info)
-            
-            return "\n".join(formatted_docs)
+        # 2) LLM 선택 (temperature 고정: 0, 프로세스 공용 LLM 풀에서 재사용)
+        def get_llm(model_name):
+            if not (model_name.startswith("gpt") or model_name.startswith("claude")):
+                model_name = "gpt-3.5-turbo"
+            return engine.get_llm(model_name, temperature=0, streaming=True)
         
-        # 4) Memory 생성 (토큰 제한으로 자동 요약)
+        # 3) Memory 생성 (토큰 제한으로 자동 요약)
         if "conversation_memory" not in st.session_state:
             st.session_state.conversation_memory = ConversationSummaryBufferMemory(
-                llm=llm,  # 요약을 위한 LLM
+                llm=get_llm(model),  # 요약을 위한 LLM
                 max_token_limit=1000,  # 1000 토큰 초과 시 요약
                 memory_key="chat_history",
                 return_messages=True
@@ -361,33 +283,21 @@ def create_chain(retriever, model="gpt-3.5-turbo"):
         
         memory = st.session_state.conversation_memory
         
-        # 5) Chain 생성 (메모리 + 스트리밍 지원)
-        def run_chain_with_memory(question):
-            """메모리를 활용한 체인 실행 (스트리밍 지원)"""
+        # 4) Chain 생성 (메모리 + 스트리밍 지원)
+        def run_chain_with_memory(question, k=None, model_name=None):
+            """메모리를 활용한 체인 실행 (스트리밍 지원, k/model_name은 요청별 설정)"""
+            llm = get_llm(model_name or model)
             
             # 현재 대화 히스토리 가져오기
             chat_history_data = memory.load_memory_variables({})
-            chat_history = chat_history_data.get("chat_history", "이전 대화 내용이 없습니다.")
-            
-            # 메시지 리스트를 문자열로 변환
-            if isinstance(chat_history, list):
-                formatted_history = []
-                for msg in chat_history:
-                    if hasattr(msg, 'content'):
-                        role = "사용자" if msg.__class__.__name__ == "HumanMessage" else "AI"
-                        formatted_history.append(f"{role}: {msg.content}")
-                chat_history = "\n".join(formatted_history) or "이전 대화 내용이 없습니다."
+            chat_history = chat_history_data.get("chat_history")
             
             # 컨텍스트 검색
-            docs = retriever.get_relevant_documents(question)
-            context = format_docs(docs)
+            docs = engine.retrieve(question, k) if k else retriever.invoke(question)
+            context = engine.format_context(docs)
             
             # 프롬프트 포맷팅 (chat_history 포함)
-            formatted_prompt = prompt.format(
-                chat_history=chat_history,
-                context=context,
-                question=question
-            )
+            formatted_prompt = engine.build_messages(question, context, chat_history)
             
             return llm, formatted_prompt, memory, question
         
@@ -476,7 +386,7 @@ if user_input:
                 ai_answer = ""
                 
                 # Chain 함수 실행하여 LLM, 프롬프트, 메모리 가져오기
-                llm, formatted_prompt, memory, question = chain_func(user_input)
+                llm, formatted_prompt, memory, question = chain_func(user_input, k=k, model_name=selected_model)
                 
                 # 스트리밍 응답
                 for token in llm.stream(formatted_prompt):
@@ -4,11 +4,15 @@ HR 데이터 전처리 실행 스크립트
 
 사용법:
     python run_preprocessing.py
+    python run_preprocessing.py --profile   # cProfile 덤프(documents.ingest.prof)도 저장
+    python run_preprocessing.py --tenant acme   # data/tenants/acme → data/processed/tenants/acme/documents.pkl
+    python run_preprocessing.py --watch     # 입력 폴더 감시: 새/변경 파일만 증분 색인 후 인덱스 새 버전 게시
 
 기능:
     - 01. consultations/output 폴더의 모든 문서 파일 처리
     - Excel (.xlsx, .xls), CSV, PDF, Word (.docx) 파일 지원
     - 처리된 결과를 data/processed/documents.pkl로 저장
+    - 파일별/단계별 소요 시간 리포트를 data/processed/documents.ingest_report.json으로 저장
 """
 
 import sys
@@ -20,16 +24,29 @@ sys.path.insert(0, current_dir)
 
 # 메인 전처리 모듈 임포트 및 실행
 if __name__ == "__main__":
+    if "--watch" in sys.argv:
+        # 감시 모드 (--tenant, --interval, --debounce, --embedding-provider, --once 지원)
+        from src.preprocessing.watcher import main as watch_main
+        watch_main([arg for arg in sys.argv[1:] if arg != "--watch"])
+        sys.exit(0)
+
     try:
         from src.preprocessing.main_preprocessor import (
             run_preprocessing_pipeline,
             save_documents_to_pickle,
             preview_documents
         )
+        from src.preprocessing.ingest_report import IngestionReport, profile_call, report_path_for
         
-        # 경로 설정
+        # 경로 설정 (--tenant가 주어지면 고객사별 입력 폴더/출력 파일 사용)
         raw_data_path = os.path.join(current_dir, '01. consultations', 'output')
         output_path = os.path.join(current_dir, 'data', 'processed', 'documents.pkl')
+        if "--tenant" in sys.argv:
+            from src.preprocessing.tenants import tenant_documents_path, tenant_raw_dir, validate_tenant
+            tenant = validate_tenant(sys.argv[sys.argv.index("--tenant") + 1])
+            raw_data_path = tenant_raw_dir(tenant)
+            output_path = tenant_documents_path(tenant)
+            print(f"🏢 테넌트: {tenant}")
         
         print("🚀 HR 데이터 전처리 시작!")
         print(f"📂 입력 경로: {raw_data_path}")
@@ -42,8 +59,14 @@ if __name__ == "__main__":
             print("'01. consultations/output' 폴더가 있는지 확인해주세요.")
             sys.exit(1)
         
-        # 전처리 실행
-        processed_docs = run_preprocessing_pipeline(raw_data_dir=raw_data_path)
+        # 전처리 실행 (파일별/단계별 프로파일링 리포트 기록)
+        report = IngestionReport(raw_data_path)
+        if "--profile" in sys.argv:
+            prof_path = os.path.splitext(output_path)[0] + ".ingest.prof"
+            processed_docs = profile_call(run_preprocessing_pipeline, prof_path, raw_data_path, report=report)
+        else:
+            processed_docs = run_preprocessing_pipeline(raw_data_dir=raw_data_path, report=report)
+        report.save(report_path_for(output_path))
         
         if processed_docs:
             # 결과 저장
@@ -0,0 +1,337 @@
+# src/preprocessing/adaptive_k.py
+"""
+적응형 검색 수(adaptive k)
+
+고정 k 대신 후보 청크를 점수와 함께 max_k개 가져온 뒤, 앞에서부터 차례로 넣다가
+    - 관련도가 score_threshold보다 낮아지거나
+    - 바로 앞 청크와의 관련도 차이가 score_gap보다 커지거나 (점수 절벽)
+    - 누적 토큰 수가 token_budget을 넘으면
+거기서 자릅니다. (min_k개는 항상 포함) 정답이 뚜렷한 질문은 1~2개, 애매한 질문은 더 많은 청크가 들어가
+평균 프롬프트 크기가 줄어듭니다.
+
+관련도는 코사인 유사도입니다. (정규화된 임베딩 기준, FAISS L2 거리² d → 1 - d / 2)
+임계값은 임베딩 모델마다 점수 분포가 달라 calibrate 명령으로 벤치마크 라벨 데이터에서 고르고,
+data/processed/adaptive_k.json에 임베딩 설정별로 저장합니다. (보정 전에는 DEFAULT_POLICY 사용)
+
+사용법:
+    python -m src.preprocessing.adaptive_k --embedding-provider fake --max-k 8 --baseline-k 3
+    python -m src.preprocessing.adaptive_k --embedding-provider openai --query-field summary --dry-run
+"""
+import json
+import os
+import sys
+import threading
+from dataclasses import asdict, dataclass, replace
+from itertools import product
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from src.preprocessing.corpus import estimate_tokens
+from src.preprocessing.rag_engine import PROJECT_ROOT, RagConfig, RagEngine
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+    from src.preprocessing.parent_store import ParentStore
+
+DEFAULT_ADAPTIVE_K_PATH = os.path.join(PROJECT_ROOT, 'data', 'processed', 'adaptive_k.json')
+
+# 보정 격자 (None = 해당 조건 사용 안 함). 임계값 후보는 관측된 점수 분포의 백분위수에서 고릅니다.
+GAP_GRID = (None, 0.02, 0.05, 0.08, 0.12, 0.2)
+BUDGET_GRID = (None, 400, 600, 800, 1200, 1600)
+THRESHOLD_PERCENTILES = (0, 10, 20, 30, 40, 50, 60, 70, 80)
+
+
+@dataclass(frozen=True)
+class AdaptiveK:
+    """
+    적응형 검색 수 정책.
+
+    Attributes:
+        min_k (int): 항상 포함할 최소 청크 수
+        max_k (int): 후보로 가져올 최대 청크 수
+        score_threshold (float): 이 관련도(코사인 유사도) 미만의 청크는 제외 (None이면 사용 안 함)
+        score_gap (float): 앞 청크보다 관련도가 이만큼 넘게 떨어지면 그 뒤는 제외 (None이면 사용 안 함)
+        token_budget (int): 컨텍스트에 넣을 청크의 누적 토큰 상한 (None이면 사용 안 함)
+    """
+    min_k: int = 1
+    max_k: int = 6
+    score_threshold: Optional[float] = 0.3
+    score_gap: Optional[float] = 0.08
+    token_budget: Optional[int] = 1200
+
+    def with_max_k(self, max_k: Optional[int]) -> "AdaptiveK":
+        """max_k만 바꾼 정책 (사이드바의 검색 문서 수를 최대값으로 사용)."""
+        if not max_k or max_k == self.max_k:
+            return self
+        return replace(self, max_k=max_k, min_k=min(self.min_k, max_k))
+
+
+DEFAULT_POLICY = AdaptiveK()
+
+
+def relevance_scores(vectorstore, scored: Sequence[Tuple["Document", float]]) -> List[Tuple["Document", float]]:
+    """
+    FAISS 점수를 관련도(높을수록 관련)로 바꿉니다.
+    L2 인덱스는 거리 제곱을 반환하므로 정규화된 임베딩이면 코사인 유사도 = 1 - d / 2 입니다.
+    """
+    strategy = str(getattr(vectorstore, "distance_strategy", "EUCLIDEAN_DISTANCE")).upper()
+    if "INNER_PRODUCT" in strategy:
+        return [(doc, float(score)) for doc, score in scored]
+    return [(doc, 1.0 - float(score) / 2.0) for doc, score in scored]
+
+
+def cut_index(scores: Sequence[float], tokens: Sequence[int], policy: AdaptiveK) -> Tuple[int, str]:
+    """
+    관련도 내림차순 후보에서 몇 개를 쓸지 정합니다.
+
+    Args:
+        scores (Sequence[float]): 후보 관련도 (내림차순)
+        tokens (Sequence[int]): 후보별 토큰 수 (token_budget을 쓰지 않으면 비워도 됨)
+
+    Returns:
+        Tuple[int, str]: (사용할 개수, 자른 이유 "threshold" | "gap" | "budget" | "max_k")
+    """
+    limit = min(len(scores), policy.max_k)
+    used_tokens = 0
+    for i in range(limit):
+        if policy.token_budget is not None and tokens:
+            used_tokens += tokens[i]
+        if i < policy.min_k:
+            continue
+        if policy.score_threshold is not None and scores[i] < policy.score_threshold:
+            return i, "threshold"
+        if policy.score_gap is not None and scores[i - 1] - scores[i] > policy.score_gap:
+            return i, "gap"
+        if policy.token_budget is not None and used_tokens > policy.token_budget:
+            return i, "budget"
+    return limit, "max_k"
+
+
+def select_documents(scored: Sequence[Tuple["Document", float]], policy: AdaptiveK,
+                     parent_store: Optional["ParentStore"] = None) -> Tuple[List["Document"], Dict[str, Any]]:
+    """
+    점수가 붙은 후보 청크에 정책을 적용합니다.
+    부모 문서 모드이면 청크는 관련도 조건으로 고르고, 부모 문서로 바꾼 뒤 토큰 예산을 적용합니다.
+
+    Args:
+        scored (Sequence[Tuple[Document, float]]): (청크, 관련도) 내림차순
+        parent_store (ParentStore): 부모 문서 모드의 부모 저장소
+
+    Returns:
+        Tuple[List[Document], Dict[str, Any]]: (문서, {"candidates", "chunks", "cut", "top_score", "context_tokens"})
+    """
+    docs = [doc for doc, _ in scored]
+    scores = [score for _, score in scored]
+    if parent_store is None:
+        tokens = [estimate_tokens(doc.page_content) for doc in docs] if policy.token_budget is not None else []
+        count, cut = cut_index(scores, tokens, policy)
+        selected = docs[:count]
+    else:
+        count, cut = cut_index(scores, [], replace(policy, max_k=len(scores), token_budget=None))
+        parents = parent_store.expand(docs[:count], policy.max_k)
+        tokens = [estimate_tokens(doc.page_content) for doc in parents]
+        parent_count, parent_cut = cut_index([1.0] * len(parents), tokens,
+                                             replace(policy, score_threshold=None, score_gap=None))
+        selected = parents[:parent_count]
+        if parent_cut == "budget":
+            cut = parent_cut
+    return selected, {
+        "candidates": len(docs),
+        "chunks": len(selected),
+        "cut": cut,
+        "top_score": round(scores[0], 4) if scores else None,
+        "context_tokens": sum(estimate_tokens(doc.page_content) for doc in selected),
+    }
+
+
+# ── 보정 결과 저장 / 로드 ─────────────────────────────────────────────────────
+def embedding_key(config: RagConfig) -> str:
+    """보정 결과를 구분하는 임베딩 설정 이름 (점수 분포는 임베딩 모델마다 다릅니다)."""
+    return f"{config.embedding_provider}:{config.embedding_model}" if config.embedding_model else config.embedding_provider
+
+
+_policies: Dict[str, Tuple[Any, Dict[str, Any]]] = {}
+_policies_lock = threading.Lock()
+
+
+def load_policy(config: RagConfig, path: str = DEFAULT_ADAPTIVE_K_PATH) -> AdaptiveK:
+    """
+    임베딩 설정에 맞는 보정된 정책을 반환합니다. (파일이 바뀌면 다시 읽음, 없으면 DEFAULT_POLICY)
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return DEFAULT_POLICY
+    with _policies_lock:
+        cached = _policies.get(path)
+        if cached is None or cached[0] != mtime:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    cached = (mtime, json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"경고: 적응형 검색 설정을 읽지 못했습니다 '{path}': {e}")
+                cached = (mtime, {})
+            _policies[path] = cached
+    entry = cached[1].get(embedding_key(config))
+    if not entry:
+        return DEFAULT_POLICY
+    fields = AdaptiveK.__dataclass_fields__
+    return AdaptiveK(**{key: value for key, value in entry["policy"].items() if key in fields})
+
+
+def save_policy(config: RagConfig, policy: AdaptiveK, report: Dict[str, Any], path: str = DEFAULT_ADAPTIVE_K_PATH):
+    """보정된 정책을 임베딩 설정별 항목으로 저장합니다. (다른 임베딩의 항목은 유지)"""
+    data: Dict[str, Any] = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    data[embedding_key(config)] = {"policy": asdict(policy), "calibration": report}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ── 오프라인 보정 ────────────────────────────────────────────────────────────
+def collect_candidates(engine: RagEngine, labeled: List[Dict[str, str]], max_k: int) -> List[Dict[str, Any]]:
+    """
+    라벨 질문마다 후보 max_k개의 관련도, 토큰 수, 정답 청크 순위를 한 번만 구합니다. (이후 격자 탐색은 검색 없이 계산)
+
+    Returns:
+        List[Dict[str, Any]]: [{"scores", "tokens", "rank"(1부터, 없으면 None)}, ...]
+    """
+    samples = []
+    with engine.shared_index.acquire() as vectorstore:
+        for item in labeled:
+            scored = relevance_scores(vectorstore, vectorstore.similarity_search_with_score(item["question"], k=max_k))
+            rank = next((i for i, (doc, _) in enumerate(scored, 1)
+                         if str(doc.metadata.get("column_ID")) == item["relevant_id"]), None)
+            samples.append({
+                "scores": [score for _, score in scored],
+                "tokens": [estimate_tokens(doc.page_content) for doc, _ in scored],
+                "rank": rank,
+            })
+    return samples
+
+
+def evaluate_policy(samples: List[Dict[str, Any]], policy: AdaptiveK) -> Dict[str, float]:
+    """정책의 recall(정답 청크 포함 비율), 평균 청크 수, 평균 컨텍스트 토큰 수."""
+    hits, counts, tokens = 0, [], []
+    for sample in samples:
+        count, _ = cut_index(sample["scores"], sample["tokens"], policy)
+        hits += int(sample["rank"] is not None and sample["rank"] <= count)
+        counts.append(count)
+        tokens.append(sum(sample["tokens"][:count]))
+    total = len(samples) or 1
+    return {
+        "recall": round(hits / total, 4),
+        "avg_k": round(sum(counts) / total, 3),
+        "avg_tokens": round(sum(tokens) / total, 1),
+    }
+
+
+def calibrate(samples: List[Dict[str, Any]], max_k: int, baseline_k: int,
+              tolerance: float = 0.0) -> Dict[str, Any]:
+    """
+    고정 k=baseline_k의 recall에서 tolerance 이내로 떨어지는 정책 중 평균 컨텍스트 토큰이 가장 적은 것을 고릅니다.
+
+    Returns:
+        Dict[str, Any]: policy, baseline(고정 k), adaptive(선택한 정책), candidates(탐색한 정책 수)
+    """
+    fixed = AdaptiveK(min_k=baseline_k, max_k=baseline_k, score_threshold=None, score_gap=None, token_budget=None)
+    baseline = evaluate_policy(samples, fixed)
+    target = baseline["recall"] - tolerance
+
+    all_scores = sorted(score for sample in samples for score in sample["scores"])
+    thresholds = sorted({None, *(
+        round(all_scores[min(len(all_scores) - 1, len(all_scores) * q // 100)], 3)
+        for q in THRESHOLD_PERCENTILES
+    )} if all_scores else {None}, key=lambda value: -1.0 if value is None else value)
+
+    best, best_metrics, tried = None, None, 0
+    for threshold, gap, budget in product(thresholds, GAP_GRID, BUDGET_GRID):
+        policy = AdaptiveK(min_k=1, max_k=max_k, score_threshold=threshold, score_gap=gap, token_budget=budget)
+        metrics = evaluate_policy(samples, policy)
+        tried += 1
+        if metrics["recall"] < target:
+            continue
+        if best is None or (metrics["avg_tokens"], -metrics["recall"]) < (best_metrics["avg_tokens"],
+                                                                          -best_metrics["recall"]):
+            best, best_metrics = policy, metrics
+    if best is None:
+        # 목표 recall을 맞추는 정책이 없으면 조건 없이 max_k개 (고정 k와 같거나 더 높은 recall)
+        best = AdaptiveK(min_k=1, max_k=max_k, score_threshold=None, score_gap=None, token_budget=None)
+        best_metrics = evaluate_policy(samples, best)
+    return {
+        "policy": best,
+        "questions": len(samples),
+        "baseline": {"k": baseline_k, **baseline},
+        "adaptive": best_metrics,
+        "candidates": tried,
+    }
+
+
+def print_calibration(result: Dict[str, Any]):
+    baseline, adaptive, policy = result["baseline"], result["adaptive"], result["policy"]
+    print("\n" + "=" * 70)
+    print(f"🎯 적응형 검색 수 보정 (질문 {result['questions']}개, 정책 {result['candidates']}개 탐색)")
+    print("=" * 70)
+    print(f"{'':<18}{'recall':>10}{'평균 청크':>12}{'평균 토큰':>12}")
+    print(f"{'고정 k=' + str(baseline['k']):<18}{baseline['recall']:>10.3f}{baseline['avg_k']:>12.2f}{baseline['avg_tokens']:>12.1f}")
+    print(f"{'적응형':<18}{adaptive['recall']:>10.3f}{adaptive['avg_k']:>12.2f}{adaptive['avg_tokens']:>12.1f}")
+    if baseline["avg_tokens"]:
+        print(f"평균 컨텍스트 토큰 {(1 - adaptive['avg_tokens'] / baseline['avg_tokens']) * 100:.1f}% 감소")
+    print(f"선택한 정책: max_k={policy.max_k}, 임계값={policy.score_threshold}, "
+          f"점수 차={policy.score_gap}, 토큰 예산={policy.token_budget}")
+    print("=" * 70)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    from src.preprocessing.benchmark import build_labeled_set
+
+    parser = argparse.ArgumentParser(description="적응형 검색 수 임계값 보정 (벤치마크 라벨 데이터 사용)")
+    parser.add_argument("--documents", default=RagConfig().documents_path, help="documents.pkl 경로")
+    parser.add_argument("--embedding-provider", default=RagConfig().embedding_provider,
+                        choices=["openai", "upstage", "fake"])
+    parser.add_argument("--embedding-model", default=None)
+    parser.add_argument("--max-k", type=int, default=DEFAULT_POLICY.max_k, help="후보로 가져올 최대 청크 수")
+    parser.add_argument("--baseline-k", type=int, default=RagConfig().k, help="비교할 고정 k (recall 기준)")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="허용할 recall 감소폭 (예: 0.02)")
+    parser.add_argument("--query-field", default="question", choices=["question", "summary", "keywords"],
+                        help="질문으로 사용할 상담 결과 컬럼")
+    parser.add_argument("--limit", type=int, default=None, help="사용할 질문 수 제한")
+    parser.add_argument("--output", default=DEFAULT_ADAPTIVE_K_PATH, help="보정 결과 저장 경로")
+    parser.add_argument("--dry-run", action="store_true", help="결과만 출력하고 저장하지 않음")
+    args = parser.parse_args(argv)
+
+    # 가짜 임베딩은 인덱스를 메모리에만 구축합니다. (실제 인덱스 디렉토리를 건드리지 않음)
+    config = RagConfig(
+        documents_path=args.documents,
+        embedding_provider=args.embedding_provider,
+        embedding_model=args.embedding_model,
+        **({"index_dir": None} if args.embedding_provider == "fake" else {}),
+    )
+    engine = RagEngine(config)
+    labeled = build_labeled_set(engine.load_documents(), args.limit, args.query_field)
+    if not labeled:
+        print("❌ 라벨 데이터가 없습니다. (ID 컬럼이 있는 상담 결과 행 필요)")
+        return 1
+    print(f"📋 라벨 데이터 {len(labeled)}개 질문")
+
+    samples = collect_candidates(engine, labeled, max(args.max_k, args.baseline_k))
+    result = calibrate(samples, args.max_k, args.baseline_k, args.tolerance)
+    print_calibration(result)
+
+    if not args.dry_run:
+        report = {key: value for key, value in result.items() if key != "policy"}
+        report["query_field"] = args.query_field
+        save_policy(config, result["policy"], report, args.output)
+        print(f"💾 보정 결과 저장: {args.output} [{embedding_key(config)}]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
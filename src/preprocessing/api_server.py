@@ -0,0 +1,472 @@
+# src/preprocessing/api_server.py
+"""
+HR RAG 헤드리스 HTTP API 서버 (asyncio 기반)
+
+Streamlit 없이 사내 포털이나 로드밸런서 뒤에 HR 어시스턴트를 붙이기 위한 서버입니다.
+qa_chain.build_qa_chain()으로 만든 체인을 공용 RagEngine의 인덱스 위에서 실행합니다.
+
+엔드포인트:
+    POST /query          {"question": str, "k": int?}  → {"answer", "sources", "citations", "latency_ms"}
+    POST /query/stream   {"question": str, "k": int?}  → text/event-stream (token / sources / done 이벤트)
+    POST /retrieve       {"question": str, "k": int?}  → {"sources"}
+    GET  /health         → 상태 및 공용 인덱스 정보
+    GET  /metrics        → Prometheus 텍스트 형식 지표 (같은 프로세스의 턴 추적 지표 포함)
+
+동시 처리 수(max_concurrency)를 넘는 요청은 대기열(max_queue)에서 기다리고,
+대기열도 가득 차면 즉시 503을 반환합니다(backpressure). 요청마다 timeout이 적용됩니다.
+/query, /query/stream의 인사/감사/노무 외 질문은 의도 분류기(intent.py)가 대기열에 들어가기 전에
+템플릿으로 바로 답합니다. (응답에 "intent" 포함, sources는 빈 목록)
+
+사용법:
+    python -m src.preprocessing.api_server --port 8000
+    python -m src.preprocessing.api_server --fake      # API 키 없이 가짜 LLM/임베딩으로 실행
+    python -m src.preprocessing.api_server --fake --model "fake:ttft=0.5,tps=50"   # 제공자 속도 흉내
+    python -m src.preprocessing.api_server --no-fast-path   # 모든 질문을 검색/답변 모델로 처리
+    python -m src.preprocessing.api_server --cascade        # 소형 모델 먼저, 필요할 때만 대형 모델 (cascade.py)
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from src.preprocessing.cascade import ModelCascade, get_cascade_stats
+from src.preprocessing.intent import Intent, IntentRouter, get_intent_router
+from src.preprocessing.rag_engine import FAKE_LLM_MODEL, RagConfig, RagEngine, get_engine
+from src.preprocessing.tracing import get_recorder
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+KNOWN_PATHS = ("/query", "/query/stream", "/retrieve", "/health", "/metrics")
+
+# 응답에 포함할 메타데이터 키 (Excel 행의 column_* 전체를 보내지 않도록 제한)
+SOURCE_METADATA_KEYS = ("source", "source_file", "source_type", "sheet_name", "row_index",
+                        "page", "start_index", "column_ID", "chunk_id")
+
+
+@dataclass
+class ServerConfig:
+    """
+    API 서버 설정.
+
+    Attributes:
+        host (str): 바인딩 주소
+        port (int): 포트
+        max_concurrency (int): 동시에 실행할 최대 요청 수
+        max_queue (int): 동시 처리 한도를 넘었을 때 대기할 수 있는 요청 수
+        request_timeout (float): 요청당 제한 시간 (초)
+        max_body_bytes (int): 요청 본문 최대 크기
+        model (str): LLM 모델 이름 (None이면 엔진 설정의 llm_model)
+        temperature (float): LLM temperature (None이면 엔진 설정의 temperature)
+        fast_path (bool): 인사/감사/노무 외 질문을 검색 없이 템플릿으로 답할지
+        cascade (bool): /query, /query/stream을 모델 캐스케이드로 답할지 (model 대신 소형 → 대형 모델)
+    """
+    host: str = "127.0.0.1"
+    port: int = 8000
+    max_concurrency: int = 8
+    max_queue: int = 32
+    request_timeout: float = 60.0
+    max_body_bytes: int = 64 * 1024
+    model: Optional[str] = None
+    temperature: Optional[float] = None
+    fast_path: bool = True
+    cascade: bool = False
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ServerMetrics:
+    """요청 수, 상태 코드, 지연 시간, 거절/타임아웃 수를 집계합니다."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests: Dict[Tuple[str, int], int] = {}
+        self.latency_sum: Dict[str, float] = {}
+        self.latency_count: Dict[str, int] = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def observe(self, path: str, status: int, elapsed: float):
+        self.requests[(path, status)] = self.requests.get((path, status), 0) + 1
+        self.latency_sum[path] = self.latency_sum.get(path, 0.0) + elapsed
+        self.latency_count[path] = self.latency_count.get(path, 0) + 1
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP hr_rag_requests_total 처리된 HTTP 요청 수",
+            "# TYPE hr_rag_requests_total counter",
+        ]
+        for (path, status), count in sorted(self.requests.items()):
+            lines.append(f'hr_rag_requests_total{{path="{path}",status="{status}"}} {count}')
+        lines += [
+            "# HELP hr_rag_request_seconds 요청 처리 시간",
+            "# TYPE hr_rag_request_seconds summary",
+        ]
+        for path in sorted(self.latency_sum):
+            lines.append(f'hr_rag_request_seconds_sum{{path="{path}"}} {self.latency_sum[path]:.6f}')
+            lines.append(f'hr_rag_request_seconds_count{{path="{path}"}} {self.latency_count[path]}')
+        lines += [
+            "# TYPE hr_rag_in_flight gauge", f"hr_rag_in_flight {self.in_flight}",
+            "# TYPE hr_rag_queued gauge", f"hr_rag_queued {self.queued}",
+            "# TYPE hr_rag_rejected_total counter", f"hr_rag_rejected_total {self.rejected}",
+            "# TYPE hr_rag_timeouts_total counter", f"hr_rag_timeouts_total {self.timeouts}",
+            "# TYPE hr_rag_uptime_seconds gauge", f"hr_rag_uptime_seconds {time.time() - self.started_at:.0f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def serialize_document(doc) -> Dict[str, Any]:
+    """Document를 API 응답용 dict로 변환합니다."""
+    metadata = {key: doc.metadata[key] for key in SOURCE_METADATA_KEYS if key in doc.metadata}
+    return {"content": doc.page_content, "metadata": metadata}
+
+
+class RagApiServer:
+    """
+    build_qa_chain() 체인을 asyncio로 서비스하는 HTTP 서버.
+
+    Args:
+        engine (RagEngine): 공용 인덱스와 LLM을 제공하는 엔진
+        config (ServerConfig): 서버 설정
+    """
+
+    def __init__(self, engine: RagEngine, config: Optional[ServerConfig] = None):
+        self.engine = engine
+        self.config = config or ServerConfig()
+        self.metrics = ServerMetrics()
+        self._semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        self._chains: Dict[Optional[int], Any] = {}
+        self.router: Optional[IntentRouter] = None
+        self.cascade: Optional[ModelCascade] = ModelCascade() if self.config.cascade else None
+
+    # ── 체인 ────────────────────────────────────────────────────────────────
+    def get_chain(self, k: Optional[int]):
+        """k별 QA 체인을 한 번만 구축하여 재사용합니다."""
+        chain = self._chains.get(k)
+        if chain is None:
+            from src.preprocessing.qa_chain import build_qa_chain
+
+            llm = self.engine.get_llm(self.config.model, self.config.temperature, streaming=True)
+            model_name = self.config.model or self.engine.config.llm_model
+            chain = build_qa_chain(self.engine.as_retriever(k), llm_model_name=model_name, llm=llm)
+            if chain is None:
+                raise HttpError(500, "QA 체인을 구축할 수 없습니다.")
+            self._chains[k] = chain
+        return chain
+
+    # ── 요청 처리 ─────────────────────────────────────────────────────────────
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        started = time.perf_counter()
+        path, status = "-", 500
+        try:
+            method, path, body = await self._read_request(reader)
+            status = await self._dispatch(method, path, body, writer)
+        except HttpError as e:
+            status = e.status
+            await self._send_json(writer, e.status, {"error": e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            status = 499  # 클라이언트 연결 끊김
+        except Exception as e:
+            status = 500
+            print(f"오류: 요청 처리 중 예외 발생 ({path}): {e}")
+            await self._send_json(writer, 500, {"error": "내부 오류가 발생했습니다."})
+        finally:
+            label = path if path in KNOWN_PATHS else "other"  # 지표 레이블 폭증 방지
+            self.metrics.observe(label, status, time.perf_counter() - started)
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        try:
+            return await self._read_request_parts(reader)
+        except asyncio.TimeoutError:
+            raise HttpError(408, "요청을 제때 받지 못했습니다.")
+
+    async def _read_request_parts(self, reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=10)
+        parts = request_line.decode('latin-1').split()
+        if len(parts) < 2:
+            raise HttpError(400, "잘못된 요청입니다.")
+        method, path = parts[0].upper(), parts[1].split("?", 1)[0]
+
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=10)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = headers.get("content-length", "0") or "0"
+        if not length.isdigit():
+            raise HttpError(400, "Content-Length가 올바르지 않습니다.")
+        length = int(length)
+        if length > self.config.max_body_bytes:
+            raise HttpError(413, "요청 본문이 너무 큽니다.")
+        body = await asyncio.wait_for(reader.readexactly(length), timeout=10) if length else b""
+        return method, path, body
+
+    async def _dispatch(self, method: str, path: str, body: bytes, writer) -> int:
+        if path == "/health" and method == "GET":
+            stats = self.engine.shared_index.stats() if self.engine.shared_index.loaded else None
+            await self._send_json(writer, 200, {"status": "ok", "index": stats,
+                                                "in_flight": self.metrics.in_flight})
+            return 200
+        if path == "/metrics" and method == "GET":
+            text = self.metrics.render_prometheus() + get_recorder().render_prometheus()
+            if self.router is not None:
+                text += self.router.render_prometheus()
+            if self.cascade is not None:
+                text += get_cascade_stats().render_prometheus()
+            await self._send(writer, 200, text.encode('utf-8'),
+                             "text/plain; version=0.0.4; charset=utf-8")
+            return 200
+
+        handlers = {"/query": self._query, "/query/stream": self._query_stream, "/retrieve": self._retrieve}
+        handler = handlers.get(path)
+        if handler is None:
+            raise HttpError(404, f"알 수 없는 경로입니다: {path}")
+        if method != "POST":
+            raise HttpError(405, "POST만 지원합니다.")
+
+        question, k = self._parse_body(body)
+        if self.router is not None and path != "/retrieve":
+            intent = self.router.route(question)
+            if intent.short_circuit:
+                # 동시 처리 슬롯을 쓰지 않고 바로 응답합니다.
+                return await self._fast_answer(intent, path == "/query/stream", writer)
+        async with self._admit():
+            return await handler(question, k, writer)
+
+    def _parse_body(self, body: bytes) -> Tuple[str, Optional[int]]:
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(400, "JSON 본문을 해석할 수 없습니다.")
+        question = str(payload.get("question", "")).strip()
+        if not question:
+            raise HttpError(400, "'question'이 필요합니다.")
+        # k를 주지 않으면 None (엔진 기본값, 적응형이면 보정된 max_k)
+        k = payload.get("k")
+        if k is not None:
+            try:
+                k = max(1, min(int(k), 20))
+            except (TypeError, ValueError):
+                raise HttpError(400, "'k'는 정수여야 합니다.")
+        return question, k
+
+    def _admit(self):
+        """동시 처리 한도 + 대기열 한도를 적용하는 컨텍스트 매니저를 반환합니다."""
+        server = self
+
+        class _Admission:
+            async def __aenter__(self):
+                metrics = server.metrics
+                if metrics.in_flight + metrics.queued >= server.config.max_concurrency + server.config.max_queue:
+                    metrics.rejected += 1
+                    raise HttpError(503, "요청이 많아 잠시 후 다시 시도해주세요.")
+                metrics.queued += 1
+                try:
+                    await server._semaphore.acquire()
+                finally:
+                    metrics.queued -= 1
+                metrics.in_flight += 1
+
+            async def __aexit__(self, exc_type, exc, tb):
+                server.metrics.in_flight -= 1
+                server._semaphore.release()
+
+        return _Admission()
+
+    async def _with_timeout(self, coro):
+        try:
+            return await asyncio.wait_for(coro, timeout=self.config.request_timeout)
+        except asyncio.TimeoutError:
+            self.metrics.timeouts += 1
+            raise HttpError(504, "요청 처리 시간이 초과되었습니다.")
+
+    async def _run_cascade(self, question: str, k: Optional[int], emit) -> Dict[str, Any]:
+        prepared = await self.engine.aprepare_turn(question, k=k)
+        result = await self.cascade.arun(self.engine, prepared, emit)
+        return {**result, "source_documents": prepared["source_documents"]}
+
+    async def _query(self, question: str, k: Optional[int], writer) -> int:
+        started = time.perf_counter()
+        if self.cascade is not None:
+            result = await self._with_timeout(self._run_cascade(question, k, lambda text: None))
+        else:
+            result = await self._with_timeout(self.get_chain(k).ainvoke({"question": question}))
+        await self._send_json(writer, 200, {
+            "answer": result["answer"],
+            "sources": [serialize_document(doc) for doc in result["source_documents"]],
+            "citations": [
+                {key: value for key, value in citation.items() if key != "text"}
+                for citation in self.engine.resolve_citations(result["answer"])
+            ],
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            **({"model": result["model"], "escalated": result["escalated"], "cost_usd": result["cost_usd"]}
+               if self.cascade is not None else {}),
+        })
+        return 200
+
+    async def _fast_answer(self, intent: Intent, stream: bool, writer) -> int:
+        if not stream:
+            await self._send_json(writer, 200, {"answer": intent.answer, "sources": [], "citations": [],
+                                                "intent": intent.label, "latency_ms": 0.0})
+            return 200
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream; charset=utf-8\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        await self._send_event(writer, "token", {"token": intent.answer})
+        await self._send_event(writer, "sources", {"sources": []})
+        await self._send_event(writer, "done", {"intent": intent.label})
+        return 200
+
+    async def _retrieve(self, question: str, k: Optional[int], writer) -> int:
+        docs = await self._with_timeout(self.engine.as_retriever(k).ainvoke(question))
+        await self._send_json(writer, 200, {"sources": [serialize_document(doc) for doc in docs]})
+        return 200
+
+    async def _query_stream(self, question: str, k: Optional[int], writer) -> int:
+        chain = self.get_chain(k)
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream; charset=utf-8\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        await writer.drain()
+
+        async def pump():
+            if self.cascade is not None:
+                # 토큰은 버퍼에 쓰고 다음 이벤트 전송 때 함께 내보냅니다. (emit은 동기 함수)
+                result = await self._run_cascade(
+                    question, k, lambda text: writer.write(self._event_bytes("token", {"token": text}))
+                )
+                await self._send_event(writer, "sources", {
+                    "sources": [serialize_document(doc) for doc in result["source_documents"]]
+                })
+                return
+            async for chunk in chain.astream({"question": question}):
+                if chunk.get("answer"):
+                    await self._send_event(writer, "token", {"token": chunk["answer"]})
+                if "source_documents" in chunk:
+                    await self._send_event(writer, "sources", {
+                        "sources": [serialize_document(doc) for doc in chunk["source_documents"]]
+                    })
+
+        try:
+            await asyncio.wait_for(pump(), timeout=self.config.request_timeout)
+        except asyncio.TimeoutError:
+            self.metrics.timeouts += 1
+            await self._send_event(writer, "error", {"error": "요청 처리 시간이 초과되었습니다."})
+            return 504
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            # 이미 200 헤더를 보냈으므로 HTTP 오류 응답 대신 error 이벤트로 알리고 스트림을 닫습니다.
+            print(f"오류: 스트리밍 중 예외 발생: {e}")
+            try:
+                await self._send_event(writer, "error", {"error": "내부 오류가 발생했습니다."})
+            except ConnectionError:
+                pass
+            return 500
+        await self._send_event(writer, "done", {})
+        return 200
+
+    # ── 응답 전송 ─────────────────────────────────────────────────────────────
+    @staticmethod
+    async def _send(writer, status: int, body: bytes, content_type: str):
+        headers = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        if status == 503:
+            headers.append("Retry-After: 1")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    async def _send_json(self, writer, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        await self._send(writer, status, body, "application/json; charset=utf-8")
+
+    @staticmethod
+    def _event_bytes(event: str, payload: Dict[str, Any]) -> bytes:
+        data = json.dumps(payload, ensure_ascii=False)
+        return f"event: {event}\ndata: {data}\n\n".encode('utf-8')
+
+    @classmethod
+    async def _send_event(cls, writer, event: str, payload: Dict[str, Any]):
+        writer.write(cls._event_bytes(event, payload))
+        await writer.drain()
+
+    # ── 실행 ────────────────────────────────────────────────────────────────
+    async def start(self) -> asyncio.AbstractServer:
+        # 첫 요청이 인덱스 로드를 기다리지 않도록 미리 준비합니다.
+        await asyncio.to_thread(self.engine.load_index)
+        if self.config.fast_path:
+            self.router = await asyncio.to_thread(get_intent_router, self.engine)
+        return await asyncio.start_server(self.handle_connection, self.config.host, self.config.port)
+
+    async def serve_forever(self):
+        server = await self.start()
+        print(f"✅ HR RAG API 서버 시작: http://{self.config.host}:{self.config.port}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HR RAG HTTP API 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model", default="gpt-4o-mini", help="LLM 모델 이름 (--fake와 함께 \"fake:ttft=0.5,tps=50\" 형식 사용 가능)")
+    parser.add_argument("--k", type=int, default=3, help="기본 검색 문서 수")
+    parser.add_argument("--adaptive-k", action="store_true",
+                        help="검색 수를 관련도/토큰 예산으로 자동 결정 (k는 최대값, adaptive_k.json의 보정값 사용)")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=60.0, help="요청당 제한 시간 (초)")
+    parser.add_argument("--fake", action="store_true", help="가짜 LLM/임베딩 사용 (API 키 불필요)")
+    parser.add_argument("--cascade", action="store_true",
+                        help="소형 모델로 먼저 답하고 근거가 약하면 대형 모델로 다시 답함 (--model 대신 사용)")
+    parser.add_argument("--no-fast-path", action="store_true",
+                        help="인사/감사/노무 외 질문도 검색/답변 모델로 처리 (의도 분류 끔)")
+    args = parser.parse_args()
+
+    if args.fake:
+        model = args.model if args.model.startswith("fake") else FAKE_LLM_MODEL
+        rag_config = RagConfig(k=args.k, llm_model=model, embedding_provider="fake", index_dir=None,
+                               adaptive_k=args.adaptive_k)
+    else:
+        rag_config = RagConfig(k=args.k, llm_model=args.model, adaptive_k=args.adaptive_k)
+
+    server_config = ServerConfig(
+        host=args.host, port=args.port, max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue, request_timeout=args.timeout, fast_path=not args.no_fast_path,
+        cascade=args.cascade,
+    )
+    try:
+        asyncio.run(RagApiServer(get_engine(rag_config), server_config).serve_forever())
+    except KeyboardInterrupt:
+        print("\n서버를 종료합니다.")
@@ -0,0 +1,238 @@
+# src/preprocessing/batch_qa.py
+"""
+배치 질의응답 CLI (오프라인 평가 / FAQ 일괄 생성용)
+
+JSONL 또는 CSV 파일의 질문들을 읽어
+1) 질문 임베딩을 배치로 계산하고 FAISS를 행렬 단위로 한 번에 검색한 뒤 (RagEngine.retrieve_batch)
+2) 답변 생성을 chain.abatch로 동시 실행(max_concurrency 제한)하여
+3) 답변, 참조 문서, 토큰 수(프롬프트 캐시 적중 토큰 포함), 지연 시간을 JSONL로 기록합니다.
+
+출력 파일에 이미 기록된 질문 id는 건너뛰므로, 중단된 작업은 같은 명령으로 이어서 실행할 수 있습니다.
+중단으로 잘린 마지막 줄은 이어서 기록하기 전에 잘라 냅니다. 실패한 질문(error 기록)은 다시 실행할 때 재시도되어
+같은 id의 기록이 뒤에 한 번 더 추가되므로, 같은 id가 여러 번 있으면 마지막 기록이 최종 결과입니다.
+
+입력 형식:
+    JSONL: {"id": "q1", "question": "..."}  (id가 없으면 줄 번호 사용)
+    CSV:   id, question 컬럼 (question 컬럼명은 --question-column으로 변경 가능)
+
+사용법:
+    python -m src.preprocessing.batch_qa questions.jsonl answers.jsonl --concurrency 4
+"""
+import asyncio
+import csv
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from langchain_core.runnables import RunnableLambda
+
+from src.preprocessing.rag_engine import RagConfig, RagEngine, get_engine, token_usage
+
+SOURCE_METADATA_KEYS = ("source", "source_file", "source_type", "row_index", "page", "start_index", "column_ID")
+
+
+def load_questions(input_path: str, question_column: str = "question") -> List[Dict[str, str]]:
+    """
+    JSONL/CSV 파일에서 질문 목록을 읽습니다.
+
+    Returns:
+        List[Dict[str, str]]: [{"id": str, "question": str}, ...]
+    """
+    questions = []
+    if input_path.endswith(".csv"):
+        rows = None
+        for encoding in ("utf-8-sig", "cp949", "euc-kr"):
+            try:
+                with open(input_path, 'r', encoding=encoding, newline='') as f:
+                    rows = list(csv.DictReader(f))
+                break
+            except UnicodeDecodeError:
+                continue
+        if rows is None:
+            raise ValueError(f"CSV 파일 인코딩을 판별할 수 없습니다: {input_path}")
+        for i, row in enumerate(rows, 1):
+            question = (row.get(question_column) or "").strip()
+            if question:
+                questions.append({"id": str(row.get("id") or i), "question": question})
+    else:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            for i, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                question = str(item.get(question_column, "")).strip()
+                if question:
+                    questions.append({"id": str(item.get("id", i)), "question": question})
+    return questions
+
+
+def load_completed_ids(output_path: str) -> Set[str]:
+    """이미 답변이 기록된 질문 id를 읽습니다. (마지막 줄이 잘린 경우 무시)"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not record.get("error"):
+                completed.add(str(record.get("id")))
+    return completed
+
+
+def repair_partial_line(output_path: str) -> Optional[str]:
+    """
+    중단으로 개행 없이 끝난 마지막 줄을 정리합니다. (이어서 기록할 새 기록이 그 줄에 붙어 깨지지 않도록)
+    마지막 줄이 완전한 JSON이면 개행만 추가하고, 잘린 줄이면 잘라 냅니다.
+
+    Returns:
+        Optional[str]: "newline" / "truncated" (정리할 것이 없으면 None)
+    """
+    if not os.path.exists(output_path):
+        return None
+    with open(output_path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return None
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return None
+
+        # 마지막 개행 위치를 뒤에서부터 찾습니다.
+        line_start = size
+        while line_start > 0:
+            step = min(65536, line_start)
+            f.seek(line_start - step)
+            index = f.read(step).rfind(b"\n")
+            if index >= 0:
+                line_start = line_start - step + index + 1
+                break
+            line_start -= step
+
+        f.seek(line_start)
+        try:
+            json.loads(f.read().decode('utf-8'))
+        except ValueError:
+            f.truncate(line_start)
+            return "truncated"
+        f.write(b"\n")
+        return "newline"
+
+
+def _source_summary(doc) -> Dict[str, Any]:
+    return {key: doc.metadata[key] for key in SOURCE_METADATA_KEYS if key in doc.metadata}
+
+
+def build_generation_chain(engine: RagEngine, model: Optional[str] = None):
+    """
+    프롬프트 → LLM 체인을 만들고, 항목별 지연 시간을 측정하도록 감쌉니다.
+    입력: {"question", "context"}  출력: {"message", "latency_ms"}
+    """
+    llm = engine.get_llm(model, streaming=False)
+    generation_chain = RunnableLambda(
+        lambda x: engine.build_messages(x["question"], x["context"])
+    ) | llm
+
+    def _generate(inputs):
+        started = time.perf_counter()
+        message = generation_chain.invoke(inputs)
+        return {"message": message, "latency_ms": (time.perf_counter() - started) * 1000}
+
+    async def _agenerate(inputs):
+        started = time.perf_counter()
+        message = await generation_chain.ainvoke(inputs)
+        return {"message": message, "latency_ms": (time.perf_counter() - started) * 1000}
+
+    return RunnableLambda(_generate, afunc=_agenerate)
+
+
+async def run_batch(engine: RagEngine, questions: List[Dict[str, str]], output_path: str,
+                    k: Optional[int] = None, concurrency: int = 4, batch_size: int = 32,
+                    model: Optional[str] = None) -> Dict[str, Any]:
+    """
+    질문들을 batch_size 단위로 검색·생성하고 결과를 output_path에 이어서 기록합니다.
+
+    Returns:
+        Dict[str, Any]: 처리/건너뜀/실패 건수와 총 소요 시간
+    """
+    if repair_partial_line(output_path) == "truncated":
+        print(f"⚠️ 중단으로 잘린 마지막 기록을 제거했습니다: {output_path}")
+    completed = load_completed_ids(output_path)
+    pending = [q for q in questions if q["id"] not in completed]
+    print(f"📋 전체 {len(questions)}개 질문 중 {len(completed)}개 완료, {len(pending)}개 처리 예정")
+
+    chain = build_generation_chain(engine, model)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    summary = {"processed": 0, "skipped": len(questions) - len(pending), "failed": 0}
+    started = time.perf_counter()
+
+    with open(output_path, 'a', encoding='utf-8') as out:
+        for offset in range(0, len(pending), batch_size):
+            batch = pending[offset:offset + batch_size]
+
+            # 1) 배치 검색 (임베딩 1회 호출 + FAISS 행렬 검색 1회)
+            retrieval_started = time.perf_counter()
+            batch_docs = await asyncio.to_thread(engine.retrieve_batch, [q["question"] for q in batch], k)
+            retrieval_ms = (time.perf_counter() - retrieval_started) * 1000 / len(batch)
+
+            # 2) 동시 생성 (max_concurrency 제한)
+            inputs = [
+                {"question": q["question"], "context": engine.format_context(docs)}
+                for q, docs in zip(batch, batch_docs)
+            ]
+            outputs = await chain.abatch(inputs, config={"max_concurrency": concurrency}, return_exceptions=True)
+
+            # 3) 결과 기록 (배치마다 flush하여 중단 시에도 완료분 보존)
+            for q, docs, output in zip(batch, batch_docs, outputs):
+                record = {
+                    "id": q["id"],
+                    "question": q["question"],
+                    "sources": [_source_summary(doc) for doc in docs],
+                    "retrieval_ms": round(retrieval_ms, 1),
+                }
+                if isinstance(output, Exception):
+                    record.update({"answer": None, "error": str(output)})
+                    summary["failed"] += 1
+                else:
+                    record.update({
+                        "answer": output["message"].content,
+                        "latency_ms": round(output["latency_ms"], 1),
+                        **token_usage(output["message"]),
+                    })
+                    summary["processed"] += 1
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            print(f"✅ {min(offset + batch_size, len(pending))}/{len(pending)} 처리 완료")
+
+    summary["elapsed_s"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HR RAG 배치 질의응답")
+    parser.add_argument("input", help="질문 파일 (.jsonl 또는 .csv)")
+    parser.add_argument("output", help="결과 JSONL 파일 (이미 있으면 이어서 실행)")
+    parser.add_argument("--k", type=int, default=3, help="검색할 문서 수")
+    # 기본값은 RagConfig를 따릅니다. (HR_RAG_FAKE=1이면 가짜 LLM/임베딩)
+    parser.add_argument("--model", default=RagConfig().llm_model, help="LLM 모델 이름")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시 생성 요청 수")
+    parser.add_argument("--batch-size", type=int, default=32, help="검색/기록 배치 크기")
+    parser.add_argument("--question-column", default="question", help="질문 컬럼/키 이름")
+    parser.add_argument("--embedding-provider", default=RagConfig().embedding_provider,
+                        choices=["openai", "upstage", "fake"])
+    args = parser.parse_args()
+
+    engine = get_engine(RagConfig(k=args.k, llm_model=args.model, embedding_provider=args.embedding_provider))
+    questions = load_questions(args.input, args.question_column)
+    result = asyncio.run(run_batch(
+        engine, questions, args.output,
+        k=args.k, concurrency=args.concurrency, batch_size=args.batch_size, model=args.model,
+    ))
+    print(f"\n🎯 배치 완료: 처리 {result['processed']}건, 건너뜀 {result['skipped']}건, "
+          f"실패 {result['failed']}건, 소요 {result['elapsed_s']}초")
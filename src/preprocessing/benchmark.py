@@ -0,0 +1,262 @@
+# src/preprocessing/benchmark.py
+"""
+검색 품질 / 지연 시간 벤치마크
+
+*_결과.xlsx 행에서 만든 라벨 데이터(질문 → 해당 상담 행의 청크)로
+설정 조합(청크 크기/겹침, 임베딩 백엔드, 인덱스 종류)별 성능을 비교합니다.
+
+측정 항목:
+    - recall@k: 상위 k개 청크 안에 정답 상담 행의 청크가 포함된 질문 비율
+    - MRR: 정답 행 청크가 처음 등장한 순위의 역수 평균
+    - 검색 지연 시간 p50 / p95 (질문 임베딩 포함, 단건 검색)
+    - 인덱스 구축 시간, 인덱스 크기, 프로세스 RSS
+
+--embedding-provider fake (HashEmbeddings)로 API 키 없이 결정적으로 실행할 수 있습니다.
+
+사용법:
+    python -m src.preprocessing.benchmark --embedding-provider fake \\
+        --chunk-sizes 300,500,800 --overlaps 50,100 --index-types flat,hnsw --output bench.json
+"""
+import json
+import os
+import time
+from itertools import product
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from src.preprocessing.compact_metadata import get_column
+from src.preprocessing.ingest_report import rss_mb
+from src.preprocessing.rag_engine import RagConfig, RagEngine
+
+INDEX_TYPES = ("flat", "hnsw", "ivf")
+
+
+def build_labeled_set(documents: List[Document], limit: Optional[int] = None,
+                      query_field: str = "question") -> List[Dict[str, str]]:
+    """
+    상담 결과 행(column_ID가 있는 Excel 행)으로 라벨 데이터를 만듭니다.
+    정답은 같은 column_ID를 가진 행에서 나온 청크입니다.
+
+    Args:
+        query_field (str): 질문으로 사용할 컬럼. "question"은 원문 질문이 청크에 그대로 들어 있어 쉬운 편이고,
+            "summary"(답변 요약)는 표현이 달라 더 어려운 평가가 됩니다.
+
+    Returns:
+        List[Dict[str, str]]: [{"question": str, "relevant_id": str, "source": str}, ...]
+    """
+    labeled = []
+    for doc in documents:
+        row_id = get_column(doc, "ID")
+        question = get_column(doc, query_field)
+        if row_id and question:
+            labeled.append({
+                "question": str(question).strip(),
+                "relevant_id": str(row_id),
+                "source": doc.metadata.get("source", ""),
+            })
+    return labeled[:limit] if limit else labeled
+
+
+def load_labeled_set_from_raw(raw_data_dir: str, limit: Optional[int] = None,
+                              query_field: str = "question") -> List[Dict[str, str]]:
+    """원본 *_결과.xlsx 파일을 직접 파싱하여 라벨 데이터를 만듭니다."""
+    import glob
+
+    from src.preprocessing.parsers import parse_excel_for_hr_data
+
+    documents = []
+    for file_path in sorted(glob.glob(os.path.join(raw_data_dir, "**", "*_결과.xlsx"), recursive=True)):
+        for item in parse_excel_for_hr_data(file_path):
+            documents.append(Document(page_content=item['text'], metadata=item['metadata']))
+    return build_labeled_set(documents, limit, query_field)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """선형 보간 백분위수 (q: 0~100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def convert_index(vectorstore, index_type: str):
+    """
+    FAISS 벡터 저장소의 인덱스를 지정한 종류로 교체합니다. (벡터 순서와 docstore 매핑은 유지)
+
+    Args:
+        index_type (str): "flat" (기본 IndexFlatL2), "hnsw" (IndexHNSWFlat), "ivf" (IndexIVFFlat)
+    """
+    if index_type == "flat":
+        return vectorstore
+
+    from langchain_community.vectorstores.faiss import dependable_faiss_import
+    faiss = dependable_faiss_import()
+
+    flat_index = vectorstore.index
+    vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+    dim = flat_index.d
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, 32)
+    elif index_type == "ivf":
+        nlist = max(1, int(flat_index.ntotal ** 0.5))
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        index.train(vectors)
+        index.nprobe = max(1, nlist // 4)
+    else:
+        raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type} (가능: {', '.join(INDEX_TYPES)})")
+
+    index.add(vectors)
+    vectorstore.index = index
+    return vectorstore
+
+
+def index_size_bytes(vectorstore) -> int:
+    """직렬화된 FAISS 인덱스 크기 (byte)."""
+    from langchain_community.vectorstores.faiss import dependable_faiss_import
+    return int(dependable_faiss_import().serialize_index(vectorstore.index).nbytes)
+
+
+def evaluate_retrieval(vectorstore, labeled: List[Dict[str, str]], ks: List[int]) -> Dict[str, Any]:
+    """라벨 데이터로 recall@k, MRR, 단건 검색 지연 시간을 측정합니다."""
+    max_k = max(ks)
+    hits = {k: 0 for k in ks}
+    reciprocal_ranks = []
+    latencies_ms = []
+
+    for item in labeled:
+        started = time.perf_counter()
+        docs = vectorstore.similarity_search(item["question"], k=max_k)
+        latencies_ms.append((time.perf_counter() - started) * 1000)
+
+        rank = next(
+            (i for i, doc in enumerate(docs, 1) if str(doc.metadata.get("column_ID")) == item["relevant_id"]),
+            None,
+        )
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        for k in ks:
+            if rank and rank <= k:
+                hits[k] += 1
+
+    total = len(labeled) or 1
+    result = {f"recall@{k}": round(hits[k] / total, 4) for k in ks}
+    result.update({
+        "mrr": round(sum(reciprocal_ranks) / total, 4),
+        "latency_p50_ms": round(percentile(latencies_ms, 50), 3),
+        "latency_p95_ms": round(percentile(latencies_ms, 95), 3),
+    })
+    return result
+
+
+def run_benchmark(base_config: RagConfig, chunk_sizes: List[int], overlaps: List[int],
+                  index_types: List[str], ks: List[int], limit: Optional[int] = None,
+                  labeled: Optional[List[Dict[str, str]]] = None,
+                  query_field: str = "question") -> List[Dict[str, Any]]:
+    """
+    설정 조합마다 인덱스를 새로 구축하고 품질/지연/자원 지표를 측정합니다.
+
+    Returns:
+        List[Dict[str, Any]]: 조합별 결과
+    """
+    results = []
+    for chunk_size, overlap in product(chunk_sizes, overlaps):
+        if overlap >= chunk_size:
+            continue
+
+        engine = RagEngine(RagConfig(
+            documents_path=base_config.documents_path,
+            chunk_size=chunk_size,
+            chunk_overlap=overlap,
+            embedding_provider=base_config.embedding_provider,
+            embedding_model=base_config.embedding_model,
+            index_dir=None,
+        ))
+        documents = engine.load_documents()
+        if labeled is None:
+            labeled = build_labeled_set(documents, limit, query_field)
+            print(f"📋 라벨 데이터 {len(labeled)}개 질문")
+
+        for index_type in index_types:
+            rss_before = rss_mb()
+            started = time.perf_counter()
+            vectorstore = convert_index(engine.build_index(), index_type)
+            build_s = time.perf_counter() - started
+            rss_after = rss_mb()
+
+            row = {
+                "chunk_size": chunk_size,
+                "chunk_overlap": overlap,
+                "embedding": base_config.embedding_model or base_config.embedding_provider,
+                "index_type": index_type,
+                "chunks": vectorstore.index.ntotal,
+                "build_s": round(build_s, 3),
+                "index_mb": round(index_size_bytes(vectorstore) / (1024 * 1024), 3),
+                "rss_mb": round(rss_after, 1) if rss_after is not None else None,
+                "rss_delta_mb": round(rss_after - rss_before, 1) if rss_after is not None else None,
+            }
+            row.update(evaluate_retrieval(vectorstore, labeled, ks))
+            results.append(row)
+            print(f"✅ {row}")
+    return results
+
+
+def print_table(results: List[Dict[str, Any]]):
+    """결과를 비교하기 쉬운 표 형식으로 출력합니다."""
+    if not results:
+        print("결과가 없습니다.")
+        return
+    columns = list(results[0].keys())
+    widths = {c: max(len(c), *(len(str(r.get(c))) for r in results)) for c in columns}
+    print(" | ".join(c.ljust(widths[c]) for c in columns))
+    print("-+-".join("-" * widths[c] for c in columns))
+    for row in results:
+        print(" | ".join(str(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HR RAG 검색 벤치마크")
+    parser.add_argument("--documents", default=RagConfig().documents_path, help="documents.pkl 경로")
+    parser.add_argument("--raw-dir", default=None, help="라벨을 원본 *_결과.xlsx에서 직접 생성할 때의 입력 폴더")
+    parser.add_argument("--embedding-provider", default="fake", choices=["openai", "upstage", "fake"])
+    parser.add_argument("--embedding-model", default=None)
+    parser.add_argument("--chunk-sizes", type=_int_list, default=[500])
+    parser.add_argument("--overlaps", type=_int_list, default=[100])
+    parser.add_argument("--index-types", default="flat", help=f"쉼표 구분 ({', '.join(INDEX_TYPES)})")
+    parser.add_argument("--ks", type=_int_list, default=[1, 3, 5])
+    parser.add_argument("--limit", type=int, default=None, help="평가할 질문 수 제한")
+    parser.add_argument("--query-field", default="question", choices=["question", "summary", "keywords"],
+                        help="질문으로 사용할 상담 결과 컬럼")
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    base = RagConfig(
+        documents_path=args.documents,
+        embedding_provider=args.embedding_provider,
+        embedding_model=args.embedding_model,
+    )
+    labeled_set = (load_labeled_set_from_raw(args.raw_dir, args.limit, args.query_field)
+                   if args.raw_dir else None)
+    benchmark_results = run_benchmark(
+        base, args.chunk_sizes, args.overlaps,
+        [t.strip() for t in args.index_types.split(",") if t.strip()],
+        args.ks, args.limit, labeled_set, args.query_field,
+    )
+
+    print()
+    print_table(benchmark_results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(benchmark_results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 결과 저장: {args.output}")
@@ -0,0 +1,353 @@
+# src/preprocessing/cascade.py
+"""
+모델 캐스케이드 (소형 모델 먼저, 확신이 낮을 때만 대형 모델)
+
+모든 질문을 가장 비싼 모델로 답하는 대신
+    1) 검색 관련도(top_score)가 min_top_score보다 낮으면 → 바로 대형 모델 (어려운 질문)
+    2) 아니면 소형 모델로 초안을 만들고 근거(grounding) 신호를 확인합니다.
+       - 답변 거절 문구("참고 문서에서는 해당 정보를 찾을 수 없습니다")
+       - 인용 [#ID]가 없거나, 참고 문서에 없는 ID를 인용
+       - 답변 단어(글자 2-gram) 중 참고 문서에 나오는 비율(support)이 min_support 미만
+    3) 신호가 모두 괜찮으면 초안을 그대로 답변으로 내보내고, 하나라도 걸리면 대형 모델로 다시 답합니다. (스트리밍)
+초안은 확인이 끝난 뒤 한 번에 표시되므로, 채택되지 않은 초안이 화면에 나왔다가 바뀌는 일은 없습니다.
+대신 첫 토큰은 초안이 끝난 뒤에 나오고, 에스컬레이션하면 초안 시간만큼 더 걸립니다.
+그래서 채팅 앱의 기본 모델은 gpt-4o-mini이고, 캐스케이드는 "자동"을 골랐을 때만 사용합니다.
+
+에스컬레이션 비율, 답변 생성 평균 지연, 답변당 비용은 get_cascade_stats()로 집계합니다. (비용은 MODEL_PRICES 기준)
+
+사용법 (벤치마크 질문으로 캐스케이드와 대형 모델 단독 비교):
+    python -m src.preprocessing.cascade --limit 20
+    HR_RAG_FAKE=1 python -m src.preprocessing.cascade --embedding-provider fake --min-support 0.2
+"""
+import asyncio
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from src.preprocessing.citations import CITATION_PATTERN, extract_citation_ids
+from src.preprocessing.rag_engine import RagConfig, RagEngine, astream_answer, token_usage
+
+if TYPE_CHECKING:
+    from src.preprocessing.tracing import TurnTrace
+
+# 모델별 가격 (USD / 100만 토큰, (입력, 출력)). 날짜가 붙은 모델 이름은 가장 긴 접두사로 찾습니다.
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# 답변 거절 (qa_prompt.yaml 응답 지침 4번의 문구와 그 변형)
+# "…는 규정에 명시되어 있지 않으나 …"처럼 근거 있는 답변에도 나오는 표현은 넣지 않습니다.
+REFUSAL_PATTERN = re.compile(r"(해당 정보를 찾을 수 없|관련 정보를 찾을 수 없|답변드리기 어렵)")
+
+# 에스컬레이션 사유
+LOW_RETRIEVAL = "low_retrieval"
+REFUSAL = "refusal"
+NO_CITATION = "no_citation"
+INVALID_CITATION = "invalid_citation"
+LOW_SUPPORT = "low_support"
+
+
+@dataclass(frozen=True)
+class CascadePolicy:
+    """
+    캐스케이드 설정.
+
+    Attributes:
+        small_model (str): 먼저 답할 소형 모델
+        large_model (str): 에스컬레이션할 대형 모델
+        min_top_score (float): 검색 관련도가 이보다 낮으면 초안 없이 바로 대형 모델 (adaptive_k의 기본 임계값과 같은 척도)
+        min_support (float): 초안의 글자 2-gram 중 참고 문서에 나오는 비율의 최소값
+        require_citation (bool): 참고 문서가 있는데 초안이 아무것도 인용하지 않으면 에스컬레이션
+    """
+    small_model: str = "gpt-4o-mini"
+    large_model: str = "gpt-4o"
+    min_top_score: float = 0.3
+    min_support: float = 0.4
+    require_citation: bool = True
+
+
+DEFAULT_CASCADE = CascadePolicy()
+
+
+def answer_cost(model: str, usage: Dict[str, Any]) -> Optional[float]:
+    """
+    토큰 사용량으로 답변 비용(USD)을 계산합니다.
+
+    Returns:
+        Optional[float]: 가격표에 없는 모델이거나 사용량을 모르면 None
+    """
+    prefix = next((name for name in sorted(MODEL_PRICES, key=len, reverse=True) if (model or "").startswith(name)), None)
+    tokens_in, tokens_out = (usage or {}).get("input_tokens"), (usage or {}).get("output_tokens")
+    if prefix is None or tokens_in is None or tokens_out is None:
+        return None
+    price_in, price_out = MODEL_PRICES[prefix]
+    return round((tokens_in * price_in + tokens_out * price_out) / 1_000_000, 6)
+
+
+def _bigrams(text: str) -> set:
+    words = re.findall(r"[\w가-힣]+", text.lower())
+    return {word[i:i + 2] for word in words for i in range(len(word) - 1)}
+
+
+def grounding_signals(answer: str, context: str) -> Dict[str, Any]:
+    """
+    답변이 참고 문서에 근거하는지 나타내는 신호를 계산합니다. (LLM 호출 없음)
+
+    Args:
+        answer (str): 소형 모델의 초안
+        context (str): 프롬프트에 넣은 참고 문서 텍스트 (format_docs 결과, [#ID] 라벨 포함)
+
+    Returns:
+        Dict[str, Any]: refusal, citations, invalid_citations, support
+    """
+    cited = extract_citation_ids(answer)
+    known = set(extract_citation_ids(context))
+    answer_bigrams = _bigrams(CITATION_PATTERN.sub(" ", answer))
+    support = len(answer_bigrams & _bigrams(context)) / len(answer_bigrams) if answer_bigrams else 0.0
+    return {
+        "refusal": bool(REFUSAL_PATTERN.search(answer)),
+        "citations": len(cited),
+        "invalid_citations": sum(1 for chunk_id in cited if chunk_id not in known),
+        "support": round(support, 3),
+        "context_ids": len(known),
+    }
+
+
+def escalation_reason(policy: CascadePolicy, signals: Dict[str, Any]) -> Optional[str]:
+    """초안 신호로 에스컬레이션 사유를 정합니다. (None이면 초안 채택)"""
+    if signals["refusal"]:
+        return REFUSAL
+    if signals["invalid_citations"]:
+        return INVALID_CITATION
+    if policy.require_citation and signals["context_ids"] and not signals["citations"]:
+        return NO_CITATION
+    if signals["support"] < policy.min_support:
+        return LOW_SUPPORT
+    return None
+
+
+class CascadeStats:
+    """캐스케이드 답변의 에스컬레이션 비율 / 평균 지연 / 답변당 비용 집계. 스레드 안전합니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.answers = 0
+        self.escalated = 0
+        self.reasons: Counter = Counter()
+        self.models: Counter = Counter()
+        self.latency_ms = 0.0
+        self.cost_usd = 0.0
+        self.priced = 0
+
+    def observe(self, model: str, reason: Optional[str], latency_ms: float, cost_usd: Optional[float]):
+        with self._lock:
+            self.answers += 1
+            self.models[model] += 1
+            self.latency_ms += latency_ms
+            if reason is not None:
+                self.escalated += 1
+                self.reasons[reason] += 1
+            if cost_usd is not None:
+                self.cost_usd += cost_usd
+                self.priced += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            answers = self.answers
+            return {
+                "answers": answers,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / answers, 4) if answers else 0.0,
+                "avg_latency_ms": round(self.latency_ms / answers, 1) if answers else 0.0,
+                "avg_cost_usd": round(self.cost_usd / self.priced, 6) if self.priced else None,
+                "reasons": dict(self.reasons),
+                "models": dict(self.models),
+            }
+
+    def render_prometheus(self) -> str:
+        """캐스케이드 지표를 Prometheus 텍스트 형식으로 반환합니다."""
+        with self._lock:
+            lines = ["# TYPE hr_rag_cascade_answers_total counter",
+                     f"hr_rag_cascade_answers_total {self.answers}",
+                     "# TYPE hr_rag_cascade_escalations_total counter"]
+            lines += [f'hr_rag_cascade_escalations_total{{reason="{reason}"}} {count}'
+                      for reason, count in sorted(self.reasons.items())]
+            lines += ["# TYPE hr_rag_cascade_latency_ms_sum counter",
+                      f"hr_rag_cascade_latency_ms_sum {self.latency_ms:.1f}",
+                      "# TYPE hr_rag_cascade_cost_usd_sum counter",
+                      f"hr_rag_cascade_cost_usd_sum {self.cost_usd:.6f}"]
+        return "\n".join(lines) + "\n"
+
+
+_cascade_stats = CascadeStats()
+
+
+def get_cascade_stats() -> CascadeStats:
+    """프로세스 공용 캐스케이드 집계."""
+    return _cascade_stats
+
+
+class ModelCascade:
+    """
+    소형 모델 초안 → 근거 확인 → 필요할 때만 대형 모델.
+
+    Args:
+        policy (CascadePolicy): 모델과 임계값
+        stats (CascadeStats): 결과를 집계할 곳 (None이면 프로세스 공용 집계)
+    """
+
+    def __init__(self, policy: CascadePolicy = DEFAULT_CASCADE, stats: Optional[CascadeStats] = None):
+        self.policy = policy
+        self.stats = stats or get_cascade_stats()
+
+    async def arun(self, engine: RagEngine, prepared: Dict[str, Any], emit: Callable[[str], None],
+                   trace: Optional["TurnTrace"] = None) -> Dict[str, Any]:
+        """
+        준비된 턴(RagEngine.aprepare_turn 결과)에 캐스케이드로 답합니다.
+
+        Args:
+            emit (Callable): 답변 텍스트를 받는 함수 (채택된 초안은 한 번에, 대형 모델 답변은 토큰 단위)
+
+        Returns:
+            Dict[str, Any]: answer, usage, model, escalated, reason, cost_usd, latency_ms
+        """
+        from src.preprocessing.tracing import TurnTrace
+
+        trace = trace or TurnTrace()
+        policy = self.policy
+        started = time.perf_counter()
+        costs: List[Optional[float]] = []
+
+        top_score = (prepared.get("retrieval") or {}).get("top_score")
+        reason = LOW_RETRIEVAL if top_score is not None and top_score < policy.min_top_score else None
+        answer, usage, model = None, {}, policy.small_model
+        if reason is None:
+            small = engine.get_llm(policy.small_model, streaming=False)
+            with trace.span("cascade_draft", model=policy.small_model) as span:
+                response = await small.ainvoke(prepared["messages"])
+                draft, usage = response.content, token_usage(response)
+                signals = grounding_signals(draft, engine.format_context(prepared["source_documents"]))
+                reason = escalation_reason(policy, signals)
+                span.set(tokens_in=usage.get("input_tokens"), tokens_out=usage.get("output_tokens"),
+                         accepted=reason is None, **signals)
+            costs.append(answer_cost(policy.small_model, usage))
+            if reason is None:
+                answer = draft
+                emit(draft)
+
+        if answer is None:
+            model = policy.large_model
+            large = engine.get_llm(policy.large_model, streaming=True)
+            answer, usage = await astream_answer(large, prepared["messages"], emit, trace)
+            costs.append(answer_cost(policy.large_model, usage))
+
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        cost_usd = None if None in costs else round(sum(costs), 6)
+        self.stats.observe(model, reason, latency_ms, cost_usd)
+        trace.set(cascade_model=model, escalated=reason is not None, escalation_reason=reason,
+                  top_score=top_score, cost_usd=cost_usd)
+        return {"answer": answer, "usage": usage, "model": model, "escalated": reason is not None,
+                "reason": reason, "cost_usd": cost_usd, "latency_ms": latency_ms}
+
+
+async def compare(engine: RagEngine, questions: List[str], cascade: ModelCascade,
+                  baseline: bool = True) -> Dict[str, Any]:
+    """
+    질문마다 캐스케이드로 답하고, baseline=True이면 같은 프롬프트를 대형 모델 단독으로도 답해 비교합니다.
+
+    Returns:
+        Dict[str, Any]: cascade(CascadeStats.summary()), baseline(answers, avg_latency_ms, avg_cost_usd)
+    """
+    large_latency, large_costs = [], []
+    for question in questions:
+        prepared = await engine.aprepare_turn(question)
+        await cascade.arun(engine, prepared, lambda text: None)
+        if baseline:
+            started = time.perf_counter()
+            large = engine.get_llm(cascade.policy.large_model, streaming=True)
+            _, usage = await astream_answer(large, prepared["messages"], lambda text: None)
+            large_latency.append((time.perf_counter() - started) * 1000)
+            large_costs.append(answer_cost(cascade.policy.large_model, usage))
+    priced = [cost for cost in large_costs if cost is not None]
+    return {
+        "cascade": cascade.stats.summary(),
+        "baseline": {
+            "answers": len(large_latency),
+            "avg_latency_ms": round(sum(large_latency) / len(large_latency), 1) if large_latency else None,
+            "avg_cost_usd": round(sum(priced) / len(priced), 6) if priced else None,
+        } if baseline else None,
+    }
+
+
+def print_comparison(report: Dict[str, Any], policy: CascadePolicy):
+    cascade, baseline = report["cascade"], report["baseline"]
+
+    def cost(value):
+        return f"${value:.6f}" if value is not None else "-"
+
+    print("\n" + "=" * 70)
+    print(f"🪜 모델 캐스케이드 리포트 ({policy.small_model} → {policy.large_model}, {cascade['answers']}개 질문)")
+    print("=" * 70)
+    print(f"{'항목':<20}{'캐스케이드':>16}{f'{policy.large_model} 단독':>22}")
+    print(f"{'평균 지연 (ms)':<20}{cascade['avg_latency_ms']:>16.1f}"
+          f"{(baseline or {}).get('avg_latency_ms') or 0:>22.1f}")
+    print(f"{'답변당 비용':<20}{cost(cascade['avg_cost_usd']):>16}{cost((baseline or {}).get('avg_cost_usd')):>22}")
+    print(f"에스컬레이션: {cascade['escalated']}/{cascade['answers']} ({cascade['escalation_rate'] * 100:.1f}%)")
+    for reason, count in sorted(cascade["reasons"].items(), key=lambda item: -item[1]):
+        print(f"   - {reason}: {count}")
+    if baseline and cascade["avg_cost_usd"] and baseline["avg_cost_usd"]:
+        saving = 1 - cascade["avg_cost_usd"] / baseline["avg_cost_usd"]
+        print(f"💰 답변당 비용 {abs(saving) * 100:.1f}% {'절감' if saving >= 0 else '증가'}")
+    print("=" * 70)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    from src.preprocessing.benchmark import build_labeled_set
+
+    parser = argparse.ArgumentParser(description="모델 캐스케이드 평가 (벤치마크 질문으로 대형 모델 단독과 비교)")
+    parser.add_argument("--documents", default=RagConfig().documents_path, help="documents.pkl 경로")
+    parser.add_argument("--embedding-provider", default=RagConfig().embedding_provider,
+                        choices=["openai", "upstage", "fake"])
+    parser.add_argument("--k", type=int, default=RagConfig().k, help="검색 문서 수")
+    parser.add_argument("--small-model", default=DEFAULT_CASCADE.small_model)
+    parser.add_argument("--large-model", default=DEFAULT_CASCADE.large_model)
+    parser.add_argument("--min-top-score", type=float, default=DEFAULT_CASCADE.min_top_score)
+    parser.add_argument("--min-support", type=float, default=DEFAULT_CASCADE.min_support)
+    parser.add_argument("--query-field", default="question", choices=["question", "summary", "keywords"],
+                        help="질문으로 사용할 상담 결과 컬럼")
+    parser.add_argument("--limit", type=int, default=20, help="사용할 질문 수")
+    parser.add_argument("--no-baseline", action="store_true", help="대형 모델 단독 답변을 생략 (비용 절약)")
+    args = parser.parse_args(argv)
+
+    # 가짜 임베딩은 인덱스를 메모리에만 구축합니다. (실제 인덱스 디렉토리를 건드리지 않음)
+    config = RagConfig(
+        documents_path=args.documents,
+        embedding_provider=args.embedding_provider,
+        k=args.k,
+        **({"index_dir": None} if args.embedding_provider == "fake" else {}),
+    )
+    engine = RagEngine(config)
+    labeled = build_labeled_set(engine.load_documents(), args.limit, args.query_field)
+    if not labeled:
+        print("❌ 라벨 데이터가 없습니다. (ID 컬럼이 있는 상담 결과 행 필요)")
+        return 1
+
+    policy = CascadePolicy(small_model=args.small_model, large_model=args.large_model,
+                           min_top_score=args.min_top_score, min_support=args.min_support)
+    cascade = ModelCascade(policy, CascadeStats())
+    report = asyncio.run(compare(engine, [item["question"] for item in labeled], cascade,
+                                 baseline=not args.no_baseline))
+    print_comparison(report, policy)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# src/preprocessing/citations.py
+"""
+답변 인용(citation) 지원
+
+- 인덱스 구축 시 모든 청크에 안정적인 chunk_id를 부여합니다. (원본 파일/행·페이지/start_index/내용 해시 기반,
+  같은 문서로 다시 구축하면 같은 ID) FAISS docstore의 ID도 chunk_id를 그대로 사용합니다.
+- 프롬프트의 참고 문서는 "[#chunk_id]"로 라벨링되고, 모델은 근거 문장 끝에 같은 형식으로 인용합니다.
+- LocationTable은 인덱스 버전마다 한 번 만들어지는 chunk_id → 위치(파일/페이지/행/시트/start_index) 표로,
+  답변의 인용을 추가 검색 없이 O(1)로 출처에 대응시킵니다. (저장된 이전 답변의 인용도 그대로 해석)
+- 부모 문서 모드에서는 참고 문서가 자식 청크가 아닌 부모 문서 전체이므로 "[#p<parent_id>]"로 라벨링하고,
+  위치 표도 부모 ID를 부모의 위치로 해석합니다. (parent_id는 인덱스 버전 안에서만 유효)
+"""
+import hashlib
+import os
+import re
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+CHUNK_ID_KEY = "chunk_id"
+CHUNK_ID_LENGTH = 10
+PARENT_CITATION_PREFIX = "p"
+CITATION_PATTERN = re.compile(r"\[#([0-9a-f]{%d}|%s\d+)\]" % (CHUNK_ID_LENGTH, PARENT_CITATION_PREFIX))
+
+
+def make_chunk_id(doc: "Document", salt: int = 0) -> str:
+    """청크의 출처 위치와 내용으로 안정적인 ID를 만듭니다."""
+    metadata = doc.metadata
+    key = "|".join(str(part) for part in (
+        metadata.get("source_file") or metadata.get("source"),
+        metadata.get("sheet_name"),
+        metadata.get("row_index"),
+        metadata.get("page"),
+        metadata.get("start_index"),
+        hashlib.sha1(doc.page_content.encode('utf-8')).hexdigest(),
+        salt,
+    ))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:CHUNK_ID_LENGTH]
+
+
+def parent_citation_id(parent_id: int) -> str:
+    """부모 문서의 인용 ID (예: 12 → "p12")."""
+    return f"{PARENT_CITATION_PREFIX}{parent_id}"
+
+
+def is_parent_citation(citation_id: str) -> bool:
+    return citation_id.startswith(PARENT_CITATION_PREFIX)
+
+
+def assign_chunk_ids(chunks: List["Document"], existing: Iterable[str] = ()) -> List[str]:
+    """
+    청크마다 metadata["chunk_id"]를 기록하고 ID 리스트를 반환합니다. (FAISS.from_documents의 ids로 사용)
+    완전히 같은 청크가 여러 개면 두 번째부터 salt를 바꿔 충돌을 피합니다.
+
+    Args:
+        existing (Iterable[str]): 이미 인덱스에 있는 ID (증분 추가 시 기존 청크와도 겹치지 않게 합니다)
+    """
+    ids = []
+    seen = set(existing)
+    for chunk in chunks:
+        salt = 0
+        chunk_id = make_chunk_id(chunk)
+        while chunk_id in seen:
+            salt += 1
+            chunk_id = make_chunk_id(chunk, salt)
+        seen.add(chunk_id)
+        chunk.metadata[CHUNK_ID_KEY] = chunk_id
+        ids.append(chunk_id)
+    return ids
+
+
+def location_of(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """청크 메타데이터에서 출처 위치만 추립니다. (PDF 페이지는 1부터 표시)"""
+    page = metadata.get("page")
+    return {
+        "file": os.path.basename(str(metadata.get("source_file") or metadata.get("source") or "알 수 없음")),
+        "type": metadata.get("source_type"),
+        "sheet": metadata.get("sheet_name"),
+        "row": metadata.get("row_index"),
+        "page": page + 1 if isinstance(page, int) else page,
+        "start_index": metadata.get("start_index"),
+        "parent_id": metadata.get("parent_id"),
+    }
+
+
+def format_location(location: Dict[str, Any]) -> str:
+    """위치를 "파일 · 시트 · 12행 · 340자부터" 형태로 표시합니다."""
+    parts = [location["file"]]
+    if location.get("sheet"):
+        parts.append(str(location["sheet"]))
+    if location.get("row") is not None:
+        parts.append(f"{location['row']}행")
+    if location.get("page") is not None:
+        parts.append(f"{location['page']}페이지")
+    if location.get("start_index"):
+        parts.append(f"{location['start_index']}자부터")
+    return " · ".join(parts)
+
+
+def extract_citation_ids(answer: str) -> List[str]:
+    """답변에 인용된 chunk_id를 처음 등장한 순서대로 중복 없이 반환합니다."""
+    return list(dict.fromkeys(CITATION_PATTERN.findall(answer or "")))
+
+
+class LocationTable:
+    """
+    chunk_id → 출처 위치 표.
+
+    Args:
+        locations (Dict[str, Dict[str, Any]]): chunk_id별 location_of() 결과
+    """
+
+    def __init__(self, locations: Dict[str, Dict[str, Any]]):
+        self.locations = locations
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore) -> "LocationTable":
+        """
+        FAISS docstore의 청크들로 표를 만듭니다. (chunk_id가 없는 이전 인덱스의 청크는 제외)
+        parent_id가 있는 청크는 부모 인용 ID("p12")도 부모의 위치(청크 내 start_index 제외)로 등록합니다.
+        """
+        locations = {}
+        for doc in vectorstore.docstore._dict.values():
+            chunk_id = doc.metadata.get(CHUNK_ID_KEY)
+            if chunk_id:
+                location = location_of(doc.metadata)
+                locations[chunk_id] = location
+                if isinstance(location["parent_id"], int):
+                    locations.setdefault(parent_citation_id(location["parent_id"]), dict(location, start_index=None))
+        return cls(locations)
+
+    def get(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        return self.locations.get(chunk_id)
+
+    def resolve(self, answer: str) -> List[Dict[str, Any]]:
+        """
+        답변의 인용을 출처로 바꿉니다. 표에 없는 ID(모델이 지어낸 ID 등)는 건너뜁니다.
+
+        Returns:
+            List[Dict[str, Any]]: 인용 순서대로의 {"id", "label", **location}
+        """
+        citations = []
+        for chunk_id in extract_citation_ids(answer):
+            location = self.locations.get(chunk_id)
+            if location is not None:
+                citations.append({"id": chunk_id, "label": format_location(location), **location})
+        return citations
+
+
+def get_location_table(vectorstore) -> LocationTable:
+    """벡터 저장소(인덱스 버전)마다 한 번만 위치 표를 만들어 재사용합니다."""
+    table = getattr(vectorstore, "location_table", None)
+    if table is None:
+        table = LocationTable.from_vectorstore(vectorstore)
+        vectorstore.location_table = table
+    return table
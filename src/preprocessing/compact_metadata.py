@@ -0,0 +1,242 @@
+# src/preprocessing/compact_metadata.py
+"""
+스프레드시트 행 Document의 메타데이터 압축
+
+process_dataframe()은 행의 모든 셀을 본문("컬럼: 값 ...")과 메타데이터(column_<컬럼>)에 함께 넣으므로
+행 데이터가 documents.pkl과 인덱스 docstore에 두 번씩 저장됩니다. 여기서는
+- 컬럼 이름 / 파일 경로 문자열을 intern하고, 파일(시트)마다 컬럼 목록(schema) 튜플 하나를 모든 행이 공유하며
+- 짧은 값(ID, 출처, 키워드 등 INLINE_VALUE_CHARS 이하)은 지금처럼 column_<컬럼>에 두어 필터/표시에 그대로 쓰고
+- 긴 값(질문, 답변, 요약)은 정규화된 본문에서의 위치 column_spans[컬럼] = (시작, 끝)만 기록합니다.
+pickle은 같은 객체를 한 번만 저장하므로 공유 schema와 intern된 문자열은 파일마다 한 번만 기록됩니다.
+
+긴 값은 get_column(doc, "answer") / row_values(doc)로 읽습니다. (청크는 start_index만큼 보정,
+청크 범위를 벗어난 값은 부모 문서 텍스트를 넘기면 읽을 수 있습니다)
+본문에서 잘라 읽으므로 원본 셀과 공백/특수문자 정규화 결과가 같습니다. (clean_text)
+본문에서 위치를 찾지 못한 값은 원본 그대로 column_<컬럼>에 남습니다.
+
+사용법 (크기 리포트, 기존 documents.pkl 변환):
+    python -m src.preprocessing.compact_metadata
+    python -m src.preprocessing.compact_metadata data/processed/documents.pkl --write
+"""
+import os
+import pickle
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from src.preprocessing.normalizers import clean_text
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+COLUMN_PREFIX = "column_"
+SCHEMA_KEY = "columns"
+SPANS_KEY = "column_spans"
+# 이 길이 이하의 값은 메타데이터에 그대로 둡니다. (ID/출처/키워드 필터와 응답 표시용)
+INLINE_VALUE_CHARS = 64
+
+_schemas: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def intern_schema(columns) -> Tuple[str, ...]:
+    """컬럼 목록을 intern된 문자열의 공유 튜플로 바꿉니다. 같은 컬럼 구성이면 항상 같은 객체를 반환합니다."""
+    schema = tuple(sys.intern(str(column)) for column in columns)
+    return _schemas.setdefault(schema, schema)
+
+
+def column_key(column: str) -> str:
+    """메타데이터 키 "column_<컬럼>" (intern)."""
+    return sys.intern(f"{COLUMN_PREFIX}{column}")
+
+
+def compact_row_metadata(metadata: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """
+    행 메타데이터의 긴 column_<컬럼> 값을 정규화된 본문 text 안의 위치로 바꿉니다. (제자리 수정)
+    값은 본문에 컬럼 순서대로 들어 있으므로 앞에서부터 차례로 찾습니다.
+
+    Args:
+        metadata (Dict[str, Any]): process_dataframe()이 만든 행 메타데이터
+        text (str): clean_text()를 거친 행 본문 (Document.page_content)
+
+    Returns:
+        Dict[str, Any]: 압축된 메타데이터 (같은 객체)
+    """
+    spans = dict(metadata.get(SPANS_KEY) or {})
+    schema = metadata.get(SCHEMA_KEY) or [key[len(COLUMN_PREFIX):] for key in metadata if key.startswith(COLUMN_PREFIX)]
+    cursor = 0
+    for column in schema:
+        key = column_key(column)
+        value = metadata.get(key)
+        if not isinstance(value, str) or len(value) <= INLINE_VALUE_CHARS:
+            continue
+        cleaned = clean_text(value)
+        start = text.find(cleaned, cursor) if cleaned else -1
+        if start < 0:
+            continue  # 본문에서 찾지 못한 값은 원본 그대로 둡니다.
+        cursor = start + len(cleaned)
+        spans[sys.intern(column)] = (start, cursor)
+        del metadata[key]
+    if spans:
+        metadata[SPANS_KEY] = spans
+    if SCHEMA_KEY not in metadata:
+        metadata[SCHEMA_KEY] = intern_schema(schema)
+    if isinstance(metadata.get("file_path"), str):
+        metadata["file_path"] = sys.intern(metadata["file_path"])
+    return metadata
+
+
+def get_column(doc: "Document", column: str, parent_text: Optional[str] = None) -> Optional[str]:
+    """
+    행 Document(또는 그 청크)의 컬럼 값을 읽습니다.
+
+    Args:
+        doc (Document): 행 Document 또는 분할된 청크
+        column (str): 컬럼 이름 (예: "ID", "question")
+        parent_text (str): 청크의 부모 문서 텍스트 (주면 청크 밖에 있는 값도 읽을 수 있습니다)
+
+    Returns:
+        Optional[str]: 값 (빈 셀이거나 청크 범위 밖이면 None)
+    """
+    metadata = doc.metadata
+    value = metadata.get(COLUMN_PREFIX + column)
+    if value is not None:
+        return value
+    span = (metadata.get(SPANS_KEY) or {}).get(column)
+    if span is None:
+        return None
+    start, end = span
+    if parent_text is not None:
+        return parent_text[start:end]
+    offset = metadata.get("start_index") or 0
+    if start < offset or end > offset + len(doc.page_content):
+        return None
+    return doc.page_content[start - offset:end - offset]
+
+
+def row_values(doc: "Document", parent_text: Optional[str] = None) -> Dict[str, str]:
+    """행 Document의 모든 컬럼 값 (schema 순서, 읽을 수 없는 값은 제외)."""
+    columns = doc.metadata.get(SCHEMA_KEY) or [
+        key[len(COLUMN_PREFIX):] for key in doc.metadata if key.startswith(COLUMN_PREFIX)
+    ]
+    values = {}
+    for column in columns:
+        value = get_column(doc, column, parent_text)
+        if value is not None:
+            values[column] = value
+    return values
+
+
+def expand_documents(documents: List["Document"]) -> List["Document"]:
+    """압축 전 형식(모든 값이 column_<컬럼>)의 사본을 만듭니다. (크기 비교용)"""
+    from langchain_core.documents import Document
+
+    expanded = []
+    for doc in documents:
+        metadata = {key: value for key, value in doc.metadata.items() if key not in (SCHEMA_KEY, SPANS_KEY)}
+        if SPANS_KEY in doc.metadata:
+            for column, value in row_values(doc).items():
+                metadata[f"{COLUMN_PREFIX}{column}"] = value
+        expanded.append(Document(page_content=doc.page_content, metadata=metadata))
+    return expanded
+
+
+def compact_documents(documents: List["Document"]) -> int:
+    """
+    스프레드시트 행 Document의 메타데이터를 압축합니다. (제자리 수정, 이미 압축된 문서도 안전)
+
+    Returns:
+        int: 압축한 문서 수
+    """
+    compacted = 0
+    for doc in documents:
+        if doc.metadata.get("source_type") in ("excel", "csv"):
+            compact_row_metadata(doc.metadata, doc.page_content)
+            compacted += 1
+    return compacted
+
+
+def measure(documents: List["Document"], chunk_size: int = 500, chunk_overlap: int = 100) -> Dict[str, Any]:
+    """
+    documents.pkl 크기 / 로드 시간과, 같은 설정으로 분할했을 때 docstore(청크) pickle 크기를 측정합니다.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    payload = pickle.dumps(documents, protocol=pickle.HIGHEST_PROTOCOL)
+    started = time.perf_counter()
+    for _ in range(5):
+        pickle.loads(payload)
+    load_ms = (time.perf_counter() - started) / 5 * 1000
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True)
+    chunks = splitter.split_documents(documents)
+    metadata_keys = sum(len(doc.metadata) for doc in chunks)
+    return {
+        "documents_bytes": len(payload),
+        "load_ms": round(load_ms, 2),
+        "chunks": len(chunks),
+        "docstore_bytes": len(pickle.dumps({str(i): chunk for i, chunk in enumerate(chunks)},
+                                           protocol=pickle.HIGHEST_PROTOCOL)),
+        "chunk_metadata_keys": metadata_keys,
+    }
+
+
+def size_report(documents: List["Document"]) -> Dict[str, Any]:
+    """압축 전/후 크기 비교. (documents는 바꾸지 않습니다)"""
+    before = measure(expand_documents(documents))
+    compact = expand_documents(documents)
+    compact_documents(compact)
+    after = measure(compact)
+    return {
+        "before": before,
+        "after": after,
+        "reduction": {
+            key: round(1 - after[key] / before[key], 4) if before[key] else 0.0
+            for key in ("documents_bytes", "load_ms", "docstore_bytes", "chunk_metadata_keys")
+        },
+    }
+
+
+def print_size_report(report: Dict[str, Any]):
+    before, after, reduction = report["before"], report["after"], report["reduction"]
+    print("\n" + "=" * 70)
+    print("🗜️ 메타데이터 압축 크기 리포트")
+    print("=" * 70)
+    print(f"{'항목':<24}{'압축 전':>14}{'압축 후':>14}{'감소':>10}")
+    rows = (
+        ("documents.pkl (KB)", "documents_bytes", 1024),
+        ("로드 시간 (ms)", "load_ms", 1),
+        ("청크 docstore (KB)", "docstore_bytes", 1024),
+        ("청크 메타데이터 키 수", "chunk_metadata_keys", 1),
+    )
+    for label, key, unit in rows:
+        print(f"{label:<24}{before[key] / unit:>14.1f}{after[key] / unit:>14.1f}{reduction[key] * 100:>9.1f}%")
+    print("=" * 70)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    from src.preprocessing.rag_engine import DEFAULT_DOCUMENTS_PATH
+
+    parser = argparse.ArgumentParser(description="스프레드시트 행 메타데이터 압축 크기 리포트 / 변환")
+    parser.add_argument("documents_path", nargs="?", default=DEFAULT_DOCUMENTS_PATH)
+    parser.add_argument("--write", action="store_true", help="압축한 결과로 documents.pkl을 교체")
+    args = parser.parse_args(argv)
+
+    with open(args.documents_path, 'rb') as f:
+        documents = pickle.load(f)
+    report = size_report(documents)
+    print_size_report(report)
+
+    if args.write:
+        compacted = compact_documents(documents)
+        tmp_path = f"{args.documents_path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(documents, f)
+        os.replace(tmp_path, args.documents_path)
+        print(f"💾 {compacted}개 행 문서를 압축해 '{args.documents_path}'에 저장했습니다.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
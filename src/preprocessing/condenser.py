@@ -0,0 +1,155 @@
+# src/preprocessing/condenser.py
+"""
+후속 질문 → 독립 질문 변환기 (query condensation)
+
+"그럼 그 경우에는?" 같은 후속 질문은 그대로 검색하면 엉뚱한 청크가 검색되므로,
+대화 기록(요약 포함)을 참고해 독립된 검색 질의로 다시 작성합니다.
+
+추가 LLM 호출은 필요할 때만 합니다:
+    - 휴리스틱 우회: 대화 기록이 없거나, 지시어/접속어 없이 충분히 긴 질문은 그대로 사용
+    - LRU 캐시: (세션 요약 해시, 질문)이 같으면 이전 재작성 결과 재사용
+      (요약이 아직 없는 짧은 대화는 버퍼 메시지 전체를 요약 대신 사용)
+재작성에는 답변 모델과 별도의 작은 모델(기본 gpt-4o-mini)을 사용합니다.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from src.preprocessing.rag_engine import (
+    DEFAULT_PROMPT_PATH,
+    arewrite_query,
+    format_chat_history,
+    get_chat_model,
+    rewrite_query,
+)
+
+DEFAULT_CONDENSE_MODEL = "gpt-4o-mini"
+
+# 앞 대화를 가리키는 표현 (지시어, 대용어, 접속어로 시작하는 질문)
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(그럼|그러면|그렇다면|그런데|근데|그리고|그래서|또|그밖에|그 밖에|아니면)"
+    r"|(?:^|\s)(그|이|저|해당|위|앞|방금|아까)\s*(경우|것|거|때|사람|회사|내용|부분|조건|문제|규정|절차|질문|답변)"
+    r"|(?:^|\s)(그건|그거|그게|이건|이거|이게|저건|거기|그곳|그분|그때|그렇게|이렇게|마찬가지)"
+    r"|\b(it|that|this|they|them|those|these)\b",
+    re.IGNORECASE,
+)
+# 이 길이(공백 제외 글자 수)보다 짧은 질문은 대상이 생략된 경우가 많아 재작성합니다.
+MIN_SELF_CONTAINED_CHARS = 12
+
+
+def is_follow_up(question: str) -> bool:
+    """대화 기록 없이는 이해하기 어려운 후속 질문인지 휴리스틱으로 판단합니다."""
+    text = question.strip()
+    if len(re.sub(r"\s+", "", text)) < MIN_SELF_CONTAINED_CHARS:
+        return True
+    return bool(FOLLOW_UP_PATTERN.search(text))
+
+
+class QueryCondenser:
+    """
+    LRU 캐시와 휴리스틱 우회를 갖춘 질의 재작성기. 스레드 안전합니다.
+
+    Args:
+        model (str): 재작성용 모델 이름 (llm을 주면 무시)
+        llm: 재작성에 사용할 채팅 모델 (None이면 공용 LLM 풀에서 model로 가져옴)
+        cache_size (int): LRU 캐시 항목 수
+        prompt_path (str): condense_template이 있는 프롬프트 YAML
+    """
+
+    def __init__(self, model: str = DEFAULT_CONDENSE_MODEL, llm=None, cache_size: int = 256,
+                 prompt_path: str = DEFAULT_PROMPT_PATH):
+        self.model = model
+        self.llm = llm
+        self.cache_size = cache_size
+        self.prompt_path = prompt_path
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"bypassed": 0, "cache_hits": 0, "llm_calls": 0}
+
+    def needs_condensing(self, question: str, chat_history: Any) -> bool:
+        """재작성이 필요한지 (대화 기록이 있고 후속 질문으로 보이는지) 판단합니다."""
+        return bool(chat_history) and is_follow_up(question)
+
+    def record_bypass(self):
+        """재작성 없이 원래 질문을 사용한 경우를 집계합니다. (needs_condensing()으로 먼저 거른 호출자용)"""
+        with self._lock:
+            self.stats["bypassed"] += 1
+
+    @staticmethod
+    def cache_key(question: str, chat_history: Any) -> Tuple[str, str]:
+        """
+        (세션 요약 해시, 질문). ConversationSummaryBufferMemory의 누적 요약(SystemMessage)은
+        버퍼가 넘칠 때만 바뀌므로 여러 턴에 걸쳐 같은 키가 됩니다.
+        요약이 아직 없으면 버퍼 메시지 전체로 해시합니다. (다른 세션의 새 대화와 섞이지 않도록)
+        """
+        if isinstance(chat_history, list):
+            summary = "\n".join(str(m.content) for m in chat_history if getattr(m, "type", None) == "system")
+        else:
+            summary = ""
+        state = summary or format_chat_history(chat_history)
+        return hashlib.sha1(state.encode('utf-8')).hexdigest(), question.strip()
+
+    def condense(self, question: str, chat_history: Any) -> Tuple[str, Dict[str, bool]]:
+        """
+        질문을 독립 질문으로 변환합니다.
+
+        Returns:
+            Tuple[str, Dict[str, bool]]: (검색 질의, {"bypassed", "cache_hit"})
+        """
+        cached = self._lookup(question, chat_history)
+        if cached is not None:
+            return cached
+        condensed = rewrite_query(self._get_llm(), question, chat_history, self.prompt_path)
+        self._remember(question, chat_history, condensed)
+        return condensed, {"bypassed": False, "cache_hit": False}
+
+    async def acondense(self, question: str, chat_history: Any) -> Tuple[str, Dict[str, bool]]:
+        """condense()의 비동기 버전 (취소하면 재작성 LLM 호출도 중단되고 캐시에 남지 않습니다)."""
+        cached = self._lookup(question, chat_history)
+        if cached is not None:
+            return cached
+        condensed = await arewrite_query(self._get_llm(), question, chat_history, self.prompt_path)
+        self._remember(question, chat_history, condensed)
+        return condensed, {"bypassed": False, "cache_hit": False}
+
+    def _get_llm(self):
+        return self.llm or get_chat_model(self.model, temperature=0, streaming=False)
+
+    def _lookup(self, question: str, chat_history: Any) -> Optional[Tuple[str, Dict[str, bool]]]:
+        """휴리스틱 우회나 캐시 적중이면 (검색 질의, info)를, LLM 호출이 필요하면 None을 반환합니다."""
+        if not self.needs_condensing(question, chat_history):
+            self.record_bypass()
+            return question, {"bypassed": True, "cache_hit": False}
+
+        key = self.cache_key(question, chat_history)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return cached, {"bypassed": False, "cache_hit": True}
+        return None
+
+    def _remember(self, question: str, chat_history: Any, condensed: str):
+        key = self.cache_key(question, chat_history)
+        with self._lock:
+            self.stats["llm_calls"] += 1
+            self._cache[key] = condensed
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+_condensers: Dict[str, QueryCondenser] = {}
+_condensers_lock = threading.Lock()
+
+
+def get_condenser(model: str = DEFAULT_CONDENSE_MODEL) -> QueryCondenser:
+    """모델별 프로세스 공용 QueryCondenser (캐시를 모든 세션이 공유)."""
+    with _condensers_lock:
+        condenser = _condensers.get(model)
+        if condenser is None:
+            condenser = _condensers[model] = QueryCondenser(model)
+    return condenser
@@ -0,0 +1,509 @@
+# src/preprocessing/corpus.py
+"""
+코퍼스 통계 / 인덱스 압축 CLI
+
+stats: documents.pkl과 게시된 인덱스(CURRENT 버전)를 읽어
+- 출처 파일별 문서 수 / 청크 수, 문서 형식별 문서 수
+- 문서(부모) / 청크 토큰 수 분포 (tiktoken cl100k_base, 없으면 글자 수 기반 추정)
+- 내용이 완전히 같은 문서 / 청크 비율
+- 벡터 인덱스 크기 (벡터 수, 차원, 벡터 메모리, 현재 버전 / 전체 버전 디스크 사용량)
+- 삭제 흔적(tombstone): 비워진 부모 문서, 어떤 청크도 참조하지 않는 부모 문서,
+  벡터 없이 docstore에만 남은 청크, docstore에 없는 벡터, documents.pkl에서 사라진 파일의 청크
+를 보고합니다. 인덱스가 아직 게시되지 않았으면 청크 수는 현재 설정으로 분할해 계산합니다. (임베딩 없음)
+
+compact: 감시 모드의 증분 색인이 반복되면 부모 저장소에 빈 자리("")가 쌓이고
+docstore와 인덱스가 어긋난 항목이 남을 수 있습니다. 살아 있는 청크의 벡터만 새 인덱스로 옮기고
+(재임베딩 없음) 부모 저장소를 다시 번호 매긴 뒤, 같은 manifest로 새 버전을 게시합니다.
+원본 지문이 같으므로 실행 중인 앱은 재구축 없이 압축된 버전으로 핫 리로드합니다.
+감시 모드는 메모리에 있는 인덱스로 다음 버전을 게시하므로 압축은 감시 모드를 멈춘 상태에서 실행하세요.
+
+사용법:
+    python -m src.preprocessing.corpus stats
+    python -m src.preprocessing.corpus stats --tenant acme --output data/processed/corpus_stats.json
+    python -m src.preprocessing.corpus compact --keep-versions 1
+    python -m src.preprocessing.corpus compact --dry-run
+"""
+import hashlib
+import json
+import os
+import pickle
+import re
+import statistics
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.preprocessing.citations import location_of
+from src.preprocessing.index_store import load_manifest, load_published_index, publish_index, read_current_version
+from src.preprocessing.parent_store import PARENT_ID_KEY, ParentStore, attach_parent_store, get_parent_store
+from src.preprocessing.rag_engine import RagEngine, create_embeddings
+
+HANGUL = re.compile(r"[가-힣]")
+
+
+# ── 토큰 / 중복 ──────────────────────────────────────────────────────────────
+def estimate_tokens(text: str) -> int:
+    """글자 수 기반 토큰 추정 (cl100k 기준 한글 음절 ≈ 1토큰, 그 외 4글자 ≈ 1토큰)."""
+    hangul = len(HANGUL.findall(text))
+    return hangul + (len(text) - hangul + 3) // 4
+
+
+def get_token_counter() -> Tuple[Callable[[str], int], str]:
+    """
+    토큰 계산 함수와 방식 이름을 반환합니다.
+    tiktoken 인코딩 파일을 받을 수 없는(오프라인) 환경에서는 추정치를 사용합니다.
+    """
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return (lambda text: len(encoding.encode(text, disallowed_special=()))), "tiktoken:cl100k_base"
+    except Exception:
+        return estimate_tokens, "estimate"
+
+
+def distribution(values: List[int]) -> Dict[str, Any]:
+    """값 분포 요약 (개수, 최소, 평균, p50, p95, 최대, 합계)."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "min": ordered[0],
+        "mean": round(statistics.fmean(ordered), 1),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+        "total": sum(ordered),
+    }
+
+
+def content_hash(text: str) -> str:
+    """공백 차이를 무시한 내용 해시."""
+    return hashlib.sha1(" ".join(text.split()).encode('utf-8')).hexdigest()
+
+
+def duplicate_stats(texts: Iterable[str]) -> Dict[str, Any]:
+    """
+    내용이 같은 텍스트의 비율.
+
+    Returns:
+        Dict[str, Any]: total, unique, duplicates (첫 번째를 제외한 중복 수), ratio
+    """
+    hashes = [content_hash(text) for text in texts]
+    unique = len(set(hashes))
+    return {
+        "total": len(hashes),
+        "unique": unique,
+        "duplicates": len(hashes) - unique,
+        "ratio": round((len(hashes) - unique) / len(hashes), 4) if hashes else 0.0,
+    }
+
+
+def _source_of(metadata: Dict[str, Any]) -> str:
+    return location_of(metadata)["file"]
+
+
+# ── 인덱스 ──────────────────────────────────────────────────────────────────
+def dir_bytes(path: str) -> int:
+    """디렉토리 아래 파일 크기 합계."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def list_versions(index_root: str) -> List[str]:
+    if not os.path.isdir(index_root):
+        return []
+    return sorted(name for name in os.listdir(index_root)
+                  if name.startswith("v") and os.path.isdir(os.path.join(index_root, name)))
+
+
+def read_version(version_dir: str) -> Tuple[Any, Dict[str, Any], Dict[int, str], Optional[ParentStore]]:
+    """
+    게시된 버전을 임베딩 모델 없이 읽습니다. (통계용, 인덱스 파일은 메모리 맵)
+
+    Returns:
+        (faiss 인덱스, docstore 딕셔너리, index_to_docstore_id, 부모 저장소)
+    """
+    from langchain_community.vectorstores.faiss import dependable_faiss_import
+
+    faiss = dependable_faiss_import()
+    index = faiss.read_index(os.path.join(version_dir, "index.faiss"), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    # 직접 게시한 아티팩트만 읽으므로 pickle 역직렬화를 허용합니다.
+    with open(os.path.join(version_dir, "index.pkl"), 'rb') as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return index, docstore._dict, index_to_docstore_id, ParentStore.load(version_dir)
+
+
+def find_tombstones(docstore: Dict[str, Any], index_to_docstore_id: Dict[int, str],
+                    parent_store: Optional[ParentStore], live_sources: Optional[set] = None) -> Dict[str, List]:
+    """
+    인덱스 버전의 삭제 흔적을 찾습니다.
+
+    Args:
+        docstore (Dict[str, Document]): 청크 ID → 청크
+        index_to_docstore_id (Dict[int, str]): 벡터 위치 → 청크 ID
+        parent_store (ParentStore): 부모 저장소 (없으면 부모 관련 항목은 비어 있음)
+        live_sources (set): documents.pkl에 있는 출처 파일 이름 (None이면 검사하지 않음)
+
+    Returns:
+        Dict[str, List]: empty_parents, unreferenced_parents, orphan_chunks (벡터 없는 docstore 항목),
+            dangling_vectors (docstore에 없는 벡터 위치), stale_chunks (사라진 파일의 청크 ID)
+    """
+    mapped = set(index_to_docstore_id.values())
+    live_chunks = [chunk_id for chunk_id in index_to_docstore_id.values() if chunk_id in docstore]
+
+    empty_parents, unreferenced_parents = [], []
+    if parent_store is not None:
+        referenced = {docstore[chunk_id].metadata.get(PARENT_ID_KEY) for chunk_id in live_chunks}
+        for parent_id, text in enumerate(parent_store.texts):
+            if not text:
+                empty_parents.append(parent_id)
+            elif parent_id not in referenced:
+                unreferenced_parents.append(parent_id)
+
+    stale_chunks = []
+    if live_sources is not None:
+        stale_chunks = [chunk_id for chunk_id in live_chunks
+                        if _source_of(docstore[chunk_id].metadata) not in live_sources]
+
+    return {
+        "empty_parents": empty_parents,
+        "unreferenced_parents": unreferenced_parents,
+        "orphan_chunks": sorted(chunk_id for chunk_id in docstore if chunk_id not in mapped),
+        "dangling_vectors": sorted(position for position, chunk_id in index_to_docstore_id.items()
+                                   if chunk_id not in docstore),
+        "stale_chunks": stale_chunks,
+    }
+
+
+def _index_stats(index_root: Optional[str]) -> Optional[Dict[str, Any]]:
+    """게시된 인덱스의 크기 정보. 게시된 버전이 없으면 None."""
+    version = read_current_version(index_root) if index_root else None
+    if not version or load_manifest(index_root, version) is None:
+        return None
+    version_dir = os.path.join(index_root, version)
+    index, docstore, index_to_docstore_id, parent_store = read_version(version_dir)
+    return {
+        "root": index_root,
+        "version": version,
+        "vectors": index.ntotal,
+        "dim": index.d,
+        "vector_bytes": index.ntotal * index.d * 4,
+        "docstore_entries": len(docstore),
+        "parents": len(parent_store) if parent_store is not None else None,
+        "version_bytes": dir_bytes(version_dir),
+        "versions": len(list_versions(index_root)),
+        "all_versions_bytes": dir_bytes(index_root),
+        "_loaded": (docstore, index_to_docstore_id, parent_store),
+    }
+
+
+# ── stats ──────────────────────────────────────────────────────────────────
+def corpus_stats(engine: RagEngine) -> Dict[str, Any]:
+    """
+    코퍼스 / 인덱스 통계를 계산합니다.
+
+    Returns:
+        Dict[str, Any]: documents, sources, tokens, duplicates, index, tombstones
+    """
+    documents = engine.load_documents()
+    count_tokens, token_method = get_token_counter()
+
+    index = _index_stats(engine.index_root)
+    if index is not None:
+        docstore, index_to_docstore_id, parent_store = index.pop("_loaded")
+        chunks = [docstore[chunk_id] for chunk_id in index_to_docstore_id.values() if chunk_id in docstore]
+        chunk_origin = "index"
+    else:
+        docstore, index_to_docstore_id, parent_store = {}, {}, None
+        chunks = engine.split_documents(documents)
+        chunk_origin = "split"
+
+    sources: Dict[str, Dict[str, Any]] = {}
+    for doc in documents:
+        entry = sources.setdefault(_source_of(doc.metadata), {
+            "type": doc.metadata.get("source_type"), "documents": 0, "chunks": 0, "chars": 0,
+        })
+        entry["documents"] += 1
+        entry["chars"] += len(doc.page_content)
+    for chunk in chunks:
+        entry = sources.setdefault(_source_of(chunk.metadata), {
+            "type": chunk.metadata.get("source_type"), "documents": 0, "chunks": 0, "chars": 0,
+        })
+        entry["chunks"] += 1
+
+    by_type: Dict[str, int] = {}
+    for doc in documents:
+        source_type = str(doc.metadata.get("source_type") or "unknown")
+        by_type[source_type] = by_type.get(source_type, 0) + 1
+
+    tombstones = None
+    if index is not None:
+        live_sources = {name for name, entry in sources.items() if entry["documents"]}
+        found = find_tombstones(docstore, index_to_docstore_id, parent_store, live_sources)
+        tombstones = {name: len(items) for name, items in found.items()}
+        tombstones["total"] = sum(tombstones.values())
+
+    return {
+        "documents_path": engine.config.documents_path,
+        "documents": len(documents),
+        "chunks": len(chunks),
+        "chunk_origin": chunk_origin,
+        "by_type": by_type,
+        "sources": dict(sorted(sources.items(), key=lambda item: -item[1]["chunks"])),
+        "tokens": {
+            "method": token_method,
+            "documents": distribution([count_tokens(doc.page_content) for doc in documents]),
+            "chunks": distribution([count_tokens(chunk.page_content) for chunk in chunks]),
+        },
+        "duplicates": {
+            "documents": duplicate_stats(doc.page_content for doc in documents),
+            "chunks": duplicate_stats(chunk.page_content for chunk in chunks),
+        },
+        "index": index,
+        "tombstones": tombstones,
+    }
+
+
+def _mb(value: Optional[int]) -> str:
+    return "-" if value is None else f"{value / 1024 / 1024:.2f} MB"
+
+
+def print_stats(stats: Dict[str, Any], top: int = 20):
+    print("\n" + "=" * 78)
+    print(f"📚 코퍼스 통계: {stats['documents_path']}")
+    print("=" * 78)
+    origin = "게시된 인덱스" if stats["chunk_origin"] == "index" else "현재 설정으로 분할 (인덱스 미게시)"
+    print(f"문서 {stats['documents']}개, 청크 {stats['chunks']}개 ({origin})")
+    print("형식별 문서: " + ", ".join(f"{name} {count}" for name, count in sorted(stats["by_type"].items())))
+
+    print(f"\n{'출처 파일':<40}{'형식':>8}{'문서':>8}{'청크':>8}")
+    for name, entry in list(stats["sources"].items())[:top]:
+        label = name if len(name) <= 38 else name[:37] + "…"
+        print(f"{label:<40}{str(entry['type'] or '-'):>8}{entry['documents']:>8}{entry['chunks']:>8}")
+    if len(stats["sources"]) > top:
+        print(f"... 외 {len(stats['sources']) - top}개 파일")
+
+    print(f"\n토큰 분포 ({stats['tokens']['method']})")
+    for kind in ("documents", "chunks"):
+        dist = stats["tokens"][kind]
+        if dist["count"]:
+            print(f"  {'문서' if kind == 'documents' else '청크'}: min {dist['min']}, p50 {dist['p50']}, "
+                  f"p95 {dist['p95']}, max {dist['max']}, 평균 {dist['mean']}, 합계 {dist['total']}")
+
+    for kind, label in (("documents", "문서"), ("chunks", "청크")):
+        dup = stats["duplicates"][kind]
+        print(f"중복 {label}: {dup['duplicates']}/{dup['total']} ({dup['ratio'] * 100:.1f}%)")
+
+    index = stats["index"]
+    if index is None:
+        print("\n⚠️ 게시된 인덱스가 없습니다.")
+    else:
+        print(f"\n🗂️ 인덱스 {index['version']}: 벡터 {index['vectors']}개 × {index['dim']}차원 "
+              f"({_mb(index['vector_bytes'])}), docstore {index['docstore_entries']}개, 부모 {index['parents'] if index['parents'] is not None else '-'}개")
+        print(f"   디스크: 현재 버전 {_mb(index['version_bytes'])}, "
+              f"전체 {index['versions']}개 버전 {_mb(index['all_versions_bytes'])}")
+        tombstones = stats["tombstones"]
+        print(f"🪦 삭제 흔적 {tombstones['total']}개: 빈 부모 {tombstones['empty_parents']}, "
+              f"참조 없는 부모 {tombstones['unreferenced_parents']}, 벡터 없는 청크 {tombstones['orphan_chunks']}, "
+              f"docstore 없는 벡터 {tombstones['dangling_vectors']}, 사라진 파일의 청크 {tombstones['stale_chunks']}")
+        if tombstones["total"]:
+            print("   → `python -m src.preprocessing.corpus compact`로 정리할 수 있습니다.")
+    print("=" * 78)
+
+
+# ── compact ────────────────────────────────────────────────────────────────
+def compact_vectorstore(vectorstore, live_sources: Optional[set] = None) -> Tuple[Any, Dict[str, int]]:
+    """
+    살아 있는 청크의 벡터만 새 인덱스로 옮기고 부모 저장소를 다시 번호 매깁니다. (재임베딩 없음)
+
+    - docstore에 없는 벡터, 벡터 없는 docstore 항목, live_sources에 없는 파일의 청크를 버립니다.
+    - 비워졌거나 참조되지 않는 부모 문서를 버리고 parent_id를 0부터 다시 매깁니다.
+      부모가 비워진 청크는 parent_id를 지워 청크 그대로 검색되게 합니다.
+
+    Args:
+        vectorstore: 압축할 FAISS 벡터 저장소 (IndexFlat 계열)
+        live_sources (set): documents.pkl에 있는 출처 파일 이름 (None이면 출처 검사 안 함)
+
+    Returns:
+        (새 FAISS 벡터 저장소, 버린 항목 수)
+    """
+    import numpy as np
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.vectorstores.faiss import dependable_faiss_import
+
+    faiss = dependable_faiss_import()
+    index = vectorstore.index
+    if not isinstance(index, faiss.IndexFlat):
+        raise ValueError(f"벡터를 그대로 옮길 수 있는 IndexFlat 계열 인덱스만 압축할 수 있습니다: {type(index).__name__}")
+
+    docstore = vectorstore.docstore._dict
+    parent_store = get_parent_store(vectorstore)
+    found = find_tombstones(docstore, vectorstore.index_to_docstore_id, parent_store, live_sources)
+    stale = set(found["stale_chunks"])
+
+    positions, chunk_ids = [], []
+    for position, chunk_id in sorted(vectorstore.index_to_docstore_id.items()):
+        if chunk_id in docstore and chunk_id not in stale:
+            positions.append(position)
+            chunk_ids.append(chunk_id)
+
+    new_index = faiss.IndexFlat(index.d, index.metric_type)
+    if positions:
+        vectors = index.reconstruct_n(0, index.ntotal)
+        new_index.add(np.ascontiguousarray(vectors[positions], dtype=np.float32))
+
+    new_parent_store, dropped_parent_refs = None, 0
+    if parent_store is not None:
+        referenced = sorted({
+            parent_id for parent_id in (docstore[chunk_id].metadata.get(PARENT_ID_KEY) for chunk_id in chunk_ids)
+            if parent_store.get(parent_id) is not None
+        })
+        remap = {old_id: new_id for new_id, old_id in enumerate(referenced)}
+        for chunk_id in chunk_ids:
+            metadata = docstore[chunk_id].metadata
+            if metadata.get(PARENT_ID_KEY) in remap:
+                metadata[PARENT_ID_KEY] = remap[metadata[PARENT_ID_KEY]]
+            elif PARENT_ID_KEY in metadata:
+                metadata.pop(PARENT_ID_KEY)
+                dropped_parent_refs += 1
+        new_parent_store = ParentStore([parent_store.texts[old_id] for old_id in referenced])
+
+    compacted = FAISS(
+        vectorstore.embedding_function,
+        new_index,
+        InMemoryDocstore({chunk_id: docstore[chunk_id] for chunk_id in chunk_ids}),
+        dict(enumerate(chunk_ids)),
+        normalize_L2=vectorstore._normalize_L2,
+        distance_strategy=vectorstore.distance_strategy,
+    )
+    attach_parent_store(compacted, new_parent_store)
+    return compacted, {
+        "dropped_vectors": index.ntotal - len(positions),
+        "dropped_chunks": len(docstore) - len(chunk_ids),
+        "stale_chunks": len(stale),
+        "dropped_parents": (len(parent_store) - len(new_parent_store)) if parent_store is not None else 0,
+        "cleared_parent_refs": dropped_parent_refs,
+    }
+
+
+def compact_index(engine: RagEngine, keep_versions: int = 1, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    현재 버전을 압축해 같은 manifest의 새 버전으로 게시하고 오래된 버전을 정리합니다.
+
+    Args:
+        engine (RagEngine): 인덱스 설정 (index_root, 임베딩 설정)
+        keep_versions (int): 게시 후 보존할 버전 수 (CURRENT 포함)
+        dry_run (bool): True이면 압축 결과만 계산하고 게시하지 않습니다.
+
+    Returns:
+        Dict[str, Any]: 이전/새 버전, 버린 항목 수, 디스크 사용량 변화
+    """
+    index_root = engine.index_root
+    version = read_current_version(index_root) if index_root else None
+    if not version:
+        raise ValueError(f"게시된 인덱스가 없습니다: {index_root}")
+
+    embeddings = create_embeddings(engine.config.embedding_provider, engine.config.embedding_model)
+    loaded = load_published_index(index_root, embeddings, version=version)
+    if loaded is None:
+        raise ValueError(f"인덱스 버전을 로드할 수 없습니다: {version}")
+    vectorstore, manifest = loaded
+
+    live_sources = {_source_of(doc.metadata) for doc in engine.load_documents()}
+    compacted, dropped = compact_vectorstore(vectorstore, live_sources)
+
+    before_bytes = dir_bytes(index_root)
+    result = {
+        "version": version,
+        "vectors": [vectorstore.index.ntotal, compacted.index.ntotal],
+        "parents": [len(get_parent_store(vectorstore) or []), len(get_parent_store(compacted) or [])],
+        "dropped": dropped,
+        "before_bytes": before_bytes,
+        "before_version_bytes": dir_bytes(os.path.join(index_root, version)),
+        "dry_run": dry_run,
+    }
+    if dry_run:
+        return result
+
+    # 원본 지문(source_fingerprint)을 그대로 두어야 엔진이 재구축하지 않고 이 버전을 로드합니다.
+    manifest = {key: value for key, value in manifest.items() if key not in ("version", "created_at")}
+    manifest["compacted_from"] = version
+    new_version = publish_index(compacted, index_root, manifest, keep_versions=max(keep_versions, 1))
+    result.update({
+        "new_version": new_version,
+        "after_bytes": dir_bytes(index_root),
+        "after_version_bytes": dir_bytes(os.path.join(index_root, new_version)),
+    })
+    return result
+
+
+def print_compaction(result: Dict[str, Any]):
+    dropped = result["dropped"]
+    print("\n" + "=" * 78)
+    print(f"🗜️ 인덱스 압축{' (dry-run)' if result['dry_run'] else ''}: {result['version']}"
+          + (f" → {result['new_version']}" if result.get("new_version") else ""))
+    print("=" * 78)
+    print(f"벡터 {result['vectors'][0]} → {result['vectors'][1]}, 부모 문서 {result['parents'][0]} → {result['parents'][1]}")
+    print(f"버린 항목: 벡터 {dropped['dropped_vectors']}, docstore 청크 {dropped['dropped_chunks']} "
+          f"(사라진 파일 {dropped['stale_chunks']}), 부모 {dropped['dropped_parents']}, "
+          f"비워진 부모 참조 {dropped['cleared_parent_refs']}")
+    if result.get("new_version"):
+        print(f"디스크: 현재 버전 {_mb(result['before_version_bytes'])} → {_mb(result['after_version_bytes'])}, "
+              f"전체 {_mb(result['before_bytes'])} → {_mb(result['after_bytes'])}")
+    else:
+        print(f"디스크: 현재 버전 {_mb(result['before_version_bytes'])}, 전체 {_mb(result['before_bytes'])}")
+    print("=" * 78)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    from src.preprocessing.rag_engine import RagConfig
+    from src.preprocessing.tenants import DEFAULT_TENANT, tenant_config
+
+    parser = argparse.ArgumentParser(description="코퍼스 통계 / 인덱스 압축")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("stats", "코퍼스 / 인덱스 통계"), ("compact", "삭제 흔적을 정리한 인덱스 새 버전 게시")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--tenant", default=DEFAULT_TENANT, help="고객사(테넌트) 이름")
+        sub.add_argument("--embedding-provider", default=RagConfig().embedding_provider,
+                         choices=["openai", "upstage", "fake"],
+                         help="인덱스를 만든 임베딩 제공자 (인덱스 위치가 설정마다 다름)")
+        sub.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+        if name == "stats":
+            sub.add_argument("--top", type=int, default=20, help="표시할 출처 파일 수")
+        else:
+            sub.add_argument("--keep-versions", type=int, default=1, help="게시 후 보존할 버전 수 (CURRENT 포함)")
+            sub.add_argument("--dry-run", action="store_true", help="게시하지 않고 결과만 계산")
+    args = parser.parse_args(argv)
+
+    engine = RagEngine(tenant_config(args.tenant, RagConfig(embedding_provider=args.embedding_provider)))
+    if args.command == "stats":
+        result = corpus_stats(engine)
+        print_stats(result, top=args.top)
+    else:
+        try:
+            result = compact_index(engine, keep_versions=args.keep_versions, dry_run=args.dry_run)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+        print_compaction(result)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"💾 결과 저장: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
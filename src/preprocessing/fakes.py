@@ -0,0 +1,168 @@
+# src/preprocessing/fakes.py
+"""
+API 키 없이 로컬에서 앱/서버를 실행하기 위한 가짜(모의) 모델
+
+- FakeChatModel: 프롬프트에 포함된 참고 문서 수를 바탕으로 결정적인 답변을 스트리밍합니다.
+  첫 토큰 지연과 초당 토큰 수를 설정하면 실제 제공자와 비슷한 속도로 스트리밍하므로
+  부하 테스트(loadtest.py)에서 앱 자체의 오버헤드를 모델 지연과 분리해 측정할 수 있습니다.
+- HashEmbeddings: 단어/글자 bigram을 해싱한 결정적 벡터. 실제 의미 임베딩은 아니지만
+  어휘가 겹치는 문서끼리 가까워지므로 오프라인 벤치마크에서도 의미 있는 검색 순위를 냅니다.
+
+RagConfig(llm_model="fake", embedding_provider="fake")로 선택합니다.
+속도는 모델 이름("fake:ttft=0.8,tps=40") 또는 환경 변수(HR_RAG_FAKE_TTFT, HR_RAG_FAKE_TPS)로 지정하며,
+HR_RAG_FAKE=1이면 채팅 앱/서버의 모든 모델과 기본 임베딩이 가짜로 바뀝니다. (rag_engine.FAKE_MODE)
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import BaseModel
+
+# 모델 이름에 속도가 없을 때의 기본값 (초, 초당 토큰 수; 0이면 지연 없음)
+DEFAULT_FIRST_TOKEN_LATENCY = float(os.getenv("HR_RAG_FAKE_TTFT", "0"))
+DEFAULT_TOKENS_PER_SECOND = float(os.getenv("HR_RAG_FAKE_TPS", "0"))
+
+FAKE_SPEC_KEYS = {"ttft": "first_token_latency", "tps": "tokens_per_second"}
+
+
+def parse_fake_model(model: str) -> Dict[str, float]:
+    """
+    가짜 모델 이름의 속도 설정을 읽습니다.
+
+    Args:
+        model (str): "fake" 또는 "fake:ttft=0.8,tps=40" (ttft: 첫 토큰 지연 초, tps: 초당 토큰 수)
+
+    Returns:
+        Dict[str, float]: FakeChatModel의 first_token_latency, tokens_per_second
+    """
+    options = {"first_token_latency": DEFAULT_FIRST_TOKEN_LATENCY, "tokens_per_second": DEFAULT_TOKENS_PER_SECOND}
+    _, _, spec = model.partition(":")
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, value = item.partition("=")
+        if key.strip() not in FAKE_SPEC_KEYS:
+            raise ValueError(f"알 수 없는 가짜 모델 설정입니다: {item!r} (사용 가능: ttft, tps)")
+        options[FAKE_SPEC_KEYS[key.strip()]] = float(value)
+    return options
+
+
+class HashEmbeddings(Embeddings, BaseModel):
+    """
+    해시 기반 결정적 임베딩. 프로세스/실행마다 같은 텍스트에는 항상 같은 벡터를 반환합니다.
+    (Python 내장 hash()는 실행마다 달라지므로 md5를 사용합니다.)
+    """
+    size: int = 512
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r"[\w가-힣]+", text.lower())
+        features = list(words)
+        for word in words:
+            features.extend(word[i:i + 2] for i in range(len(word) - 1))
+        return features
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for feature in self._features(text):
+            h = int.from_bytes(hashlib.md5(feature.encode('utf-8')).digest()[:8], 'little')
+            vector[h % self.size] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    결정적인 답변을 돌려주는 가짜 채팅 모델. 같은 입력에는 항상 같은 답변을 생성합니다.
+
+    Attributes:
+        first_token_latency (float): 첫 토큰까지의 지연 (초)
+        tokens_per_second (float): 이후 토큰 생성 속도 (0이면 지연 없이 한 번에)
+    """
+    model_name: str = "fake"
+    first_token_latency: float = 0.0
+    tokens_per_second: float = 0.0
+
+    @classmethod
+    def from_model_name(cls, model: str) -> "FakeChatModel":
+        """"fake:ttft=0.8,tps=40" 형식의 모델 이름으로 생성합니다."""
+        return cls(model_name=model, **parse_fake_model(model))
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(m.content) for m in messages)
+        labels = re.findall(r"^(\[문서 \d+\]|\[#(?:[0-9a-f]+|p\d+)\])", prompt, re.MULTILINE)
+        last_line = prompt.strip().splitlines()[-1] if prompt.strip() else ""
+        # 첫 번째 참고 문서를 인용하여 인용 → 출처 대응 경로도 확인할 수 있게 합니다.
+        citation = f" {labels[0]}" if labels else ""
+        return (f"(모의 답변) 참고 문서 {len(labels)}건을 바탕으로 답변합니다{citation}. "
+                f"입력 길이 {len(prompt)}자, 마지막 줄: {last_line[:50]}")
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        """공백을 보존하면서 단어 단위로 분할합니다."""
+        return re.findall(r"\S+\s*", text)
+
+    def get_num_tokens(self, text: str) -> int:
+        # 기본 구현은 transformers의 GPT-2 토크나이저가 필요하므로 단어 수로 셉니다. (요약 메모리용)
+        return len(self._tokens(text))
+
+    def _delay(self, index: int) -> float:
+        """index번째 토큰을 내보내기 전의 대기 시간 (초)."""
+        if index == 0:
+            return self.first_token_latency
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _usage(self, messages: List[BaseMessage], tokens: List[str]) -> Dict[str, int]:
+        input_tokens = sum(self.get_num_tokens(str(m.content)) for m in messages)
+        return {"input_tokens": input_tokens, "output_tokens": len(tokens), "total_tokens": input_tokens + len(tokens)}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(self._answer(messages))
+        delay = sum(self._delay(index) for index in range(len(tokens)))
+        if delay:
+            time.sleep(delay)
+        message = AIMessage(content="".join(tokens), usage_metadata=self._usage(messages, tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        tokens = self._tokens(self._answer(messages))
+        for index, token in enumerate(tokens):
+            delay = self._delay(index)
+            if delay:
+                time.sleep(delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        # 실제 제공자(stream_usage)처럼 마지막 청크에 토큰 사용량을 담습니다.
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, tokens)))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._tokens(self._answer(messages))
+        for index, token in enumerate(tokens):
+            await asyncio.sleep(self._delay(index))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, tokens)))
@@ -1,22 +1,31 @@
 import streamlit as st
-from langchain_core.messages import ChatMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import AIMessage, ChatMessage, HumanMessage
 
-# LCEL 관련 추가 임포트
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda, RunnableMap
-from langchain_core.output_parsers import StrOutputParser
-
-# ConversationSummaryBufferMemory 사용
-from langchain.memory import ConversationSummaryBufferMemory
-
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
+# ConversationSummaryBufferMemory(langchain.memory)는 임포트가 무거워 첫 질문 시 get_session_memory()에서 임포트합니다.
 from dotenv import load_dotenv
 import os
-import pickle
-import yaml
+import sys
+import time
+from concurrent.futures import CancelledError
+
+# 프로젝트 루트를 Python 경로에 추가 (src 패키지 임포트용)
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.preprocessing.cascade import DEFAULT_CASCADE, ModelCascade, get_cascade_stats
+from src.preprocessing.rag_engine import FAKE_MODE
+from src.preprocessing.tenants import DEFAULT_TENANT, get_registry, get_tenant_engine, list_tenants, validate_tenant
+from src.preprocessing.tracing import TurnTrace, get_recorder, start_metrics_server
+from src.preprocessing.session_store import (
+    DISPLAY_ONLY_PREFIX, conversation_messages, display_only, evict_idle, get_session_store,
+)
+from src.preprocessing.condenser import DEFAULT_CONDENSE_MODEL, get_condenser
+from src.preprocessing.intent import get_intent_router
+from src.preprocessing.turn_executor import TurnHandle, get_turn_executor
+
+# 모델 캐스케이드 선택지 (cascade.py)
+AUTO_MODEL = f"🪜 자동 ({DEFAULT_CASCADE.small_model} → {DEFAULT_CASCADE.large_model})"
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 1. Streamlit 페이지 설정 (가장 먼저 실행되어야 함)
@@ -40,6 +49,10 @@ for sub in [".cache", ".cache/files", ".cache/embeddings"]:
     if not os.path.exists(sub):
         os.mkdir(sub)
 
+# Prometheus 지표 엔드포인트 (HR_RAG_METRICS_PORT 설정 시, 프로세스당 한 번만 시작)
+if os.getenv("HR_RAG_METRICS_PORT"):
+    start_metrics_server(int(os.getenv("HR_RAG_METRICS_PORT")))
+
 st.title("🏢 HR RAG 채팅봇")
 
 # 커스텀 CSS 스타일
@@ -198,45 +211,136 @@ if "is_generating" not in st.session_state:
 if "processing_user_input" not in st.session_state:
     st.session_state.processing_user_input = False
 
+# 실행 중인 턴 핸들 (⏹️ 또는 스크립트 중단 시 취소)
+if "active_turn" not in st.session_state:
+    st.session_state.active_turn = None
+
 # 사용자 입력이 한 번이라도 있었는지 추적하는 플래그 (웰컴 메시지 제어용)
 if "user_input_detected" not in st.session_state:
     st.session_state.user_input_detected = False
 
-# ConversationSummaryBufferMemory 시스템 초기화
+# 영구 세션 저장소 (기본 SQLite, 프로세스 재시작/레플리카 간에도 유지)
+session_store = get_session_store()
+
+# 메모리에 올려둘 세션 메모리 수와 유휴 제거 시간 (제거된 세션은 저장소에서 다시 로드)
+MAX_MEMORIES_IN_TAB = 5
+MEMORY_IDLE_SECONDS = 30 * 60
+
+# 고객사(테넌트) 선택 (URL 쿼리 파라미터 ?tenant=로 유지, 테넌트마다 별도 코퍼스/인덱스)
+if "tenant" not in st.session_state:
+    try:
+        st.session_state["tenant"] = validate_tenant(st.query_params.get("tenant"))
+    except ValueError:
+        st.session_state["tenant"] = DEFAULT_TENANT
+
+
+def current_engine():
+    """현재 탭에서 선택한 테넌트의 엔진 (인덱스는 첫 요청 시 지연 로드, 오래 안 쓴 테넌트는 자동으로 내려감)"""
+    return get_tenant_engine(st.session_state["tenant"])
+
+
+def stored_chat_messages(session_id: str):
+    """저장소의 세션 메시지를 화면 메시지로 복원합니다. (화면 전용으로 저장한 템플릿 응답 턴 포함)"""
+    return [
+        ChatMessage(role="user" if role in ("human", DISPLAY_ONLY_PREFIX + "human") else "assistant", content=content)
+        for role, content in session_store.load_messages(session_id)
+    ]
+
+
+# 브라우저 사용자 식별자 (URL 쿼리 파라미터로 유지되어 새로고침 후에도 같은 대화 목록을 복원)
+# 대화 목록은 테넌트별로 분리됩니다. (기본 테넌트는 기존 식별자 그대로)
+if "owner_id" not in st.session_state:
+    import uuid
+    owner_id = st.query_params.get("uid")
+    if not owner_id:
+        owner_id = uuid.uuid4().hex[:12]
+        st.query_params["uid"] = owner_id
+    if st.session_state["tenant"] != DEFAULT_TENANT:
+        owner_id = f"{st.session_state['tenant']}/{owner_id}"
+    st.session_state["owner_id"] = owner_id
+
+# ConversationSummaryBufferMemory 시스템 초기화 (현재 탭에서 최근 사용한 세션만 보관)
 if "memory_store" not in st.session_state:
     st.session_state["memory_store"] = {}
+    st.session_state["memory_last_used"] = {}
 
-# 멀티 대화 세션 관리
+# 멀티 대화 세션 관리 (세션 목록은 저장소에서 로드)
 if "chat_sessions" not in st.session_state:
-    st.session_state["chat_sessions"] = {}  # {session_id: {"title": str, "created_at": datetime}}
-    
-if "current_session_id" not in st.session_state:
-    # 첫 세션 자동 생성
-    import uuid
     from datetime import datetime
-    first_session_id = str(uuid.uuid4())[:8]
-    st.session_state["current_session_id"] = first_session_id
-    st.session_state["chat_sessions"][first_session_id] = {
-        "title": "새로운 대화",
-        "created_at": datetime.now()
+    st.session_state["chat_sessions"] = {  # {session_id: {"title": str, "created_at": datetime}}
+        session["session_id"]: {
+            "title": session["title"],
+            "created_at": datetime.fromtimestamp(session["created_at"]),
+        }
+        for session in session_store.list_sessions(st.session_state["owner_id"])
     }
+    
+if "current_session_id" not in st.session_state:
+    if st.session_state["chat_sessions"]:
+        # 가장 최근 세션 복원 (메시지는 전환 시점에 지연 로드)
+        latest_session_id = max(st.session_state["chat_sessions"].items(),
+                                key=lambda x: x[1]["created_at"])[0]
+        st.session_state["current_session_id"] = latest_session_id
+        st.session_state["messages"] = stored_chat_messages(latest_session_id)
+        st.session_state.user_input_detected = len(st.session_state["messages"]) > 0
+    else:
+        # 첫 세션 자동 생성
+        import uuid
+        from datetime import datetime
+        first_session_id = str(uuid.uuid4())[:8]
+        st.session_state["current_session_id"] = first_session_id
+        st.session_state["chat_sessions"][first_session_id] = {
+            "title": "새로운 대화",
+            "created_at": datetime.now()
+        }
+        session_store.create_session(st.session_state["owner_id"], first_session_id, "새로운 대화")
 
 if "session_counter" not in st.session_state:
     st.session_state["session_counter"] = 1
 
 # 세션 ID를 기반으로 ConversationSummaryBufferMemory를 가져오는 함수
-def get_session_memory(session_id: str):
-    """세션 ID를 기반으로 ConversationSummaryBufferMemory를 반환"""
-    if session_id not in st.session_state["memory_store"]:
-        # 임시 LLM으로 메모리 초기화 (나중에 실제 LLM으로 교체)
-        temp_llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0)
-        st.session_state["memory_store"][session_id] = ConversationSummaryBufferMemory(
-            llm=temp_llm,
+def get_session_memory(session_id: str, trace: TurnTrace = None):
+    """
+    세션 ID를 기반으로 ConversationSummaryBufferMemory를 반환
+    메모리에 없으면 저장소의 누적 요약과 최근 버퍼 메시지로 복원하고, 오래 사용하지 않은 다른 세션 메모리는 내립니다.
+    """
+    memory_store = st.session_state["memory_store"]
+    if trace is not None:
+        trace.set(memory_cache_hits=int(session_id in memory_store))
+    if session_id not in memory_store:
+        from langchain.memory import ConversationSummaryBufferMemory
+
+        # 공용 LLM 풀의 클라이언트로 메모리 초기화 (질문 시 현재 선택된 모델로 교체)
+        memory = ConversationSummaryBufferMemory(
+            llm=current_engine().get_llm("gpt-3.5-turbo", temperature=0, streaming=False),
             max_token_limit=1000,
             return_messages=True,
             memory_key="chat_history",
         )
-    return st.session_state["memory_store"][session_id]
+        summary, buffer_len = session_store.load_summary(session_id)
+        if buffer_len:
+            memory.chat_memory.messages = [
+                HumanMessage(content=content) if role == "human" else AIMessage(content=content)
+                for role, content in conversation_messages(session_store.load_messages(session_id), limit=buffer_len)
+            ]
+        memory.moving_summary_buffer = summary
+        memory_store[session_id] = memory
+
+    st.session_state["memory_last_used"][session_id] = time.time()
+    evict_idle(memory_store, st.session_state["memory_last_used"],
+               MEMORY_IDLE_SECONDS, MAX_MEMORIES_IN_TAB, keep=session_id)
+    return memory_store[session_id]
+
+
+def persist_turn(session_id: str, memory, question: str, answer: str):
+    """완료된 한 턴(질문/답변)과 메모리의 누적 요약을 저장소에 기록합니다. (배치 기록)"""
+    session_store.append_messages(session_id, [("human", question), ("ai", answer)])
+    session_store.save_summary(session_id, memory.moving_summary_buffer, len(memory.chat_memory.messages))
+
+
+def persist_display_turn(session_id: str, question: str, answer: str):
+    """템플릿으로 답한 턴을 화면 표시용으로만 저장합니다. (요약 메모리와 버퍼 메시지 수는 그대로)"""
+    session_store.append_messages(session_id, display_only([("human", question), ("ai", answer)]))
 
 # 멀티 세션 관리 함수들
 def create_new_session():
@@ -250,6 +354,7 @@ def create_new_session():
         "created_at": datetime.now()
     }
     st.session_state["current_session_id"] = new_session_id
+    session_store.create_session(st.session_state["owner_id"], new_session_id, "새로운 대화")
     st.session_state["messages"] = []  # 새 세션의 UI 메시지 초기화
     st.session_state.user_input_detected = False  # 웰컴 메시지 표시를 위해
     return new_session_id
@@ -261,6 +366,8 @@ def delete_session(session_id: str):
     
     if session_id in st.session_state["memory_store"]:
         del st.session_state["memory_store"][session_id]
+    st.session_state["memory_last_used"].pop(session_id, None)
+    session_store.delete_session(session_id)
     
     # 현재 세션이 삭제된 경우 다른 세션으로 전환
     if st.session_state["current_session_id"] == session_id:
@@ -272,21 +379,11 @@ def delete_session(session_id: str):
             create_new_session()
 
 def switch_to_session(session_id: str):
-    """다른 세션으로 전환"""
+    """다른 세션으로 전환 (UI 메시지만 저장소에서 로드하고, 대화 메모리는 첫 질문 시 지연 로드)"""
     st.session_state["current_session_id"] = session_id
     
-    # 해당 세션의 UI 메시지 로드 (메모리에서 복원)
-    if session_id in st.session_state["memory_store"]:
-        memory = st.session_state["memory_store"][session_id]
-        messages = memory.chat_memory.messages
-        
-        # UI 메시지 리스트 재구성
-        st.session_state["messages"] = []
-        for msg in messages:
-            role = "user" if msg.type == "human" else "assistant"
-            st.session_state["messages"].append(ChatMessage(role=role, content=msg.content))
-    else:
-        st.session_state["messages"] = []
+    # 해당 세션의 UI 메시지 로드 (저장소에서 복원, 세션당 최근 메시지 수 제한)
+    st.session_state["messages"] = stored_chat_messages(session_id)
     
     # 웰컴 메시지 표시 여부 결정
     st.session_state.user_input_detected = len(st.session_state["messages"]) > 0
@@ -302,6 +399,7 @@ def update_session_title(session_id: str, new_title: str):
     """세션 제목 업데이트"""
     if session_id in st.session_state["chat_sessions"]:
         st.session_state["chat_sessions"][session_id]["title"] = new_title
+        session_store.update_title(session_id, new_title)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -356,24 +454,56 @@ with st.sidebar:
     # 설정 섹션
     st.subheader("⚙️ 설정")
 
-    # 모델 선택
+    # 고객사(테넌트) 선택: 바꾸면 해당 테넌트의 대화 목록과 인덱스로 전환
+    tenants = list_tenants()
+    if st.session_state["tenant"] not in tenants:
+        tenants.append(st.session_state["tenant"])
+    selected_tenant = st.selectbox("🏢 고객사", tenants, index=tenants.index(st.session_state["tenant"]))
+    if selected_tenant != st.session_state["tenant"]:
+        st.query_params["tenant"] = selected_tenant
+        for key in ("tenant", "owner_id", "chat_sessions", "current_session_id", "memory_store",
+                    "memory_last_used", "messages", "chain", "retriever_ready"):
+            st.session_state.pop(key, None)
+        st.rerun()
+
+    # 모델 선택 (자동: 소형 모델로 먼저 답하고 근거가 약할 때만 대형 모델로 다시 답함)
     selected_model = st.selectbox(
         "🤖 LLM 모델",
-        ["gpt-3.5-turbo", "gpt-4o-mini", "gpt-4o"],
+        ["gpt-3.5-turbo", "gpt-4o-mini", "gpt-4o", AUTO_MODEL],
         index=1,
+        help="자동은 검색 관련도가 낮거나 소형 모델 답변의 근거(인용, 참고 문서 일치도)가 약할 때만 대형 모델을 사용합니다. "
+             "비용은 줄지만 답변이 초안 확인 후 한 번에 표시되어 첫 글자가 늦게 나옵니다.",
     )
+    if FAKE_MODE:
+        st.caption("🧪 가짜 모델 모드 (HR_RAG_FAKE): 선택한 모델 대신 가짜 LLM/임베딩으로 답변합니다.")
+
+    # 적응형 검색 수 (관련도 임계값/점수 차/토큰 예산으로 질문마다 문서 수를 정함, 아래 값은 최대값)
+    adaptive_k = st.toggle("🎯 적응형 검색 수", value=False,
+                           help="관련도가 낮거나 앞 문서보다 크게 떨어지는 문서, 토큰 예산을 넘는 문서는 빼고 보냅니다. "
+                                "쉬운 질문은 1~2개, 어려운 질문은 더 많은 문서를 사용합니다.")
 
     # 검색 문서 수
-    k = st.number_input("📄 검색할 문서 수", min_value=1, max_value=10, value=3)
+    if adaptive_k:
+        # 기본값은 보정된 정책의 max_k (adaptive_k.json, 보정 시 recall을 잰 값과 같게)
+        k = st.number_input("📄 최대 검색 문서 수", min_value=1, max_value=10,
+                            value=min(current_engine().adaptive_policy().max_k, 10))
+    else:
+        k = st.number_input("📄 검색할 문서 수", min_value=1, max_value=10, value=3)
+
+    # 후속 질문 재작성 ("그럼 그 경우에는?" → 독립 질문으로 바꿔 원래 질문 검색과 병렬로 재검색)
+    rewrite_followups = st.toggle("🔁 후속 질문 재작성", value=True,
+                                  help="대화 기록을 참고해 후속 질문을 독립 질문으로 바꿔 검색합니다. "
+                                       "독립된 질문은 그대로 검색하고, 같은 재작성은 캐시를 사용합니다.")
+
+    # 부모 문서 모드 (작은 청크로 검색하고, 청크가 속한 상담 사례 전체를 컨텍스트로 사용)
+    parent_retrieval = st.toggle("📚 상담 사례 전체 참고", value=False,
+                                 help="청크 조각 대신 검색된 청크가 속한 상담 한 건(PDF는 페이지) 전체를 답변에 사용합니다.")
     
     st.divider()
 
-    # 현재 세션 메모리 상태 표시
-    if current_session in st.session_state.get("memory_store", {}):
-        session_memory = st.session_state["memory_store"][current_session]
-        # ConversationSummaryBufferMemory의 메시지는 chat_memory.messages에 있음
-        message_count = len(session_memory.chat_memory.messages)
-        turns = message_count // 2
+    # 현재 세션 대화 상태 표시 (저장소에 보관된 메시지 기준)
+    if st.session_state["messages"]:
+        turns = len(st.session_state["messages"]) // 2
         st.info(f"💭 현재 대화: {turns}턴 저장중")
     else:
         st.info(f"💭 현재 대화: 새로운 대화")
@@ -382,12 +512,44 @@ with st.sidebar:
     if st.button("🗑️ 현재 대화 초기화", use_container_width=True):
         if current_session in st.session_state.get("memory_store", {}):
             st.session_state["memory_store"][current_session].clear()
+        session_store.clear_messages(current_session)
         st.session_state["messages"] = []
         st.session_state.user_input_detected = False
         st.rerun()
 
     st.divider()
 
+    # 지연 시간 디버그 패널 (마지막 턴의 단계별 소요 시간)
+    with st.expander("🔍 디버그: 응답 지연 시간"):
+        last_trace = get_recorder().last()
+        if last_trace:
+            st.caption(f"trace {last_trace['trace_id']} · 총 {last_trace['duration_ms']:.0f}ms")
+            st.table([
+                {"단계": span["name"], "ms": span["duration_ms"],
+                 **{key: value for key, value in span.items() if key not in ("name", "duration_ms")}}
+                for span in last_trace["spans"]
+            ])
+            st.caption("단계별 평균 (이 프로세스)")
+            st.table(get_recorder().stage_summary())
+            tenant_stats = get_registry().stats()
+            st.caption(f"테넌트 인덱스: {', '.join(tenant_stats['loaded_tenants']) or '-'} · "
+                       f"{tenant_stats['loaded_mb']}/{tenant_stats['max_mb']} MB · 내림 {tenant_stats['evictions']}회")
+            stats = get_condenser().stats
+            st.caption(f"질문 재작성: 우회 {stats['bypassed']} · 캐시 적중 {stats['cache_hits']} · LLM 호출 {stats['llm_calls']}")
+            intents = get_intent_router(current_engine()).summary()
+            st.caption(f"의도 분류: 인사 {intents['greeting']} · 감사 {intents['thanks']} · 노무 외 {intents['off_topic']} · "
+                       f"노무 {intents['hr']} (검색 없이 응답 {intents['short_circuit_rate'] * 100:.0f}%)")
+            cascade = get_cascade_stats().summary()
+            if cascade["answers"]:
+                avg_cost = f"${cascade['avg_cost_usd']:.4f}" if cascade["avg_cost_usd"] is not None else "-"
+                st.caption(f"모델 캐스케이드: 대형 모델 전환 {cascade['escalated']}/{cascade['answers']} "
+                           f"({cascade['escalation_rate'] * 100:.0f}%) · 평균 {cascade['avg_latency_ms']:.0f}ms · "
+                           f"답변당 {avg_cost}")
+        else:
+            st.caption("아직 기록된 턴이 없습니다.")
+
+    st.divider()
+
     # 시스템 정보
     st.info(
         """
@@ -419,145 +581,111 @@ def add_message(role: str, content: str):
     st.session_state["messages"].append(ChatMessage(role=role, content=content))
 
 
-def format_docs(docs):
-    """검색된 문서를 프롬프트에 주입할 형식으로 포맷팅"""
-    return "\n\n".join(doc.page_content for doc in docs)
+def render_citations(answer: str):
+    """답변에 인용된 [#ID]를 위치 표로 출처에 대응시켜 펼쳐볼 수 있게 표시 (추가 검색 없음)"""
+    citations = current_engine().resolve_citations(answer)
+    if not citations:
+        return
+    with st.expander(f"📎 인용 출처 {len(citations)}건"):
+        for citation in citations:
+            st.markdown(f"**[#{citation['id']}]** {citation['label']}")
+            st.caption(citation["text"][:500])
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# 7. HR Documents → FAISS Retriever 생성
+# 7. HR Documents → FAISS Retriever 생성 (공용 RagEngine)
 # ─────────────────────────────────────────────────────────────────────────────
-@st.cache_resource(show_spinner=False)
 def create_retriever():
-    """기존에 전처리된 documents.pkl에서 FAISS 검색기를 생성합니다."""
+    """
+    프로세스 공용 인덱스를 준비합니다. (프로세스당 한 번만 로드, 세션은 절대 재구축하지 않음)
+    인덱스는 st.session_state가 아닌 공용 SharedIndex에 있으며, 아티팩트가 바뀌면 자동으로 교체됩니다.
+    """
 
     try:
-        # 간단한 경로 해결
-        # 1. 현재 파일 기준 경로
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        documents_path = os.path.join(current_dir, 'data', 'processed', 'documents.pkl')
-        
-        # 2. 안 되면 프로젝트 루트 기준
-        if not os.path.exists(documents_path):
-            project_root = os.path.join(current_dir, '..', '..')  # src/preprocessing에서 2단계 위로
-            documents_path = os.path.join(project_root, 'data', 'processed', 'documents.pkl')
-        
-        # 3. 그래도 안 되면 작업 디렉토리 기준
-        if not os.path.exists(documents_path):
-            documents_path = os.path.join(os.getcwd(), 'data', 'processed', 'documents.pkl')
-        
-        if not os.path.exists(documents_path):
-            st.error(f"❌ documents.pkl 파일을 찾을 수 없습니다.")
-            st.info("💡 해결방법: 터미널에서 '000. Project_rag' 폴더로 이동 후 실행해주세요.")
-            return None
-
-        with open(documents_path, 'rb') as f:
-            documents = pickle.load(f)
-
-        # 2) 텍스트 분할
-        splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-        split_docs = splitter.split_documents(documents)
-
-        # 3) 임베딩 생성 (OpenAI 우선 사용)
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-
-        if openai_api_key:
-            embeddings = OpenAIEmbeddings()
-        else:
+        if not FAKE_MODE and not os.getenv("OPENAI_API_KEY"):
             st.error("❌ API 키가 설정되지 않았습니다.")
             return None
 
-        # 4) FAISS 인덱스 생성
-        vectorstore = FAISS.from_documents(documents=split_docs, embedding=embeddings)
-
-        return vectorstore
+        shared_index = current_engine().shared_index
+        shared_index.current()  # 최초 1회 로드 (이미 로드되어 있으면 즉시 반환)
+        return shared_index
 
+    except FileNotFoundError:
+        st.error(f"❌ documents.pkl 파일을 찾을 수 없습니다.")
+        tenant_option = "" if st.session_state["tenant"] == DEFAULT_TENANT else f" --tenant {st.session_state['tenant']}"
+        st.info(f"💡 해결방법: 먼저 'python run_preprocessing.py{tenant_option}'로 전처리를 실행해주세요.")
+        return None
     except Exception as e:
         st.error(f"❌ 검색기 생성 중 오류: {str(e)}")
         return None
 
 # get_retriever 함수에서 score_threshold 매개변수 제거
-def get_retriever(vectorstore, k=3):
-    """Vectorstore에서 검색기를 생성합니다."""
-    return vectorstore.as_retriever(search_kwargs={"k": k})
+def get_retriever(k=3):
+    """공용 인덱스의 현재 버전을 검색하는 검색기를 생성합니다."""
+    return current_engine().as_retriever(k)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 8. 새로운 체인 생성 함수 (ConversationSummaryBufferMemory 방식)
 # ─────────────────────────────────────────────────────────────────────────────
-def create_chain(retriever, model="gpt-3.5-turbo"):
-    """ConversationSummaryBufferMemory를 사용한 RAG 체인 생성"""
-    
-    try:
-        # 1. 프롬프트 로드
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        prompt_path = os.path.join(current_dir, 'prompt', 'qa_prompt.yaml')
-        
-        if not os.path.exists(prompt_path):
-            st.error(f"❌ 프롬프트 파일을 찾을 수 없습니다: {prompt_path}")
-            return None
+# 후속 질문 재작성용 모델 (답변 모델보다 작고 빠른 모델)
+REWRITE_MODEL = DEFAULT_CONDENSE_MODEL
 
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            prompt_config = yaml.safe_load(f)
 
-        # 프롬프트 설정 (chat_history를 문자열로 처리)
-        system_prompt = """당신은 대한민국의 친절하고 유능한 노무 전문가 AI입니다. 
+def chat_model_name(model: str) -> str:
+    """사이드바에서 선택한 모델 이름을 사용할 LLM 모델 이름으로 변환합니다. (자동이면 요약 메모리용 소형 모델)"""
+    if model == AUTO_MODEL:
+        return DEFAULT_CASCADE.small_model
+    return model if model.startswith("gpt") else "gpt-3.5-turbo"
 
-**응답 지침:**
-1. 이전 대화 내용을 참고하여 연속적이고 일관된 답변을 제공해주세요.
-2. 법적 근거를 명확히 제시해주세요.
-3. 실무적인 절차와 방법을 구체적으로 안내해주세요.
-4. 주의사항이나 예외 상황도 함께 설명해주세요.
 
-**이전 대화 기록:**
-{chat_history}
-
-**참고 문서:**
-{context}"""
+def create_chain():
+    """
+    ConversationSummaryBufferMemory를 사용한 RAG 체인 생성 (공용 RagEngine의 프롬프트/LLM 사용)
+    k와 모델은 요청마다 인자로 전달되므로, 사이드바 설정을 바꿔도 체인을 다시 만들 필요가 없습니다.
+    """
+    
+    try:
+        engine = current_engine()
 
-        # ChatPromptTemplate 생성 (MessagesPlaceholder 없이 단순한 문자열 방식)
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("human", "{question}")
-        ])
+        # 1. 프롬프트 로드 확인 (src/prompt/qa_prompt.yaml, 프로세스당 한 번만 컴파일)
+        if engine.prompt is None:
+            return None
 
-        # 2. LLM 생성
-        if model.startswith("gpt"):
-            llm = ChatOpenAI(model=model, temperature=0, streaming=True)
-        else:
-            llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0, streaming=True)
+        # 2. 체인 실행 함수 (메모리와 함께 실행, LLM은 프로세스 공용 풀에서 가져옴)
+        def run_chain_with_memory(question: str, session_id: str, trace: TurnTrace = None,
+                                  k: int = 3, model: str = "gpt-3.5-turbo", rewrite: bool = False,
+                                  parents: bool = False, adaptive: bool = False) -> TurnHandle:
+            """
+            메모리를 포함하여 체인 실행 (trace가 주어지면 단계별 소요 시간을 기록)
+            턴 전체(대화 기록 로드 ∥ 검색 → 스트리밍 → 요약 저장)를 비동기 실행기에 제출하고 TurnHandle을 반환합니다.
+            rewrite=True이면 후속 질문을 독립 질문으로 바꿔 병렬로 재검색합니다.
+            parents=True이면 검색된 청크 대신 부모 문서(상담 한 건) 전체를 컨텍스트로 사용합니다.
+            adaptive=True이면 k를 최대값으로 관련도/토큰 예산에 따라 검색 문서 수를 정합니다.
+            model이 AUTO_MODEL이면 모델 캐스케이드(소형 → 필요 시 대형)로 답합니다.
+            """
+            trace = trace or TurnTrace()
+            engine = current_engine()  # 테넌트 사용 시각 갱신 (메모리 상한 LRU)
+            llm = engine.get_llm(chat_model_name(model), temperature=0, streaming=True)
 
-        # 3. 체인 생성 함수 (메모리와 함께 실행)
-        def run_chain_with_memory(question: str, session_id: str):
-            """메모리를 포함하여 체인 실행"""
             # 현재 세션의 메모리 가져오기
-            memory = get_session_memory(session_id)
+            with trace.span("get_session_memory"):
+                memory = get_session_memory(session_id, trace)
             
             # 메모리 LLM 업데이트 (현재 선택된 모델로)
             memory.llm = llm
             
-            # 메모리에서 대화 기록 가져오기
-            memory_variables = memory.load_memory_variables({})
-            chat_history = memory_variables.get("chat_history", "")
-            
-            # 관련 문서 검색
-            docs = retriever.get_relevant_documents(question)
-            context = format_docs(docs)
-            
-            # 프롬프트에 변수 전달
-            formatted_prompt = prompt.format_messages(
-                chat_history=chat_history,
-                context=context,
-                question=question
+            # 대화 기록 로드 ∥ 관련 문서 검색 (∥ 후속 질문 재작성 후 재검색) → 스트리밍 → 요약 저장/기록
+            return get_turn_executor().submit(
+                engine, question, memory, llm,
+                k=k,
+                condenser=get_condenser(REWRITE_MODEL) if rewrite else None,
+                trace=trace,
+                parents=parents,
+                adaptive=adaptive,
+                cascade=ModelCascade() if model == AUTO_MODEL else None,
+                persist=lambda answer: persist_turn(session_id, memory, question, answer),
             )
-            
-            # 스트리밍을 위해 필요한 정보 반환
-            return {
-                "llm": llm,
-                "formatted_prompt": formatted_prompt,
-                "memory": memory,
-                "question": question
-            }
         
         return run_chain_with_memory
 
@@ -572,83 +700,17 @@ def create_chain(retriever, model="gpt-3.5-turbo"):
 # ─────────────────────────────────────────────────────────────────────────────
 # 9. 메인 로직
 # ─────────────────────────────────────────────────────────────────────────────
-# 시스템 초기화 (최초 1회만)
+# 시스템 초기화 (최초 1회만, 이후 k/모델 변경은 요청마다 인자로 전달)
 if not st.session_state["retriever_ready"]:
     with st.spinner("🚀 시스템 준비 중..."):
-        # 캐시 클리어 (임베딩 변경으로 인해)
-        st.cache_resource.clear()
-        
-        vectorstore = create_retriever()
-        if vectorstore:
-            retriever = get_retriever(vectorstore, k)
-            st.session_state["vectorstore"] = vectorstore
-            st.session_state["chain"] = create_chain(retriever, selected_model)
+        shared_index = create_retriever()
+        if shared_index:
+            st.session_state["chain"] = create_chain()
             st.session_state["retriever_ready"] = True
         else:
             st.error("❌ 시스템 초기화 실패")
             st.stop()
 
-# 설정 변경 시 체인 재생성
-# 사이드바 설정 (k, selected_model) 변경 감지
-# 변경이 감지되면 체인을 재생성합니다.
-if st.session_state["retriever_ready"]:
-    # 이전 설정값들 저장 및 비교
-    prev_k = st.session_state.get("prev_k", None)
-    prev_model = st.session_state.get("prev_model", None)
-    
-    # 설정이 변경된 경우에만 체인 재생성
-    if prev_k != k or prev_model != selected_model:
-        # 🔧 모델 변경 시 UI 상태 플래그 초기화
-        st.session_state.is_generating = False
-        st.session_state.stop_generation = False
-        st.session_state.processing_user_input = False
-        
-        try:
-            with st.spinner("🔄 설정 변경 중..."):
-                current_retriever = get_retriever(st.session_state["vectorstore"], k)
-                new_chain = create_chain(current_retriever, selected_model)
-                
-                if new_chain is not None:
-                    st.session_state["chain"] = new_chain
-                    # 현재 설정값 저장
-                    st.session_state["prev_k"] = k
-                    st.session_state["prev_model"] = selected_model
-                    
-                    # 설정 변경 알림 (잠깐 표시)
-                    if prev_model is not None and prev_model != selected_model:
-                        st.success(f"✅ 모델이 {selected_model}로 변경되었습니다!")
-                        # 페이지 새로고침으로 UI 상태 완전 초기화
-                        st.rerun()
-                else:
-                    st.error("❌ 새로운 설정으로 체인 생성에 실패했습니다.")
-                    # 이전 모델로 롤백 시도
-                    if prev_model and prev_model != selected_model:
-                        st.info(f"🔄 이전 모델({prev_model})로 롤백을 시도합니다...")
-                        try:
-                            rollback_chain = create_chain(current_retriever, prev_model)
-                            if rollback_chain is not None:
-                                st.session_state["chain"] = rollback_chain
-                                st.warning(f"⚠️ {prev_model} 모델로 롤백되었습니다.")
-                            else:
-                                st.error("❌ 롤백도 실패했습니다. 페이지를 새로고침해주세요.")
-                        except Exception as rollback_error:
-                            st.error(f"❌ 롤백 중 오류: {str(rollback_error)}")
-        except Exception as e:
-            st.error(f"❌ 설정 변경 중 오류: {str(e)}")
-            # 특정 오류 메시지에 따른 안내
-            if "duplicate validator" in str(e):
-                st.info("💡 라이브러리 충돌이 발생했습니다. 페이지를 새로고침하거나 다른 모델을 선택해주세요.")
-            
-            # 오류 시에도 상태 초기화
-            st.session_state.is_generating = False
-            st.session_state.stop_generation = False
-            st.session_state.processing_user_input = False
-    else:
-        # 첫 실행 시 설정값 저장
-        if prev_k is None:
-            st.session_state["prev_k"] = k
-            st.session_state["prev_model"] = selected_model
-
 
 # 이전 대화 기록 출력
 def print_previous_messages():
@@ -662,7 +724,10 @@ def print_previous_messages():
             messages_to_show = messages_to_show[:-1]
     
     for chat_message in messages_to_show:
-        st.chat_message(chat_message.role).write(chat_message.content)
+        with st.chat_message(chat_message.role):
+            st.write(chat_message.content)
+            if chat_message.role == "assistant":
+                render_citations(chat_message.content)
 
 # 이전 대화 기록 표시
 print_previous_messages()
@@ -714,6 +779,8 @@ if st.session_state.get('is_generating', False):
     
     with col2:
         if st.button("⏹️", key="stop_button", help="답변 중지", use_container_width=True, type="primary"):
+            if st.session_state.active_turn is not None:
+                st.session_state.active_turn.cancel()
             st.session_state.stop_generation = True
             st.session_state.is_generating = False
             st.session_state.processing_user_input = False
@@ -722,6 +789,8 @@ if st.session_state.get('is_generating', False):
             
     # 🆘 추가 안전장치: 강제 초기화 버튼
     if st.button("🔄 상태 초기화", key="force_reset", help="UI 상태를 강제로 초기화합니다"):
+        if st.session_state.active_turn is not None:
+            st.session_state.active_turn.cancel()
         st.session_state.is_generating = False
         st.session_state.stop_generation = False
         st.session_state.processing_user_input = False
@@ -751,8 +820,7 @@ if user_input:
         if st.session_state.get("retriever_ready", False):
             try:
                 with st.spinner("🔄 시스템 재초기화 중..."):
-                    current_retriever = get_retriever(st.session_state["vectorstore"], k)
-                    new_chain = create_chain(current_retriever, selected_model)
+                    new_chain = create_chain()
                     
                     if new_chain is not None:
                         st.session_state["chain"] = new_chain
@@ -777,63 +845,93 @@ if user_input:
 
     # 2. AI 응답 생성 및 스트리밍 표시
     ai_answer = ""
+    trace = TurnTrace(session_id=current_session_id, model=selected_model, k=k)
     with st.chat_message("assistant"):
+        stop_placeholder = st.empty()
         container = st.empty()
         generation_stopped = False # 실제로 중단되었는지 여부를 추적
+        handle = None
+        answer_saved = False
 
         try:
-            # ConversationSummaryBufferMemory 체인 실행 (스트리밍)
+            # ConversationSummaryBufferMemory 체인 실행 (이벤트 루프 스레드에서 비동기 실행)
             # 사이드바에서 설정된 current_session_id 사용
             current_session_id = st.session_state["current_session_id"]
-
-            # 체인 함수 호출하여 필요한 정보 가져오기
-            chain_info = chain(user_input, current_session_id)
-            llm = chain_info["llm"]
-            formatted_prompt = chain_info["formatted_prompt"]
-            memory = chain_info["memory"]
-            question = chain_info["question"]
-            
-            # 스트리밍 응답
-            for chunk in llm.stream(formatted_prompt):
-                if st.session_state.stop_generation:
+            question = user_input
+            # 인사/감사/노무 외 질문은 검색과 답변 모델 없이 템플릿으로 바로 답합니다. (요약 메모리에는 남기지 않음)
+            intent = get_intent_router(current_engine()).route(
+                question, has_history=len(st.session_state["messages"]) > 1, trace=trace
+            )
+            if intent.short_circuit:
+                ai_answer = intent.answer
+                container.markdown(ai_answer)
+                add_message("assistant", ai_answer)
+                persist_display_turn(current_session_id, question, ai_answer)
+                answer_saved = True
+            else:
+                handle = chain(question, current_session_id, trace, k=k, model=selected_model,
+                               rewrite=rewrite_followups, parents=parent_retrieval, adaptive=adaptive_k)
+                st.session_state.active_turn = handle
+
+                # ⏹️을 누르면 Streamlit이 다음 화면 갱신 시점에 이 실행을 중단하고, finally에서 턴을 취소합니다.
+                # 토큰이 없는 동안(검색, 첫 토큰 대기)에도 주기적으로 화면을 갱신해 중지 입력을 바로 반영합니다.
+                stop_placeholder.button("⏹️ 답변 중지", key="stop_stream", help="답변 중지")
+                for text in handle.tokens(poll_interval=0.2):
+                    if st.session_state.stop_generation:
+                        handle.cancel()
+                        break
+                    if text:
+                        ai_answer += text
+                    # 스트리밍 UI 업데이트
+                    container.markdown(ai_answer + "▌") # 현재까지의 답변 + 커서 표시
+                stop_placeholder.empty()
+
+                # 최종 응답 표시 또는 중지 메시지
+                if handle.cancelled():
                     generation_stopped = True
-                    break # 중지 플래그가 True이면 루프를 즉시 중단
-                
-                ai_answer += chunk.content
+                    container.markdown(ai_answer + "\n\n**답변 생성이 중지되었습니다.**")
+                else:
+                    container.markdown(ai_answer)  # 최종 답변 (커서 제거)
+                    render_citations(ai_answer)
+                    handle.result()  # 요약 메모리 저장과 저장소 기록이 끝날 때까지 대기 (오류는 아래에서 처리)
+
+                # 완전한 답변만 대화에 추가 (메모리/저장소 기록은 턴 안에서 완료)
+                if not generation_stopped and ai_answer:
+                    answer_saved = True
+                    # 첫 번째 질문인 경우 대화 제목 자동 생성
+                    if len(st.session_state["messages"]) == 1:  # 이번 답변 추가 전 사용자 질문 1개 (첫 번째 대화)
+                        current_title = st.session_state["chat_sessions"][current_session_id]["title"]
+                        if current_title == "새로운 대화":  # 기본 제목인 경우만 업데이트
+                            new_title = generate_title_from_question(question)
+                            update_session_title(current_session_id, new_title)
                 
-                # 스트리밍 UI 업데이트
-                container.markdown(ai_answer + "▌") # 현재까지의 답변 + 커서 표시
+                    add_message("assistant", ai_answer)
 
-            # 최종 응답 표시 또는 중지 메시지
-            if generation_stopped:
-                container.markdown(ai_answer + "\n\n**답변 생성이 중지되었습니다.**")
-            else:
-                container.markdown(ai_answer)  # 최종 답변 (커서 제거)
-
-            # 메모리에 대화 저장 (완전한 답변만 저장)
-            if not generation_stopped and ai_answer:
-                memory.save_context(
-                    inputs={"human": question},
-                    outputs={"ai": ai_answer}
-                )
-                
-                # 첫 번째 질문인 경우 대화 제목 자동 생성
-                if len(memory.chat_memory.messages) == 2:  # human + ai = 2개 (첫 번째 대화)
-                    current_title = st.session_state["chat_sessions"][current_session_id]["title"]
-                    if current_title == "새로운 대화":  # 기본 제목인 경우만 업데이트
-                        new_title = generate_title_from_question(question)
-                        update_session_title(current_session_id, new_title)
-                
-                add_message("assistant", ai_answer)
+        except CancelledError:
+            generation_stopped = True
+            container.markdown(ai_answer + "\n\n**답변 생성이 중지되었습니다.**")
 
         except Exception as e:
             st.error(f"❌ 답변 생성 중 오류: {str(e)}")
             ai_answer = "죄송합니다. 답변 생성 중 오류가 발생했습니다."
             container.markdown(ai_answer)
             generation_stopped = True # 오류 발생 시에도 저장하지 않도록 처리
+            trace.set(error=str(e))
 
         finally:
+            # 스크립트가 중단된 경우(⏹️, 다른 위젯 조작)에도 진행 중인 턴을 취소해 스트리밍 연결을 즉시 끊습니다.
+            if handle is not None:
+                if handle.cancel():
+                    generation_stopped = True
+                # 스트리밍이 끝난 답변은 취소와 관계없이 메모리/저장소에 기록되므로 화면 대화에도 추가합니다.
+                if handle.stream_complete and ai_answer and not answer_saved and not trace.attrs.get("error"):
+                    add_message("assistant", ai_answer)
+            st.session_state.active_turn = None
+
+            # 턴 추적 기록 (JSONL + Prometheus 지표 + 디버그 패널)
+            trace.set(stopped=generation_stopped)
+            trace.finish()
+
             # LLM 생성 완료 또는 중단 시 is_generating 플래그를 False로 설정
             st.session_state.is_generating = False
             st.session_state.processing_user_input = False # 사용자 입력 처리 중 플래그 해제
-            st.rerun() # UI를 업데이트하여 중지 버튼 숨기기
\ No newline at end of file
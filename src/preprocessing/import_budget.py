@@ -0,0 +1,280 @@
+# src/preprocessing/import_budget.py
+"""
+진입점별 임포트 시간 예산 검사 / 콜드 스타트 리포트
+
+진입점마다 새 파이썬 프로세스에서 `python -X importtime -c "import ..."`를 실행하여
+- 임포트 누적 시간 (인터프리터 기본 시작분 제외)
+- 프로세스 콜드 스타트 벽시계 시간
+- 자체 임포트 시간이 가장 큰 패키지
+를 측정하고, 임포트 실패, 예산(ms) 초과 또는 지연 임포트해야 할 무거운 모듈(FAISS, 문서 로더, langchain.memory 등)이
+임포트 시점에 로드되면 실패로 표시합니다.
+
+시간 예산은 머신마다 달라 여유 있게 잡았고, 회귀를 확실히 잡는 것은 금지 모듈 검사입니다.
+실패가 있으면 종료 코드 1로 끝나므로 CI의 임포트 예산 테스트로 사용할 수 있습니다.
+
+사용법:
+    python -m src.preprocessing.import_budget
+    python -m src.preprocessing.import_budget --repeat 5 --output data/processed/cold_start_report.json
+    python -m src.preprocessing.import_budget --only rag_engine,api_server --scale 2.0
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..', '..'))
+DEFAULT_REPORT_PATH = os.path.join(PROJECT_ROOT, 'data', 'processed', 'cold_start_report.json')
+
+# 임포트 시점에 로드되면 안 되는(처음 사용하는 함수 안에서 임포트해야 하는) 무거운 모듈
+LAZY_MODULES = (
+    "yaml",
+    "pypdf",
+    "faiss",
+    "langchain_community.vectorstores",
+    "langchain_community.document_loaders",
+    "langchain_community.callbacks",
+    "langchain_text_splitters",
+    "langchain_openai",
+    "langchain_upstage",
+    "langchain_anthropic",
+    "langchain_teddynote",
+    "langchain.memory",
+)
+
+# 설치되지 않았으면 해당 진입점 측정을 건너뛰는 선택 의존성 (그 외 임포트 실패는 모두 실패로 처리)
+OPTIONAL_DEPENDENCIES = ("streamlit",)
+
+MISSING_MODULE = re.compile(r"No module named '([^']+)'")
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( +)(\S+)\s*$")
+
+
+@dataclass(frozen=True)
+class EntryPoint:
+    """
+    측정할 진입점.
+
+    Attributes:
+        name (str): 리포트에 표시할 이름
+        modules (Tuple[str, ...]): 임포트할 모듈 (Streamlit 앱은 스크립트 실행 없이 앱이 임포트하는 모듈들)
+        budget_ms (float): 임포트 누적 시간 예산
+        allowed (Tuple[str, ...]): 이 진입점에서는 임포트 시점 로드를 허용하는 LAZY_MODULES
+    """
+    name: str
+    modules: Tuple[str, ...]
+    budget_ms: float
+    allowed: Tuple[str, ...] = ()
+
+
+ENTRY_POINTS = (
+    EntryPoint("rag_engine", ("src.preprocessing.rag_engine",), 250),
+    EntryPoint("hr_rag_chat", (
+        "streamlit",
+        "langchain_core.messages",
+        "src.preprocessing.tenants",
+        "src.preprocessing.tracing",
+        "src.preprocessing.session_store",
+        "src.preprocessing.condenser",
+        "src.preprocessing.turn_executor",
+        "src.preprocessing.intent",
+    ), 1500),
+    EntryPoint("api_server", ("src.preprocessing.api_server",), 300),
+    EntryPoint("qa_chain", ("src.preprocessing.qa_chain",), 300),
+    EntryPoint("retriever", ("src.preprocessing.retriever",), 250),
+    EntryPoint("batch_qa", ("src.preprocessing.batch_qa",), 800),
+    EntryPoint("watcher", ("src.preprocessing.watcher",), 1500),
+    EntryPoint("corpus", ("src.preprocessing.corpus",), 300),
+    EntryPoint("run_preprocessing", ("src.preprocessing.main_preprocessor",), 1500),
+)
+
+
+def parse_importtime(stderr: str) -> List[Tuple[int, int, int, str]]:
+    """-X importtime 출력을 (자체 µs, 누적 µs, 깊이, 모듈) 리스트로 바꿉니다. (깊이 0 = 최상위 임포트)"""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            depth = (len(match.group(3)) - 1) // 2
+            entries.append((int(match.group(1)), int(match.group(2)), depth, match.group(4)))
+    return entries
+
+
+def total_import_ms(entries: List[Tuple[int, int, int, str]]) -> float:
+    """최상위 임포트의 누적 시간 합계 (ms)."""
+    return sum(cumulative for _, cumulative, depth, _ in entries if depth == 0) / 1000
+
+
+def heaviest_packages(entries: List[Tuple[int, int, int, str]], limit: int = 5) -> List[Dict[str, Any]]:
+    """자체 임포트 시간을 최상위 패키지(numpy, pandas, langchain_core ...)별로 합산해 무거운 순으로 반환합니다."""
+    by_package: Dict[str, int] = {}
+    for self_us, _, _, name in entries:
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    ranked = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [{"module": package, "ms": round(self_us / 1000, 1)} for package, self_us in ranked]
+
+
+def _run(code: str) -> Tuple[str, float]:
+    """새 인터프리터에서 code를 실행하고 (stderr, 벽시계 ms)를 반환합니다."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "임포트 실패")
+    return result.stderr, wall_ms
+
+
+def measure_entry_point(entry: EntryPoint, baseline: Dict[str, float]) -> Dict[str, Any]:
+    """
+    진입점 하나의 콜드 스타트를 측정합니다.
+
+    Returns:
+        Dict[str, Any]: import_ms, wall_ms, heaviest, lazy_violations
+    """
+    imports = "; ".join(f"import {module}" for module in entry.modules)
+    # 측정이 끝난 뒤 로드된 모듈 목록을 stdout 대신 stderr 마지막 줄로 출력 (importtime 출력과 함께 수집)
+    code = f"{imports}; import sys; print('MODULES=' + ','.join(sys.modules), file=sys.stderr)"
+    stderr, wall_ms = _run(code)
+
+    entries = parse_importtime(stderr)
+    loaded = set()
+    for line in stderr.splitlines():
+        if line.startswith("MODULES="):
+            loaded = set(line[len("MODULES="):].split(","))
+
+    import_ms = total_import_ms(entries) - baseline["import_ms"]
+    violations = [module for module in LAZY_MODULES if module in loaded and module not in entry.allowed]
+    return {
+        "import_ms": round(max(import_ms, 0.0), 1),
+        "wall_ms": round(wall_ms - baseline["wall_ms"], 1),
+        "heaviest": heaviest_packages(entries),
+        "lazy_violations": violations,
+    }
+
+
+def measure_baseline(repeat: int) -> Dict[str, float]:
+    """아무것도 임포트하지 않는 인터프리터 시작 비용 (진입점 측정값에서 뺍니다)."""
+    samples = []
+    for _ in range(repeat):
+        stderr, wall_ms = _run("pass")
+        samples.append((total_import_ms(parse_importtime(stderr)), wall_ms))
+    return {
+        "import_ms": statistics.median(sample[0] for sample in samples),
+        "wall_ms": statistics.median(sample[1] for sample in samples),
+    }
+
+
+def _missing_optional_dependency(error: str) -> bool:
+    """임포트 실패 원인이 OPTIONAL_DEPENDENCIES에 있는 패키지가 없어서인지 확인합니다."""
+    match = MISSING_MODULE.search(error)
+    return bool(match) and match.group(1).split(".")[0] in OPTIONAL_DEPENDENCIES
+
+
+def run_budget_check(entry_points=ENTRY_POINTS, repeat: int = 3, scale: float = 1.0) -> Dict[str, Any]:
+    """
+    진입점별로 repeat번 측정해 중앙값을 예산과 비교합니다.
+
+    Args:
+        repeat (int): 진입점별 측정 횟수 (첫 실행의 디스크 캐시 영향을 줄이기 위해 중앙값 사용)
+        scale (float): 예산 배율 (느린 CI 머신 등)
+
+    Returns:
+        Dict[str, Any]: 진입점별 결과와 전체 통과 여부
+    """
+    baseline = measure_baseline(repeat)
+    results = {}
+    for entry in entry_points:
+        try:
+            runs = [measure_entry_point(entry, baseline) for _ in range(repeat)]
+        except RuntimeError as e:
+            if _missing_optional_dependency(str(e)):
+                # 선택 의존성(streamlit)이 설치되지 않은 환경
+                print(f"⚠️ {entry.name}: 측정 건너뜀 ({e})")
+                results[entry.name] = {"skipped": str(e)}
+            else:
+                print(f"❌ {entry.name}: 임포트 실패 ({e})")
+                results[entry.name] = {"modules": list(entry.modules), "error": str(e), "passed": False}
+            continue
+        import_ms = statistics.median(run["import_ms"] for run in runs)
+        budget_ms = entry.budget_ms * scale
+        violations = runs[-1]["lazy_violations"]
+        results[entry.name] = {
+            "modules": list(entry.modules),
+            "import_ms": import_ms,
+            "wall_ms": statistics.median(run["wall_ms"] for run in runs),
+            "budget_ms": budget_ms,
+            "heaviest": runs[-1]["heaviest"],
+            "lazy_violations": violations,
+            "passed": import_ms <= budget_ms and not violations,
+        }
+    return {
+        "python": sys.version.split()[0],
+        "repeat": repeat,
+        "baseline_ms": {key: round(value, 1) for key, value in baseline.items()},
+        "entry_points": results,
+        "passed": all(result.get("passed", True) for result in results.values()),
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print("\n" + "=" * 78)
+    print(f"⏱️ 콜드 스타트 리포트 (Python {report['python']}, 중앙값 {report['repeat']}회, "
+          f"기본 시작 {report['baseline_ms']['wall_ms']:.0f}ms 제외)")
+    print("=" * 78)
+    print(f"{'진입점':<20}{'임포트(ms)':>12}{'벽시계(ms)':>12}{'예산(ms)':>10}  결과")
+    for name, result in report["entry_points"].items():
+        if "skipped" in result:
+            print(f"{name:<20}{'-':>12}{'-':>12}{'-':>10}  ⏭️ 건너뜀")
+            continue
+        if "error" in result:
+            print(f"{name:<20}{'-':>12}{'-':>12}{'-':>10}  ❌ 임포트 실패")
+            print(f"{'':<20}  {result['error']}")
+            continue
+        status = "✅" if result["passed"] else "❌"
+        print(f"{name:<20}{result['import_ms']:>12.1f}{result['wall_ms']:>12.1f}{result['budget_ms']:>10.0f}  {status}")
+        heaviest = ", ".join(f"{item['module']} {item['ms']:.0f}" for item in result["heaviest"][:3])
+        print(f"{'':<20}  가장 무거운 임포트: {heaviest}")
+        if result["lazy_violations"]:
+            print(f"{'':<20}  ⚠️ 임포트 시점에 로드된 무거운 모듈: {', '.join(result['lazy_violations'])}")
+    print("=" * 78)
+    print("✅ 모든 진입점이 예산 안에 있습니다." if report["passed"]
+          else "❌ 예산을 넘었거나 임포트에 실패한 진입점이 있습니다.")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="진입점별 임포트 시간 예산 검사 / 콜드 스타트 리포트")
+    parser.add_argument("--repeat", type=int, default=3, help="진입점별 측정 횟수 (중앙값 사용)")
+    parser.add_argument("--scale", type=float, default=1.0, help="예산 배율 (느린 머신에서 2.0 등)")
+    parser.add_argument("--only", default=None, help="측정할 진입점 (쉼표 구분)")
+    parser.add_argument("--output", default=DEFAULT_REPORT_PATH, help="리포트 JSON 저장 경로")
+    args = parser.parse_args(argv)
+
+    entry_points = ENTRY_POINTS
+    if args.only:
+        names = {name.strip() for name in args.only.split(",")}
+        entry_points = tuple(entry for entry in ENTRY_POINTS if entry.name in names)
+
+    report = run_budget_check(entry_points, repeat=max(args.repeat, 1), scale=args.scale)
+    print_report(report)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 리포트 저장: {args.output}")
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
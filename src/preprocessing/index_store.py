@@ -0,0 +1,404 @@
+# src/preprocessing/index_store.py
+"""
+프로세스 공용 FAISS 인덱스 저장소
+
+- SharedIndex: 프로세스당 하나의 읽기 전용 인덱스를 모든 세션이 공유합니다.
+  디스크의 아티팩트가 바뀌면 백그라운드에서 새 인덱스를 로드한 뒤 원자적으로 교체하고,
+  이전 버전은 사용 중인 요청(lease)이 모두 끝나면 해제합니다.
+- publish_index / load_published_index: 구축된 인덱스를 버전 디렉토리로 저장하고
+  CURRENT 포인터 파일을 원자적으로 갱신하여, 재시작 시 재임베딩 없이 로드합니다.
+  벡터 저장소에 부모 저장소(parent_store)가 연결되어 있으면 같은 버전 디렉토리에 함께 저장합니다.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.preprocessing.parent_store import ParentStore, attach_parent_store, get_parent_store
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+
+def file_fingerprint(path: str) -> Optional[Tuple[int, int]]:
+    """파일의 (수정 시각 ns, 크기)를 반환합니다. 파일이 없으면 None."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def read_current_version(index_root: str) -> Optional[str]:
+    """CURRENT 포인터 파일에 기록된 현재 인덱스 버전 이름을 반환합니다."""
+    try:
+        with open(os.path.join(index_root, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_atomic(path: str, content: str):
+    """임시 파일에 쓴 뒤 os.replace로 교체하여 읽는 쪽이 중간 상태를 보지 않도록 합니다."""
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def publish_index(vectorstore, index_root: str, manifest: Dict[str, Any], keep_versions: int = 3,
+                  activate: bool = True) -> str:
+    """
+    FAISS 벡터 저장소를 새 버전 디렉토리에 저장하고 CURRENT 포인터를 원자적으로 갱신합니다.
+
+    Args:
+        vectorstore: 저장할 FAISS 벡터 저장소
+        index_root (str): 버전 디렉토리들이 위치할 루트 디렉토리
+        manifest (Dict[str, Any]): 인덱스 생성 정보 (원본 지문, 임베딩 설정 등)
+        keep_versions (int): 보존할 최근 버전 수
+        activate (bool): False이면 버전 디렉토리만 만들고 CURRENT는 갱신하지 않습니다. (activate_version으로 나중에 전환)
+
+    Returns:
+        str: 게시된 버전 이름
+    """
+    os.makedirs(index_root, exist_ok=True)
+    version = f"v{time.time_ns()}"
+    version_dir = os.path.join(index_root, version)
+
+    vectorstore.save_local(version_dir)
+    parent_store = get_parent_store(vectorstore)
+    if parent_store is not None:
+        parent_store.save(version_dir)
+    # manifest는 마지막에 원자적으로 기록합니다. (manifest가 있는 버전 디렉토리만 완성된 것으로 취급)
+    manifest = dict(manifest, version=version, created_at=time.time())
+    _write_atomic(os.path.join(version_dir, MANIFEST_FILE), json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    if activate:
+        activate_version(index_root, version, keep_versions)
+    return version
+
+
+def activate_version(index_root: str, version: str, keep_versions: int = 3):
+    """CURRENT 포인터를 version으로 원자적으로 갱신하고 오래된 버전을 정리합니다."""
+    _write_atomic(os.path.join(index_root, CURRENT_FILE), version)
+    prune_versions(index_root, keep_versions)
+    print(f"✅ 인덱스 버전 '{version}'을(를) '{index_root}'에 게시했습니다.")
+
+
+def find_published_version(index_root: str, predicate: Callable[[Dict[str, Any]], bool]) -> Optional[str]:
+    """
+    CURRENT → 최신 버전 순으로 manifest가 predicate를 만족하는 버전을 찾습니다.
+    (감시 모드가 documents.pkl 교체와 CURRENT 갱신 사이에 있을 때도 이미 게시된 버전을 찾아 재임베딩을 피합니다)
+    """
+    if not os.path.isdir(index_root):
+        return None
+    current = read_current_version(index_root)
+    versions = sorted(
+        (name for name in os.listdir(index_root)
+         if name.startswith("v") and os.path.isdir(os.path.join(index_root, name))),
+        reverse=True,
+    )
+    for version in ([current] if current else []) + [name for name in versions if name != current]:
+        manifest = load_manifest(index_root, version)
+        if manifest is not None and predicate(manifest):
+            return version
+    return None
+
+
+def prune_versions(index_root: str, keep_versions: int = 3):
+    """CURRENT를 제외한 오래된 버전 디렉토리를 정리합니다."""
+    current = read_current_version(index_root)
+    versions = sorted(
+        name for name in os.listdir(index_root)
+        if name.startswith("v") and os.path.isdir(os.path.join(index_root, name))
+    )
+    for name in versions[:-keep_versions] if keep_versions > 0 else versions:
+        if name != current:
+            shutil.rmtree(os.path.join(index_root, name), ignore_errors=True)
+
+
+def load_manifest(index_root: str, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """지정한(또는 현재) 버전의 manifest를 반환합니다."""
+    version = version or read_current_version(index_root)
+    if not version:
+        return None
+    try:
+        with open(os.path.join(index_root, version, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _load_mmap(version_dir: str, embeddings):
+    """
+    FAISS 인덱스 파일을 읽기 전용 메모리 맵으로 엽니다. 벡터는 검색 시 필요한 페이지만 OS가 올리므로
+    여러 인덱스를 띄워도 상주 메모리가 적습니다. (docstore는 일반 로드)
+    """
+    import pickle
+
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.vectorstores.faiss import dependable_faiss_import
+
+    faiss = dependable_faiss_import()
+    index = faiss.read_index(os.path.join(version_dir, "index.faiss"), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    with open(os.path.join(version_dir, "index.pkl"), 'rb') as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def load_published_index(index_root: str, embeddings, mmap: bool = False,
+                         version: Optional[str] = None) -> Optional[Tuple[Any, Dict[str, Any]]]:
+    """
+    CURRENT가 가리키는(또는 지정한) 버전의 FAISS 인덱스를 로드합니다.
+
+    Args:
+        mmap (bool): True이면 인덱스 파일을 메모리 맵으로 엽니다. (지원하지 않는 인덱스면 일반 로드)
+        version (str): 로드할 버전 이름 (None이면 CURRENT)
+
+    Returns:
+        (vectorstore, manifest) 또는 게시된 인덱스가 없으면 None
+    """
+    from langchain_community.vectorstores import FAISS
+
+    version = version or read_current_version(index_root)
+    manifest = load_manifest(index_root, version)
+    if not version or manifest is None:
+        return None
+
+    # 직접 게시한 아티팩트만 로드하므로 pickle 역직렬화를 허용합니다.
+    version_dir = os.path.join(index_root, version)
+    vectorstore = None
+    if mmap:
+        try:
+            vectorstore = _load_mmap(version_dir, embeddings)
+        except Exception as e:
+            print(f"경고: 메모리 맵 로드 실패, 일반 로드로 진행합니다: {e}")
+    if vectorstore is None:
+        vectorstore = FAISS.load_local(version_dir, embeddings, allow_dangerous_deserialization=True)
+    attach_parent_store(vectorstore, ParentStore.load(version_dir))
+    return vectorstore, manifest
+
+
+class _IndexVersion:
+    """SharedIndex가 관리하는 인덱스 한 버전과 참조 카운트."""
+
+    def __init__(self, number: int, vectorstore, fingerprint):
+        self.number = number
+        self.vectorstore = vectorstore
+        self.fingerprint = fingerprint
+        self.refcount = 0
+        self.loaded_at = time.time()
+
+
+class IndexLease:
+    """
+    인덱스 한 버전을 빌려 쓰는 핸들. with 블록 동안 해당 버전은 해제되지 않습니다.
+
+    사용법:
+        with shared_index.acquire() as vectorstore:
+            docs = vectorstore.similarity_search(query, k=3)
+    """
+
+    def __init__(self, shared_index: "SharedIndex", version: _IndexVersion):
+        self._shared_index = shared_index
+        self._version = version
+        self._released = False
+
+    @property
+    def vectorstore(self):
+        return self._version.vectorstore
+
+    @property
+    def version(self) -> int:
+        return self._version.number
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._shared_index._release(self._version)
+
+    def __enter__(self):
+        return self._version.vectorstore
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class SharedIndex:
+    """
+    프로세스 공용, 읽기 전용 인덱스. 참조 카운트 기반 핫 리로드를 지원합니다.
+
+    Args:
+        loader (Callable[[], Any]): 새 벡터 저장소를 로드(또는 구축)하는 함수
+        fingerprint (Callable[[], Any]): 디스크 아티팩트의 현재 상태를 나타내는 값을 반환하는 함수.
+            값이 바뀌면 인덱스를 다시 로드합니다.
+        check_interval (float): 아티팩트 변경 확인 최소 간격 (초)
+    """
+
+    def __init__(self, loader: Callable[[], Any], fingerprint: Callable[[], Any],
+                 check_interval: float = 10.0):
+        self._loader = loader
+        self._fingerprint = fingerprint
+        self._check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._current: Optional[_IndexVersion] = None
+        self._retired: List[_IndexVersion] = []
+        self._version_counter = 0
+        self._last_check = 0.0
+        self._reloading = False
+        self.reload_count = 0
+        self.last_error: Optional[str] = None
+
+    # ── 조회 ────────────────────────────────────────────────────────────────
+    def acquire(self) -> IndexLease:
+        """현재 버전의 인덱스를 빌립니다. 최초 호출 시(또는 unload() 이후) 인덱스를 로드합니다."""
+        while True:
+            if self._current is None:
+                self._load_initial()
+            else:
+                self.check_for_update()
+
+            with self._lock:
+                version = self._current
+                # 그 사이 unload()된 경우 다시 로드합니다.
+                if version is not None:
+                    version.refcount += 1
+                    return IndexLease(self, version)
+
+    def current(self):
+        """참조 카운트 없이 현재 벡터 저장소를 반환합니다. (짧은 단발성 조회용)"""
+        with self.acquire() as vectorstore:
+            return vectorstore
+
+    @property
+    def loaded(self) -> bool:
+        return self._current is not None
+
+    def peek(self):
+        """로드된 현재 벡터 저장소를 반환합니다. 로드되지 않았으면 로드하지 않고 None을 반환합니다."""
+        with self._lock:
+            return self._current.vectorstore if self._current is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        """현재 버전, 사용 중인 참조 수, 해제 대기 중인 이전 버전 수를 반환합니다."""
+        with self._lock:
+            current = self._current
+            return {
+                "version": current.number if current else None,
+                "active_leases": current.refcount if current else 0,
+                "retired_versions": len(self._retired),
+                "reload_count": self.reload_count,
+                "reloading": self._reloading,
+                "loaded_at": current.loaded_at if current else None,
+                "last_error": self.last_error,
+            }
+
+    # ── 로드 / 교체 ───────────────────────────────────────────────────────────
+    def _load_initial(self):
+        with self._load_lock:
+            if self._current is None:
+                # 로드 도중 아티팩트가 바뀌면 다음 확인에서 다시 로드되도록 지문은 로드 전에 기록
+                fingerprint = self._fingerprint()
+                vectorstore = self._loader()
+                self._swap(vectorstore, fingerprint)
+                self._last_check = time.time()
+
+    def check_for_update(self, force: bool = False) -> bool:
+        """
+        아티팩트가 바뀌었는지 확인하고, 바뀌었으면 백그라운드 리로드를 시작합니다.
+
+        Returns:
+            bool: 리로드를 시작했으면 True
+        """
+        now = time.time()
+        if not force and now - self._last_check < self._check_interval:
+            return False
+        self._last_check = now
+
+        current = self._current
+        if current is None or self._reloading:
+            return False
+        if not force and self._fingerprint() == current.fingerprint:
+            return False
+
+        with self._lock:
+            if self._reloading:
+                return False
+            self._reloading = True
+
+        threading.Thread(target=self._reload, name="shared-index-reload", daemon=True).start()
+        return True
+
+    def unload(self) -> bool:
+        """
+        현재 버전을 내려 메모리를 반환합니다. 다음 acquire()에서 다시 로드하며,
+        사용 중인 lease가 있으면 모두 끝난 뒤 해제합니다.
+
+        Returns:
+            bool: 로드된 인덱스가 있어 내렸으면 True
+        """
+        with self._load_lock:
+            with self._lock:
+                current = self._current
+                if current is None:
+                    return False
+                self._current = None
+                if current.refcount > 0:
+                    self._retired.append(current)
+                else:
+                    self._drop(current)
+        return True
+
+    def reload(self):
+        """현재 스레드에서 즉시 인덱스를 다시 로드하여 교체합니다."""
+        with self._lock:
+            self._reloading = True
+        self._reload()
+
+    def _reload(self):
+        try:
+            with self._load_lock:
+                print("🔄 인덱스 아티팩트 변경 감지: 새 인덱스를 로드합니다...")
+                fingerprint = self._fingerprint()
+                vectorstore = self._loader()
+                self._swap(vectorstore, fingerprint)
+                self.reload_count += 1
+                self.last_error = None
+        except Exception as e:
+            # 새 인덱스 로드에 실패해도 기존 인덱스로 계속 서비스합니다.
+            self.last_error = str(e)
+            print(f"오류: 인덱스 리로드 실패, 기존 인덱스를 유지합니다: {e}")
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def _swap(self, vectorstore, fingerprint):
+        with self._lock:
+            self._version_counter += 1
+            new_version = _IndexVersion(self._version_counter, vectorstore, fingerprint)
+            old_version = self._current
+            self._current = new_version
+            if old_version is not None:
+                if old_version.refcount > 0:
+                    self._retired.append(old_version)
+                else:
+                    self._drop(old_version)
+        print(f"✅ 공용 인덱스 버전 {new_version.number} 활성화")
+
+    def _release(self, version: _IndexVersion):
+        with self._lock:
+            version.refcount -= 1
+            if version is not self._current and version.refcount <= 0 and version in self._retired:
+                self._retired.remove(version)
+                self._drop(version)
+
+    @staticmethod
+    def _drop(version: _IndexVersion):
+        """더 이상 참조되지 않는 이전 버전의 벡터 저장소 참조를 끊어 메모리를 반환합니다."""
+        version.vectorstore = None
@@ -0,0 +1,239 @@
+# src/preprocessing/ingest_report.py
+"""
+전처리(ingestion) 프로파일링 리포트
+
+run_preprocessing_pipeline()에 IngestionReport를 넘기면 파일별/단계별로
+    - parse_s: 파서/로더 실행 시간 (Excel 파싱, PDF 추출(pdf_ingest), Unstructured/Docx2txt)
+    - normalize_s: clean_text() 누적 시간
+    - units: 행(Excel/CSV) 또는 페이지/요소(PDF/Word) 수
+    - chars: 정규화 후 문자 수
+    - documents: 생성된 Document 수
+    - skipped: 정규화 후 텍스트가 없어 건너뛴 행/페이지 수
+    - tables / cache_hits: PDF에서 감지한 표 수, 페이지 캐시를 사용한 파일 수
+    - peak_rss_mb / stage_peak_rss_mb: 파일 처리 후, 단계별 처리 후의 프로세스 최대 RSS
+를 기록하고, 전체 소요 시간과 최대 RSS(peak)를 함께 JSON으로 저장합니다.
+(최대 RSS는 프로세스 전체 값이므로 앞 파일보다 커진 파일/단계가 메모리를 늘린 곳입니다)
+이전 리포트가 있으면 단계별 소요 시간 변화를 출력하여 실행 간 성능 회귀를 확인할 수 있습니다.
+
+사용법:
+    python run_preprocessing.py --profile    # 리포트 + cProfile 덤프(.prof) 저장
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+def rss_mb(peak: bool = False) -> Optional[float]:
+    """
+    프로세스 RSS(MB). 둘 다 없으면 None.
+
+    Args:
+        peak (bool): True이면 최대 RSS: resource → psutil(Windows peak_wset, 그 외 현재 RSS) 순.
+            False이면 현재 RSS: psutil, 없으면 resource의 최대 RSS로 대신합니다.
+    """
+    if not peak:
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss / (1024 * 1024)
+        except ImportError:
+            pass
+    try:
+        import resource
+        import sys
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux는 KB, macOS는 byte 단위
+        return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def report_path_for(output_path: str) -> str:
+    """출력 파일 옆에 저장할 리포트 경로 (documents.pkl → documents.ingest_report.json)."""
+    return os.path.splitext(output_path)[0] + ".ingest_report.json"
+
+
+class FileStats:
+    """파일 하나의 처리 통계."""
+
+    def __init__(self, file_path: str, file_type: str):
+        self.file_path = file_path
+        self.file_type = file_type
+        self.parse_s = 0.0
+        self.normalize_s = 0.0
+        self.units = 0
+        self.chars = 0
+        self.documents = 0
+        self.skipped = 0
+        self.tables = 0
+        self.cache_hits = 0
+        self.error: Optional[str] = None
+        self.stage_peak_rss_mb: Dict[str, Optional[float]] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """단계(parse/normalize) 소요 시간을 누적하고, 단계가 끝난 시점의 최대 RSS를 기록합니다."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            attr = f"{name}_s"
+            setattr(self, attr, getattr(self, attr) + time.perf_counter() - started)
+            self.stage_peak_rss_mb[name] = rss_mb(peak=True)
+
+    @property
+    def peak_rss_mb(self) -> Optional[float]:
+        """이 파일의 마지막 단계가 끝난 시점의 최대 RSS."""
+        values = [value for value in self.stage_peak_rss_mb.values() if value is not None]
+        return max(values) if values else None
+
+    def add_document(self, text: str):
+        self.documents += 1
+        self.chars += len(text)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "file": self.file_path,
+            "type": self.file_type,
+            "size_bytes": os.path.getsize(self.file_path) if os.path.exists(self.file_path) else None,
+            "parse_s": round(self.parse_s, 4),
+            "normalize_s": round(self.normalize_s, 4),
+            "units": self.units,
+            "chars": self.chars,
+            "documents": self.documents,
+            "skipped": self.skipped,
+            "tables": self.tables,
+            "cache_hits": self.cache_hits,
+            "peak_rss_mb": round(self.peak_rss_mb, 1) if self.peak_rss_mb is not None else None,
+            "stage_peak_rss_mb": {
+                name: round(value, 1) if value is not None else None for name, value in self.stage_peak_rss_mb.items()
+            },
+            "error": self.error,
+        }
+
+
+class IngestionReport:
+    """
+    전처리 실행 한 번의 리포트. run_preprocessing_pipeline(..., report=report)로 채워집니다.
+    """
+
+    def __init__(self, raw_data_dir: str):
+        self.raw_data_dir = raw_data_dir
+        self.files: List[FileStats] = []
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+        self.elapsed_s: Optional[float] = None
+
+    def add_file(self, file_path: str, file_type: str) -> FileStats:
+        stats = FileStats(file_path, file_type)
+        self.files.append(stats)
+        return stats
+
+    def finish(self):
+        self.elapsed_s = time.perf_counter() - self._start
+
+    def by_type(self) -> Dict[str, Dict[str, Any]]:
+        """파일 형식별 합계."""
+        totals: Dict[str, Dict[str, Any]] = {}
+        for stats in self.files:
+            total = totals.setdefault(stats.file_type, {
+                "files": 0, "errors": 0, "parse_s": 0.0, "normalize_s": 0.0,
+                "units": 0, "chars": 0, "documents": 0, "skipped": 0, "tables": 0, "cache_hits": 0,
+            })
+            total["files"] += 1
+            total["errors"] += int(stats.error is not None)
+            for key in ("parse_s", "normalize_s", "units", "chars", "documents", "skipped", "tables", "cache_hits"):
+                total[key] += getattr(stats, key)
+        for total in totals.values():
+            total["parse_s"] = round(total["parse_s"], 4)
+            total["normalize_s"] = round(total["normalize_s"], 4)
+            total["docs_per_s"] = round(total["documents"] / total["parse_s"], 1) if total["parse_s"] else None
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.elapsed_s is None:
+            self.finish()
+        peak = rss_mb(peak=True)
+        return {
+            "raw_data_dir": self.raw_data_dir,
+            "started_at": self.started_at,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "peak_rss_mb": round(peak, 1) if peak is not None else None,
+            "documents": sum(stats.documents for stats in self.files),
+            "by_type": self.by_type(),
+            "slowest_files": [
+                stats.file_path
+                for stats in sorted(self.files, key=lambda s: s.parse_s + s.normalize_s, reverse=True)[:5]
+            ],
+            "files": [stats.to_dict() for stats in self.files],
+        }
+
+    def save(self, report_path: str) -> Dict[str, Any]:
+        """
+        리포트를 JSON으로 저장하고, 같은 경로의 이전 리포트와 단계별 소요 시간을 비교해 출력합니다.
+
+        Returns:
+            Dict[str, Any]: 저장된 리포트
+        """
+        data = self.to_dict()
+        previous = None
+        if os.path.exists(report_path):
+            try:
+                with open(report_path, 'r', encoding='utf-8') as f:
+                    previous = json.load(f)
+            except (OSError, ValueError):
+                previous = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"📊 전처리 리포트 저장: {report_path}")
+        print_summary(data, previous)
+        return data
+
+
+def _delta(current: float, previous: Optional[float]) -> str:
+    if not previous:
+        return ""
+    return f" ({(current - previous) / previous * 100:+.0f}%)"
+
+
+def print_summary(report: Dict[str, Any], previous: Optional[Dict[str, Any]] = None):
+    """형식별 소요 시간/처리량 요약을 출력합니다. previous가 있으면 변화율을 함께 표시합니다."""
+    prev_types = (previous or {}).get("by_type", {})
+    print(f"⏱️  전체 {report['elapsed_s']}초{_delta(report['elapsed_s'], (previous or {}).get('elapsed_s'))}, "
+          f"최대 RSS {report['peak_rss_mb']} MB, 문서 {report['documents']}개")
+    for file_type, total in report["by_type"].items():
+        prev = prev_types.get(file_type, {})
+        print(f"   - {file_type}: 파일 {total['files']}개, "
+              f"파싱 {total['parse_s']}초{_delta(total['parse_s'], prev.get('parse_s'))}, "
+              f"정규화 {total['normalize_s']}초{_delta(total['normalize_s'], prev.get('normalize_s'))}, "
+              f"문서 {total['documents']}개, 건너뜀 {total['skipped']}개, 오류 {total['errors']}개")
+
+
+def profile_call(func, prof_path: str, *args, top: int = 15, **kwargs):
+    """
+    func(*args, **kwargs)를 cProfile로 실행하고 덤프(.prof)를 저장한 뒤 누적 시간 상위 항목을 출력합니다.
+    덤프는 `python -m pstats <파일>` 또는 snakeviz 등으로 열어볼 수 있습니다.
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(prof_path)), exist_ok=True)
+        profiler.dump_stats(prof_path)
+        print(f"🧪 cProfile 덤프 저장: {prof_path}")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
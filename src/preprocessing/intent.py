@@ -0,0 +1,332 @@
+# src/preprocessing/intent.py
+"""
+질문 의도 분류기 (인사/감사/노무 외 주제 fast path)
+
+"안녕하세요"처럼 검색이 필요 없는 입력도 지금까지는 질문 임베딩 → FAISS 검색 → 큰 모델의 RAG 프롬프트를 거쳤습니다.
+체인 앞에서 로컬 분류기로 의도를 먼저 나누고, 인사/감사는 템플릿으로 답하며 노무와 무관한 질문은
+안내 문구로 바로 끝냅니다. 노무 질문만 검색과 답변 모델로 보냅니다.
+
+분류 순서 (앞에서 결정되면 끝):
+    1) 노무 키워드(기본 목록 + 영어 키워드 + 코퍼스의 keywords/topic 컬럼)가 있으면 → hr
+    2) 메시지 전체가 짧은 인사/감사 문구 → greeting / thanks
+    3) 노무 외 주제 키워드(날씨, 주식, 요리 ...) → off_topic
+    4) 대화 중의 후속 질문("그럼 그 경우에는?") 또는 인사 뒤에 내용이 붙은 메시지 → hr
+    5) 작은 나이브 베이즈 모델(글자 2-gram + 단어)이 MIN_MODEL_CONFIDENCE 이상으로 확신하면 그 의도
+    6) 그 밖에는 → hr (애매하면 항상 기존 경로로 보냄)
+모델은 인사/주제 외 예시 문장과 코퍼스의 상담 질문으로 프로세스 시작 후 처음 분류할 때 학습합니다. (수 ms)
+
+사용법:
+    router = get_intent_router(engine)
+    intent = router.route("안녕하세요")
+    if intent.short_circuit:
+        answer = intent.answer
+    router.stats  # 의도별 건수, 우회 비율
+"""
+import json
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from src.preprocessing.compact_metadata import get_column
+from src.preprocessing.condenser import is_follow_up
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+    from src.preprocessing.rag_engine import RagEngine
+
+GREETING = "greeting"
+THANKS = "thanks"
+OFF_TOPIC = "off_topic"
+HR = "hr"
+INTENTS = (GREETING, THANKS, OFF_TOPIC, HR)
+# 검색/답변 모델 없이 바로 답하는 의도
+SHORT_CIRCUIT_INTENTS = (GREETING, THANKS, OFF_TOPIC)
+
+TEMPLATES = {
+    GREETING: "안녕하세요! 🏢 HR 노무 상담 챗봇입니다. 권고사직, 해고, 실업급여, 임금, 휴가, 근로계약 등 "
+              "노무 관련 궁금한 점을 편하게 물어보세요.",
+    THANKS: "도움이 되었다니 다행입니다! 다른 노무 관련 질문이 있으시면 언제든지 말씀해주세요. 😊",
+    OFF_TOPIC: "죄송합니다. 저는 노무 관련 질문(근로계약, 해고, 임금, 휴가, 실업급여, 산재 등)에만 답변드릴 수 있습니다. "
+               "노무 관련 질문이 있으시면 말씀해주세요.",
+}
+
+# 인사/감사로 볼 최대 길이 (공백 제외 글자 수). 더 길면 인사 뒤에 질문이 붙은 것으로 봅니다.
+SMALLTALK_MAX_CHARS = 20
+# 인사/감사 문구를 이루는 단어. 메시지 전체가 이 단어들로만 이루어져야 템플릿으로 답합니다.
+# ("hi, I was fired"처럼 인사 뒤에 내용이 붙으면 우회하지 않음. 꾸밈말만으로는 인사/감사가 아님)
+GREETING_WORDS = (
+    r"(안녕\w*|안뇽\w*|ㅎㅇ|하이|헬로\w*|반갑\w*|반가워\w*|처음\s*뵙\w*|좋은\s*(아침|오후|저녁)\w*|"
+    r"hello|hi|hey|hiya|good\s+(morning|afternoon|evening))"
+)
+GREETING_FILLERS = r"(여러분|there|everyone|all)"
+THANKS_WORDS = (
+    r"(감사\w*|ㄱㅅ|고맙\w*|고마워\w*|땡큐|수고\w*|잘\s*(알겠|알았|가|있어)\w*|알겠\w*|좋은\s*하루\w*|바이|"
+    r"thank\w*|thx|ty|bye|goodbye)"
+)
+THANKS_FILLERS = r"(정말|진짜|너무|많이|대단히|you|so|very|much|a\s+lot)"
+
+
+def _smalltalk_pattern(words: str, fillers: str) -> "re.Pattern":
+    """메시지 전체가 words 하나 이상과 fillers로만 이루어졌을 때 맞는 정규식."""
+    token = rf"({words}|{fillers})"
+    return re.compile(rf"^({fillers}\s+)*{words}(\s+{token})*\W*$", re.IGNORECASE)
+
+
+GREETING_PATTERN = _smalltalk_pattern(GREETING_WORDS, GREETING_FILLERS)
+THANKS_PATTERN = _smalltalk_pattern(THANKS_WORDS, THANKS_FILLERS)
+# 인사/감사로 시작하지만 뒤에 다른 내용이 붙은 메시지 (모델이 인사로 오판하지 않도록 hr로 보냄)
+SMALLTALK_PREFIX = re.compile(rf"^({GREETING_WORDS}|{THANKS_WORDS})(\s|$)", re.IGNORECASE)
+
+HR_KEYWORDS = (
+    "노무", "노동", "근로", "근무", "해고", "권고사직", "사직", "퇴사", "퇴직", "실업급여", "구직급여", "고용보험",
+    "4대보험", "사대보험", "국민연금", "건강보험", "산재", "산업재해", "임금", "월급", "급여", "연봉", "수당", "주휴",
+    "최저임금", "체불", "연차", "휴가", "휴직", "육아", "출산", "휴게", "연장근로", "야근", "초과근무", "교대",
+    "근로계약", "계약서", "수습", "정규직", "계약직", "비정규직", "아르바이트", "알바", "파견", "징계", "감봉", "정직",
+    "괴롭힘", "성희롱", "취업규칙", "노조", "노동조합", "직장", "회사", "사업장", "사장", "사업주", "고용주", "상사",
+    "대표님", "인사팀", "채용", "입사", "이직", "전직", "근로자", "직원", "노동청", "노동위원회", "구제신청", "부당",
+)
+# 영어 노무 키워드는 단어 시작 위치에서만 찾습니다. ("fire"는 "fired", "firing"에 맞고 "campfire"에는 맞지 않음)
+HR_ENGLISH_KEYWORDS = (
+    "fire", "firing", "dismiss", "terminat", "layoff", "laid off", "lay off", "severance", "resign", "quit", "retire",
+    "unemployment", "wage", "salary", "salaries", "pay", "paid", "unpaid", "overtime", "bonus", "pension", "payroll",
+    "minimum wage", "contract", "employ", "boss", "manager", "coworker", "colleague", "job", "workplace", "labor",
+    "labour", "union", "leave", "vacation", "holiday", "maternity", "paternity", "parental", "sick", "injur",
+    "harass", "bully", "discriminat", "sue", "lawsuit", "probation", "part-time", "part time", "intern", "hr",
+)
+HR_ENGLISH_PATTERN = re.compile(r"\b(" + "|".join(re.escape(keyword) for keyword in HR_ENGLISH_KEYWORDS) + ")")
+OFF_TOPIC_KEYWORDS = (
+    "날씨", "기온", "미세먼지", "주식", "코인", "비트코인", "환율", "로또", "운세", "사주", "타로", "레시피", "요리",
+    "맛집", "메뉴", "영화", "드라마", "넷플릭스", "웹툰", "게임", "축구", "야구", "농구", "여행", "관광", "항공권",
+    "연애", "소개팅", "노래", "가사", "번역", "파이썬", "자바스크립트", "코딩", "프로그래밍", "수학 문제", "다이어트",
+    "weather", "recipe", "stock", "bitcoin", "movie", "football", "python",
+)
+
+# 나이브 베이즈 학습용 예시 (노무 질문 예시는 코퍼스의 상담 질문으로 보강합니다)
+GREETING_EXAMPLES = (
+    "안녕하세요", "안녕", "안녕하십니까", "반갑습니다", "처음 뵙겠습니다", "좋은 아침입니다", "하이", "헬로",
+    "hello", "hi there", "누구세요", "너는 누구야", "무엇을 할 수 있나요", "뭐 물어볼 수 있어요", "도와주세요",
+    "질문 있어요", "상담 가능한가요", "여보세요",
+)
+THANKS_EXAMPLES = (
+    "감사합니다", "고맙습니다", "고마워요", "정말 감사해요", "도움이 됐어요", "잘 알겠습니다", "알겠어요",
+    "수고하세요", "좋은 하루 되세요", "thank you", "thanks", "bye", "잘 있어요", "덕분에 해결했어요",
+)
+OFF_TOPIC_EXAMPLES = (
+    "오늘 날씨 어때요", "내일 비 와요", "점심 뭐 먹을까", "저녁 메뉴 추천해줘", "김치찌개 끓이는 법",
+    "주식 뭐 살까요", "비트코인 전망", "환율 알려줘", "로또 번호 추천", "재밌는 영화 추천해줘", "드라마 추천",
+    "게임 추천해줘", "축구 경기 결과", "제주도 여행 코스", "맛집 알려줘", "연애 상담해줘", "노래 추천해줘",
+    "영어로 번역해줘", "파이썬 코드 짜줘", "수학 문제 풀어줘", "다이어트 방법", "운동 루틴 알려줘",
+    "농담 해줘", "시 한 편 써줘", "고양이 키우는 법", "우주는 얼마나 커", "대통령이 누구야", "오늘 며칠이야",
+)
+HR_EXAMPLES = (
+    "권고사직을 당했는데 실업급여를 받을 수 있나요", "회사에서 갑자기 해고 통보를 받았어요",
+    "월급이 밀렸는데 어떻게 해야 하나요", "연차휴가는 며칠이나 되나요", "주휴수당 계산 방법",
+    "근로계약서를 안 썼어요", "수습기간에도 최저임금을 받아야 하나요", "야근수당을 못 받았어요",
+    "퇴직금은 언제 받을 수 있나요", "직장 내 괴롭힘 신고 방법", "육아휴직 신청하고 싶어요",
+    "산재 처리가 안 된대요", "사장님이 4대보험을 안 들어줬어요", "부당해고 구제신청은 어떻게 하나요",
+)
+# 모델이 이 확률 이상으로 확신할 때만 우회합니다. (그 밖에는 hr로 보내 기존 경로 유지)
+MIN_MODEL_CONFIDENCE = 0.9
+
+
+@dataclass(frozen=True)
+class Intent:
+    """
+    분류 결과.
+
+    Attributes:
+        label (str): greeting / thanks / off_topic / hr
+        confidence (float): 규칙으로 정해지면 1.0, 모델이면 사후 확률
+        reason (str): keyword / pattern / off_topic_keyword / follow_up / smalltalk_prefix / model / default
+    """
+    label: str
+    confidence: float
+    reason: str
+
+    @property
+    def short_circuit(self) -> bool:
+        """검색과 답변 모델을 건너뛰고 템플릿으로 답하는지."""
+        return self.label in SHORT_CIRCUIT_INTENTS
+
+    @property
+    def answer(self) -> Optional[str]:
+        return TEMPLATES.get(self.label)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^\w가-힣\s]", " ", text).strip().lower()
+
+
+def _features(text: str) -> List[str]:
+    """단어와 단어 안의 글자 2-gram (한국어 어미/조사 변화에 강하도록)."""
+    words = re.findall(r"[\w가-힣]+", text.lower())
+    features = list(words)
+    for word in words:
+        features.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return features
+
+
+class NaiveBayesIntentModel:
+    """
+    의도 분류용 다항 나이브 베이즈 (라플라스 평활, 균등 사전 확률). 외부 의존성 없이 수 ms에 학습합니다.
+
+    Args:
+        examples (Dict[str, Iterable[str]]): 의도별 예시 문장
+    """
+
+    def __init__(self, examples: Dict[str, Iterable[str]]):
+        self.counts: Dict[str, Counter] = {label: Counter() for label in examples}
+        for label, texts in examples.items():
+            for text in texts:
+                self.counts[label].update(_features(text))
+        self.totals = {label: sum(counter.values()) for label, counter in self.counts.items()}
+        self.vocabulary = len(set().union(*self.counts.values())) or 1
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """가장 가능성 높은 의도와 그 사후 확률."""
+        features = _features(text)
+        log_probs = {
+            label: sum(math.log((counter[feature] + 1) / (self.totals[label] + self.vocabulary))
+                       for feature in features)
+            for label, counter in self.counts.items()
+        }
+        best = max(log_probs, key=log_probs.get)
+        denominator = sum(math.exp(value - log_probs[best]) for value in log_probs.values())
+        return best, 1.0 / denominator
+
+
+def corpus_vocabulary(documents: List["Document"]) -> Tuple[List[str], List[str]]:
+    """
+    코퍼스의 상담 결과 행에서 노무 키워드(keywords/topic 컬럼)와 상담 질문을 모읍니다.
+
+    Returns:
+        Tuple[List[str], List[str]]: (키워드, 질문 예시)
+    """
+    keywords, questions = set(), []
+    for doc in documents:
+        for column in ("keywords", "topic"):
+            value = get_column(doc, column)
+            if not value:
+                continue
+            try:
+                items = json.loads(value) if str(value).startswith("[") else str(value).split(",")
+            except ValueError:
+                items = str(value).split(",")
+            keywords.update(str(item).strip() for item in items if len(str(item).strip()) >= 2)
+        question = get_column(doc, "question")
+        if question:
+            questions.append(str(question))
+    return sorted(keywords), questions
+
+
+class IntentRouter:
+    """
+    규칙 + 작은 모델로 질문 의도를 분류하고, 의도별 건수를 집계합니다. 스레드 안전합니다.
+
+    Args:
+        hr_keywords (Iterable[str]): 기본 목록에 더할 노무 키워드 (코퍼스 키워드)
+        hr_examples (Iterable[str]): 모델 학습에 더할 노무 질문 예시 (코퍼스 질문)
+        min_confidence (float): 모델 결과로 우회할 최소 사후 확률
+    """
+
+    def __init__(self, hr_keywords: Iterable[str] = (), hr_examples: Iterable[str] = (),
+                 min_confidence: float = MIN_MODEL_CONFIDENCE):
+        self.hr_keywords = tuple(sorted(set(HR_KEYWORDS) | {_normalize(k) for k in hr_keywords if k}))
+        self.min_confidence = min_confidence
+        self.model = NaiveBayesIntentModel({
+            GREETING: GREETING_EXAMPLES,
+            THANKS: THANKS_EXAMPLES,
+            OFF_TOPIC: OFF_TOPIC_EXAMPLES,
+            HR: tuple(HR_EXAMPLES) + tuple(hr_examples),
+        })
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"total": 0, **{intent: 0 for intent in INTENTS}}
+
+    def classify(self, question: str, has_history: bool = False) -> Intent:
+        """질문 의도를 분류합니다. (집계하지 않음)"""
+        text = _normalize(question)
+        if not text:
+            return Intent(GREETING, 1.0, "pattern")
+        if any(keyword in text for keyword in self.hr_keywords) or HR_ENGLISH_PATTERN.search(text):
+            return Intent(HR, 1.0, "keyword")
+        if len(re.sub(r"\s+", "", text)) <= SMALLTALK_MAX_CHARS:
+            if GREETING_PATTERN.search(text):
+                return Intent(GREETING, 1.0, "pattern")
+            if THANKS_PATTERN.search(text):
+                return Intent(THANKS, 1.0, "pattern")
+        if any(keyword in text for keyword in OFF_TOPIC_KEYWORDS):
+            return Intent(OFF_TOPIC, 1.0, "off_topic_keyword")
+        if has_history and is_follow_up(question):
+            return Intent(HR, 1.0, "follow_up")
+        if SMALLTALK_PREFIX.search(text):
+            return Intent(HR, 1.0, "smalltalk_prefix")
+
+        label, probability = self.model.predict(text)
+        if label != HR and probability >= self.min_confidence:
+            return Intent(label, round(probability, 4), "model")
+        return Intent(HR, round(probability if label == HR else 1.0 - probability, 4), "default")
+
+    def route(self, question: str, has_history: bool = False, trace=None) -> Intent:
+        """
+        의도를 분류하고 건수를 집계합니다.
+
+        Args:
+            has_history (bool): 대화 기록이 있는지 (짧은 후속 질문을 노무 질문으로 보냄)
+            trace (TurnTrace): 주어지면 "intent" span과 턴 속성(intent, short_circuit)을 기록합니다.
+        """
+        if trace is not None:
+            with trace.span("intent") as span:
+                intent = self.classify(question, has_history)
+                span.set(label=intent.label, reason=intent.reason, confidence=intent.confidence)
+            trace.set(intent=intent.label, short_circuit=intent.short_circuit)
+        else:
+            intent = self.classify(question, has_history)
+        with self._lock:
+            self.stats["total"] += 1
+            self.stats[intent.label] += 1
+        return intent
+
+    def summary(self) -> Dict[str, float]:
+        """의도별 건수와 우회(short-circuit) 비율."""
+        with self._lock:
+            stats = dict(self.stats)
+        short_circuited = sum(stats[intent] for intent in SHORT_CIRCUIT_INTENTS)
+        stats["short_circuited"] = short_circuited
+        stats["short_circuit_rate"] = round(short_circuited / stats["total"], 4) if stats["total"] else 0.0
+        return stats
+
+    def render_prometheus(self) -> str:
+        """의도별 건수를 Prometheus 텍스트 형식으로 반환합니다."""
+        stats = self.summary()
+        lines = ["# HELP hr_rag_intent_total 의도 분류 결과별 질문 수 (greeting/thanks/off_topic은 검색 없이 응답)",
+                 "# TYPE hr_rag_intent_total counter"]
+        lines += [f'hr_rag_intent_total{{intent="{intent}"}} {stats[intent]}' for intent in INTENTS]
+        lines += ["# TYPE hr_rag_intent_short_circuited_total counter",
+                  f"hr_rag_intent_short_circuited_total {stats['short_circuited']}"]
+        return "\n".join(lines) + "\n"
+
+
+_routers: Dict[str, IntentRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_intent_router(engine: "RagEngine") -> IntentRouter:
+    """
+    엔진의 코퍼스(테넌트)별 공용 IntentRouter. 처음 호출할 때 documents.pkl의 키워드/질문으로 학습합니다.
+    documents.pkl을 읽을 수 없으면 기본 키워드와 예시만 사용합니다.
+    """
+    key = engine.config.documents_path
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is None:
+            try:
+                keywords, questions = corpus_vocabulary(engine.load_documents())
+            except (OSError, EOFError) as e:
+                print(f"경고: 의도 분류기 코퍼스 어휘를 읽지 못했습니다 (기본 목록 사용): {e}")
+                keywords, questions = [], []
+            router = _routers[key] = IntentRouter(keywords, questions)
+    return router
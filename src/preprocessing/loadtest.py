@@ -0,0 +1,350 @@
+# src/preprocessing/loadtest.py
+"""
+채팅 턴 부하 테스트 (가상 사용자 N명 동시 실행)
+
+가상 사용자마다 채팅 앱과 같은 순서로 턴을 실행하고 처리량과 지연 백분위수를 보고합니다.
+    대화 기록 로드 ∥ 검색 → 프롬프트 구성 → LLM 스트리밍 → 요약 메모리 저장
+기본값은 가짜 LLM/임베딩(fakes.py)이므로 API 키 없이 실행되며, 가짜 모델의 속도를
+"fake:ttft=0.8,tps=40"처럼 실제 제공자와 비슷하게 맞추면 앱 자체의 오버헤드(턴 시간 - 모델 스트리밍 시간)를
+모델 지연과 분리해 볼 수 있습니다.
+
+--url을 주면 실행 중인 api_server의 POST /query/stream을 대상으로 같은 부하를 겁니다. (서버 동시성 한도/대기열 포함)
+
+측정 항목:
+    - 처리량: 초당 완료 턴 수, 초당 출력 토큰 수
+    - 턴 지연 / 첫 토큰 지연(ttft, 턴 시작 기준) / 앱 오버헤드의 p50·p90·p95·p99
+    - 단계별 평균 지연 (in-process 모드, tracing.TurnTrace span 기준)
+    - 실패 수 (HTTP 503/504 포함)
+
+사용법:
+    python -m src.preprocessing.loadtest --users 20 --turns 3 --model "fake:ttft=0.8,tps=40"
+    python -m src.preprocessing.loadtest --users 50 --turns 2 --think-time 0 --output data/processed/loadtest.json
+    python -m src.preprocessing.api_server --fake --model "fake:ttft=0.5,tps=50" &
+    python -m src.preprocessing.loadtest --url http://127.0.0.1:8000 --users 50 --turns 3
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from src.preprocessing.benchmark import percentile
+from src.preprocessing.rag_engine import RagConfig, RagEngine, token_usage
+from src.preprocessing.tracing import TraceRecorder, TurnTrace
+
+DEFAULT_LOAD_MODEL = "fake:ttft=0.5,tps=40"
+FALLBACK_QUESTIONS = (
+    "권고사직을 당했을 때 실업급여를 받을 수 있나요?",
+    "실업급여 신청 방법을 알려주세요.",
+    "정리해고의 요건은 무엇인가요?",
+    "해고 예고는 언제까지 해야 하나요?",
+    "부당해고 구제신청은 어떻게 하나요?",
+)
+
+
+@dataclass
+class TurnResult:
+    """
+    가상 사용자 한 턴의 결과.
+
+    Attributes:
+        ttft_ms (float): 턴 시작부터 첫 토큰까지 (ms)
+        overhead_ms (float): 턴 시간에서 LLM 스트리밍 시간을 뺀 앱 자체 시간 (HTTP 모드는 None)
+        tokens_out (int): 출력 토큰 수 (제공자가 사용량을 주지 않으면 청크 수)
+    """
+    user: int
+    turn: int
+    ok: bool
+    total_ms: float
+    ttft_ms: Optional[float] = None
+    overhead_ms: Optional[float] = None
+    tokens_out: int = 0
+    error: Optional[str] = None
+
+
+def load_question_pool(engine: RagEngine, questions_path: Optional[str] = None) -> List[str]:
+    """
+    가상 사용자가 보낼 질문 목록. 파일(JSONL/CSV)이 없으면 상담 결과 행의 원문 질문을 사용합니다.
+    """
+    if questions_path:
+        from src.preprocessing.batch_qa import load_questions
+        return [item["question"] for item in load_questions(questions_path)]
+    try:
+        from src.preprocessing.benchmark import build_labeled_set
+        pool = [item["question"] for item in build_labeled_set(engine.load_documents())]
+    except (OSError, ValueError) as e:
+        print(f"경고: 상담 질문을 불러오지 못해 기본 질문을 사용합니다: {e}")
+        pool = []
+    return pool or list(FALLBACK_QUESTIONS)
+
+
+def _think(rng: random.Random, think_time: float):
+    """다음 질문 전 사용자 대기 시간 (평균 think_time초, ±50%)."""
+    if think_time > 0:
+        time.sleep(rng.uniform(0.5, 1.5) * think_time)
+
+
+def run_user(engine: RagEngine, user: int, questions: List[str], turns: int, model: str,
+             k: Optional[int] = None, think_time: float = 0.0, recorder: Optional[TraceRecorder] = None,
+             seed: int = 0) -> List[TurnResult]:
+    """
+    가상 사용자 한 명이 채팅 앱과 같은 방식으로 turns번 질문합니다. (요약 메모리 포함)
+
+    Returns:
+        List[TurnResult]: 턴별 결과
+    """
+    from langchain.memory import ConversationSummaryBufferMemory
+
+    rng = random.Random(seed * 100003 + user)
+    llm = engine.get_llm(model, temperature=0, streaming=True)
+    memory = ConversationSummaryBufferMemory(
+        llm=engine.get_llm(model, temperature=0, streaming=False),
+        max_token_limit=1000,
+        return_messages=True,
+        memory_key="chat_history",
+    )
+
+    results = []
+    for turn in range(turns):
+        question = questions[rng.randrange(len(questions))]
+        trace = TurnTrace(name="load_turn", recorder=recorder, user=user, model=model, k=k)
+        ttft_ms, stream_ms, tokens_out, error = None, 0.0, 0, None
+        try:
+            prepared = engine.prepare_turn(
+                question,
+                load_history=lambda: memory.load_memory_variables({}).get("chat_history", ""),
+                k=k,
+                trace=trace,
+            )
+            answer, chunks, usage = "", 0, {}
+            with trace.span("llm_stream", model=getattr(llm, "model_name", model)) as span:
+                for chunk in llm.stream(prepared["messages"]):
+                    if chunk.content:
+                        if ttft_ms is None:
+                            ttft_ms = trace.duration_ms
+                            span.set(ttft_ms=round(span.duration_ms, 1))
+                        answer += chunk.content
+                        chunks += 1
+                    if getattr(chunk, "usage_metadata", None):
+                        usage = token_usage(chunk)
+                tokens_out = usage.get("output_tokens") or chunks
+                span.set(tokens_in=usage.get("input_tokens"), tokens_out=tokens_out)
+            stream_ms = span.duration_ms
+            with trace.span("save_context"):
+                memory.save_context(inputs={"human": question}, outputs={"ai": answer})
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            trace.set(error=error)
+        finally:
+            trace.finish()
+
+        results.append(TurnResult(
+            user=user, turn=turn, ok=error is None, total_ms=round(trace.duration_ms, 1),
+            ttft_ms=round(ttft_ms, 1) if ttft_ms is not None else None,
+            overhead_ms=round(trace.duration_ms - stream_ms, 1) if error is None else None,
+            tokens_out=tokens_out, error=error,
+        ))
+        _think(rng, think_time)
+    return results
+
+
+def run_inprocess(engine: RagEngine, users: int, turns: int, model: str, questions: List[str],
+                  k: Optional[int] = None, think_time: float = 0.0, ramp_up: float = 0.0,
+                  seed: int = 0) -> Dict[str, Any]:
+    """
+    가상 사용자마다 스레드 하나로 같은 프로세스의 엔진을 호출합니다. (Streamlit 세션 스레드와 같은 구조)
+
+    Args:
+        ramp_up (float): 사용자 시작 시각을 이 시간(초) 동안 고르게 분산
+
+    Returns:
+        Dict[str, Any]: 턴 결과, 벽시계 시간, 단계별 평균 지연
+    """
+    engine.load_index()  # 인덱스 구축/로드는 측정에서 제외
+    recorder = TraceRecorder(jsonl_path=None)
+    results: List[TurnResult] = []
+    lock = threading.Lock()
+
+    def worker(user: int):
+        if ramp_up > 0 and users > 1:
+            time.sleep(ramp_up * user / users)
+        user_results = run_user(engine, user, questions, turns, model, k, think_time, recorder, seed)
+        with lock:
+            results.extend(user_results)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(user,), daemon=True) for user in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {"results": results, "wall_s": time.perf_counter() - started, "stages": recorder.stage_summary()}
+
+
+async def _http_user(client, url: str, user: int, questions: List[str], turns: int, k: Optional[int],
+                     think_time: float, ramp_up: float, users: int, seed: int) -> List[TurnResult]:
+    import asyncio
+
+    rng = random.Random(seed * 100003 + user)
+    if ramp_up > 0 and users > 1:
+        await asyncio.sleep(ramp_up * user / users)
+
+    results = []
+    for turn in range(turns):
+        payload = {"question": questions[rng.randrange(len(questions))]}
+        if k:
+            payload["k"] = k
+        started = time.perf_counter()
+        ttft_ms, tokens_out, error, event = None, 0, None, None
+        try:
+            async with client.stream("POST", f"{url.rstrip('/')}/query/stream", json=payload) as response:
+                if response.status_code != 200:
+                    error = f"HTTP {response.status_code}"
+                else:
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: "):
+                            event = line[len("event: "):]
+                        elif line.startswith("data: ") and event == "token":
+                            if ttft_ms is None:
+                                ttft_ms = (time.perf_counter() - started) * 1000
+                            tokens_out += 1
+                        elif line.startswith("data: ") and event == "error":
+                            error = json.loads(line[len("data: "):]).get("error", "error")
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        results.append(TurnResult(
+            user=user, turn=turn, ok=error is None, total_ms=round((time.perf_counter() - started) * 1000, 1),
+            ttft_ms=round(ttft_ms, 1) if ttft_ms is not None else None, tokens_out=tokens_out, error=error,
+        ))
+        if think_time > 0:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * think_time)
+    return results
+
+
+def run_http(url: str, users: int, turns: int, questions: List[str], k: Optional[int] = None,
+             think_time: float = 0.0, ramp_up: float = 0.0, seed: int = 0, timeout: float = 120.0) -> Dict[str, Any]:
+    """
+    api_server의 /query/stream에 가상 사용자 N명이 동시에 요청합니다. (사용자마다 asyncio 태스크 하나)
+    토큰 수는 SSE token 이벤트 수입니다.
+    """
+    import asyncio
+
+    import httpx
+
+    async def run():
+        limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+        async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+            batches = await asyncio.gather(*(
+                _http_user(client, url, user, questions, turns, k, think_time, ramp_up, users, seed)
+                for user in range(users)
+            ))
+        return [result for batch in batches for result in batch]
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    return {"results": results, "wall_s": time.perf_counter() - started, "stages": []}
+
+
+def summarize(run: Dict[str, Any], users: int, turns: int, target: str) -> Dict[str, Any]:
+    """턴 결과를 처리량과 지연 백분위수로 요약합니다."""
+    results: List[TurnResult] = run["results"]
+    ok = [result for result in results if result.ok]
+    wall_s = max(run["wall_s"], 1e-9)
+
+    def percentiles(values: List[float]) -> Dict[str, float]:
+        if not values:
+            return {}
+        return {f"p{q}": round(percentile(values, q), 1) for q in (50, 90, 95, 99)}
+
+    errors: Dict[str, int] = {}
+    for result in results:
+        if result.error:
+            key = result.error.split(":")[0]
+            errors[key] = errors.get(key, 0) + 1
+
+    return {
+        "target": target,
+        "users": users,
+        "turns_per_user": turns,
+        "turns": len(results),
+        "completed": len(ok),
+        "failed": len(results) - len(ok),
+        "errors": errors,
+        "wall_s": round(wall_s, 2),
+        "throughput_turns_per_s": round(len(ok) / wall_s, 2),
+        "throughput_tokens_per_s": round(sum(result.tokens_out for result in ok) / wall_s, 1),
+        "latency_ms": percentiles([result.total_ms for result in ok]),
+        "ttft_ms": percentiles([result.ttft_ms for result in ok if result.ttft_ms is not None]),
+        "overhead_ms": percentiles([result.overhead_ms for result in ok if result.overhead_ms is not None]),
+        "stages": run["stages"],
+        "results": [asdict(result) for result in results],
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print("\n" + "=" * 78)
+    print(f"🏋️ 부하 테스트: {report['target']} — 사용자 {report['users']}명 × {report['turns_per_user']}턴")
+    print("=" * 78)
+    print(f"완료 {report['completed']}/{report['turns']}턴, 실패 {report['failed']}"
+          + (f" {report['errors']}" if report["errors"] else "") + f", 소요 {report['wall_s']}초")
+    print(f"처리량: {report['throughput_turns_per_s']} 턴/초, {report['throughput_tokens_per_s']} 토큰/초")
+    print(f"\n{'지연(ms)':<16}{'p50':>10}{'p90':>10}{'p95':>10}{'p99':>10}")
+    for key, label in (("latency_ms", "턴 전체"), ("ttft_ms", "첫 토큰"), ("overhead_ms", "앱 오버헤드")):
+        values = report[key]
+        if values:
+            print(f"{label:<16}" + "".join(f"{values[q]:>10.1f}" for q in ("p50", "p90", "p95", "p99")))
+    if report["stages"]:
+        print("\n단계별 평균 지연: " + ", ".join(
+            f"{stage['stage']} {stage['avg_ms']:.1f}ms" for stage in report["stages"]))
+    print("=" * 78)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="채팅 턴 부하 테스트 (가상 사용자 N명)")
+    parser.add_argument("--users", type=int, default=10, help="동시 가상 사용자 수")
+    parser.add_argument("--turns", type=int, default=3, help="사용자당 턴 수")
+    parser.add_argument("--think-time", type=float, default=0.0, help="턴 사이 평균 대기 시간 (초)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="사용자 시작을 분산할 시간 (초)")
+    parser.add_argument("--model", default=DEFAULT_LOAD_MODEL,
+                        help="LLM 모델 (기본: 가짜 모델, 첫 토큰 0.5초 · 초당 40토큰)")
+    parser.add_argument("--embedding-provider", default="fake", choices=["openai", "upstage", "fake"])
+    parser.add_argument("--k", type=int, default=None, help="검색 문서 수 (기본: 엔진 설정)")
+    parser.add_argument("--questions", default=None, help="질문 파일 (JSONL/CSV, 기본: 상담 결과 행의 질문)")
+    parser.add_argument("--url", default=None, help="api_server 주소 (지정하면 HTTP /query/stream 대상으로 실행)")
+    parser.add_argument("--seed", type=int, default=0, help="질문 선택/대기 시간 난수 시드")
+    parser.add_argument("--output", default=None, help="리포트 JSON 저장 경로 (턴별 결과 포함)")
+    args = parser.parse_args(argv)
+
+    # 가짜 임베딩은 인덱스를 메모리에만 구축합니다. (실제 인덱스 디렉토리를 건드리지 않음)
+    config = RagConfig(
+        llm_model=args.model, embedding_provider=args.embedding_provider,
+        **({"index_dir": None} if args.embedding_provider == "fake" else {}),
+    )
+    engine = RagEngine(config)
+    questions = load_question_pool(engine, args.questions)
+
+    if args.url:
+        run = run_http(args.url, args.users, args.turns, questions, args.k, args.think_time, args.ramp_up, args.seed)
+        target = args.url
+    else:
+        run = run_inprocess(engine, args.users, args.turns, args.model, questions, args.k,
+                            args.think_time, args.ramp_up, args.seed)
+        target = f"in-process ({args.model}, {args.embedding_provider} 임베딩)"
+
+    report = summarize(run, args.users, args.turns, target)
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 리포트 저장: {args.output}")
+    return 0 if report["completed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
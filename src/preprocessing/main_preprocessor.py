@@ -1,21 +1,155 @@
 import pandas as pd
 from src.preprocessing.parsers import parse_excel_for_hr_data
 from src.preprocessing.normalizers import clean_text
+from src.preprocessing.compact_metadata import compact_row_metadata
+from src.preprocessing.ingest_report import IngestionReport
 from langchain_core.documents import Document
 import os
 import glob
 import pickle
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
-# 새로운 로더 임포트 (설치 필요: pip install pypdf docx2txt unstructured)
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, UnstructuredWordDocumentLoader
+# PDF/Word 로더(설치 필요: pip install pypdf docx2txt unstructured)는 임포트가 무거워 해당 파일을 처리할 때 임포트합니다.
 
-def run_preprocessing_pipeline(raw_data_dir: str) -> List[Document]:
+# 파일 형식별 확장자 (감시 모드에서도 같은 기준으로 대상 파일을 고릅니다)
+EXCEL_EXTENSIONS = (".xlsx", ".xls", ".csv")
+PDF_EXTENSIONS = (".pdf",)
+DOCX_EXTENSIONS = (".docx",)
+SUPPORTED_EXTENSIONS = EXCEL_EXTENSIONS + PDF_EXTENSIONS + DOCX_EXTENSIONS
+
+
+def _normalize_loaded_documents(loaded_docs: List[Document], file_path: str, source_type: str,
+                                stats, warning: Optional[str] = None) -> List[Document]:
+    """로더가 반환한 PDF/Word Document를 정규화하고 출처 메타데이터를 추가합니다."""
+    documents = []
+    stats.units = len(loaded_docs)
+    for doc in loaded_docs:
+        with stats.stage("normalize"):
+            cleaned_text = clean_text(doc.page_content)
+        if cleaned_text:
+            # source, page 등의 metadata는 loader가 자동으로 추가합니다.
+            doc.page_content = cleaned_text
+            doc.metadata["source_file"] = os.path.basename(file_path)
+            doc.metadata["file_path"] = file_path
+            doc.metadata["source_type"] = source_type
+            documents.append(doc)
+            stats.add_document(cleaned_text)
+        else:
+            stats.skipped += 1
+            if warning:
+                print(warning)
+    return documents
+
+
+def load_excel_documents(file_path: str, stats) -> List[Document]:
+    """Excel/CSV 파일 하나를 행 단위 Document로 변환합니다."""
+    documents = []
+    try:
+        with stats.stage("parse"):
+            parsed_data_list = parse_excel_for_hr_data(file_path) # parsers.py의 Excel 처리 함수 사용
+        stats.units = len(parsed_data_list)
+
+        for item in parsed_data_list:
+            with stats.stage("normalize"):
+                cleaned_text = clean_text(item['text'])
+            if cleaned_text:
+                # 긴 셀 값은 메타데이터에 다시 저장하지 않고 정규화된 본문 안의 위치만 기록합니다.
+                metadata = compact_row_metadata(item['metadata'], cleaned_text)
+                documents.append(Document(page_content=cleaned_text, metadata=metadata))
+                stats.add_document(cleaned_text)
+            else:
+                stats.skipped += 1
+                print(f"경고: {file_path}의 한 행에서 정규화 후 유효한 텍스트가 없습니다. 이 데이터를 건너뛰었습니다.")
+    except Exception as e:
+        stats.error = str(e)
+        print(f"오류: Excel/CSV 파일 '{file_path}' 처리 중 오류 발생: {e}")
+    return documents
+
+
+def load_pdf_documents(file_path: str, stats) -> List[Document]:
+    """
+    PDF 파일 하나를 페이지 본문 Document와 표 행 Document로 변환합니다.
+    페이지는 병렬로 추출되고, 추출 결과는 파일 해시별로 캐시됩니다. (pdf_ingest.py)
+    """
+    try:
+        with stats.stage("parse"):
+            from src.preprocessing.pdf_ingest import load_pdf
+            pdf_docs, pdf_stats = load_pdf(file_path)
+        documents = _normalize_loaded_documents(
+            pdf_docs, file_path, "pdf", stats,
+            warning=f"경고: {file_path}의 한 페이지에서 유효한 텍스트가 없습니다. 이 페이지를 건너뛰었습니다.",
+        )
+        stats.units = pdf_stats["pages"]
+        stats.tables = pdf_stats["tables"]
+        stats.cache_hits = int(pdf_stats["cache_hit"])
+        cached = " (캐시 사용)" if pdf_stats["cache_hit"] else ""
+        print(f"  📄 {pdf_stats['pages']}페이지, 표 {pdf_stats['tables']}개 → 표 행 {pdf_stats['table_rows']}개{cached}")
+        return documents
+    except Exception as e:
+        stats.error = str(e)
+        print(f"오류: PDF 파일 '{file_path}' 처리 중 오류 발생: {e}")
+        return []
+
+
+def load_docx_documents(file_path: str, stats) -> List[Document]:
+    """Word(docx) 파일 하나를 Document로 변환합니다. Unstructured 실패 시 Docx2txtLoader로 재시도합니다."""
+    try:
+        # Docx2txtLoader는 간단하지만, 더 강력한 파싱을 위해 UnstructuredWordDocumentLoader 권장
+        with stats.stage("parse"):
+            from langchain_community.document_loaders import UnstructuredWordDocumentLoader
+            loader = UnstructuredWordDocumentLoader(file_path) # Unstructured 라이브러리 필요
+            word_docs = loader.load()
+        return _normalize_loaded_documents(
+            word_docs, file_path, "docx", stats,
+            warning=f"경고: {file_path}의 한 부분에서 유효한 텍스트가 없습니다. 이 부분을 건너뛰었습니다.",
+        )
+    except Exception as e:
+        print(f"오류: Word 파일 '{file_path}' 처리 중 오류 발생: {e}")
+        # Fallback: Docx2txtLoader 시도
+        print(f"UnstructuredWordDocumentLoader 실패, Docx2txtLoader로 재시도...")
+        try:
+            with stats.stage("parse"):
+                from langchain_community.document_loaders import Docx2txtLoader
+                loader = Docx2txtLoader(file_path)
+                word_docs = loader.load()
+            return _normalize_loaded_documents(word_docs, file_path, "docx", stats)
+        except Exception as e2:
+            stats.error = str(e2)
+            print(f"오류: Docx2txtLoader도 실패 '{file_path}': {e2}")
+            return []
+
+
+def process_file(file_path: str, report: IngestionReport) -> List[Document]:
+    """
+    확장자에 맞는 로더로 파일 하나를 처리합니다. (감시 모드의 증분 처리에서 사용)
+
+    Returns:
+        List[Document]: 정규화된 Document 리스트 (지원하지 않는 형식이면 빈 리스트)
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        print(f"처리 중 (Excel/CSV): {file_path}")
+        return load_excel_documents(file_path, report.add_file(file_path, "excel"))
+    if extension in PDF_EXTENSIONS:
+        print(f"처리 중 (PDF): {file_path}")
+        return load_pdf_documents(file_path, report.add_file(file_path, "pdf"))
+    if extension in DOCX_EXTENSIONS:
+        print(f"처리 중 (Word): {file_path}")
+        return load_docx_documents(file_path, report.add_file(file_path, "docx"))
+    return []
+
+
+def run_preprocessing_pipeline(raw_data_dir: str, report: Optional[IngestionReport] = None) -> List[Document]:
     """
     모든 원시 엑셀, PDF, Word 파일을 읽고, 파싱 및 정규화하여 Document 객체 리스트를 반환합니다.
     raw_data_dir은 이 함수를 호출하는 스크립트의 현재 작업 디렉토리를 기준으로 한 상대 경로여야 합니다.
+
+    Args:
+        raw_data_dir (str): 원시 데이터 폴더
+        report (IngestionReport): 주어지면 파일별/단계별 소요 시간과 처리량을 기록합니다.
     """
     all_documents = []
+    report = report or IngestionReport(raw_data_dir)
     
     print(f"전처리 시작: '{raw_data_dir}' 디렉토리 스캔 중...")
     
@@ -26,83 +160,22 @@ def run_preprocessing_pipeline(raw_data_dir: str) -> List[Document]:
     
     print(f"'{raw_data_dir}'에서 {len(excel_csv_files)}개의 엑셀/CSV 파일을 찾았습니다.")
     for file_path in excel_csv_files:
-        print(f"처리 중 (Excel/CSV): {file_path}")
-        try:
-            parsed_data_list = parse_excel_for_hr_data(file_path) # parsers.py의 Excel 처리 함수 사용
-
-            for item in parsed_data_list:
-                cleaned_text = clean_text(item['text'])
-                if cleaned_text:
-                    doc = Document(page_content=cleaned_text, metadata=item['metadata'])
-                    all_documents.append(doc)
-                else:
-                    print(f"경고: {file_path}의 한 행에서 정규화 후 유효한 텍스트가 없습니다. 이 데이터를 건너뛰었습니다.")
-        except Exception as e:
-            print(f"오류: Excel/CSV 파일 '{file_path}' 처리 중 오류 발생: {e}")
+        all_documents.extend(process_file(file_path, report))
 
     # 2. PDF 파일 찾기 및 처리
     pdf_files = glob.glob(os.path.join(raw_data_dir, "**", "*.pdf"), recursive=True)
     print(f"'{raw_data_dir}'에서 {len(pdf_files)}개의 PDF 파일을 찾았습니다.")
     for file_path in pdf_files:
-        print(f"처리 중 (PDF): {file_path}")
-        try:
-            loader = PyPDFLoader(file_path)
-            pdf_docs = loader.load()
-            for doc in pdf_docs:
-                cleaned_text = clean_text(doc.page_content)
-                if cleaned_text:
-                    # PDF는 기본적으로 page_content와 metadata를 가집니다.
-                    # source, page 등의 metadata는 loader가 자동으로 추가합니다.
-                    # 필요한 경우 추가적인 metadata를 여기에 더할 수 있습니다.
-                    doc.page_content = cleaned_text
-                    doc.metadata["source_file"] = os.path.basename(file_path)
-                    doc.metadata["file_path"] = file_path
-                    doc.metadata["source_type"] = "pdf"
-                    all_documents.append(doc)
-                else:
-                    print(f"경고: {file_path}의 한 페이지에서 유효한 텍스트가 없습니다. 이 페이지를 건너뛰었습니다.")
-        except Exception as e:
-            print(f"오류: PDF 파일 '{file_path}' 처리 중 오류 발생: {e}")
+        all_documents.extend(process_file(file_path, report))
 
     # 3. Word (docx) 파일 찾기 및 처리
     docx_files = glob.glob(os.path.join(raw_data_dir, "**", "*.docx"), recursive=True)
     print(f"'{raw_data_dir}'에서 {len(docx_files)}개의 Word (docx) 파일을 찾았습니다.")
     for file_path in docx_files:
-        print(f"처리 중 (Word): {file_path}")
-        try:
-            # Docx2txtLoader는 간단하지만, 더 강력한 파싱을 위해 UnstructuredWordDocumentLoader 권장
-            # loader = Docx2txtLoader(file_path) # 필요시 사용
-            loader = UnstructuredWordDocumentLoader(file_path) # Unstructured 라이브러리 필요
-            word_docs = loader.load()
-            for doc in word_docs:
-                cleaned_text = clean_text(doc.page_content)
-                if cleaned_text:
-                    doc.page_content = cleaned_text
-                    doc.metadata["source_file"] = os.path.basename(file_path)
-                    doc.metadata["file_path"] = file_path
-                    doc.metadata["source_type"] = "docx"
-                    all_documents.append(doc)
-                else:
-                    print(f"경고: {file_path}의 한 부분에서 유효한 텍스트가 없습니다. 이 부분을 건너뛰었습니다.")
-        except Exception as e:
-            print(f"오류: Word 파일 '{file_path}' 처리 중 오류 발생: {e}")
-            # Fallback: Docx2txtLoader 시도
-            print(f"UnstructuredWordDocumentLoader 실패, Docx2txtLoader로 재시도...")
-            try:
-                loader = Docx2txtLoader(file_path)
-                word_docs = loader.load()
-                for doc in word_docs:
-                    cleaned_text = clean_text(doc.page_content)
-                    if cleaned_text:
-                        doc.page_content = cleaned_text
-                        doc.metadata["source_file"] = os.path.basename(file_path)
-                        doc.metadata["file_path"] = file_path
-                        doc.metadata["source_type"] = "docx"
-                        all_documents.append(doc)
-            except Exception as e2:
-                print(f"오류: Docx2txtLoader도 실패 '{file_path}': {e2}")
-
-    print(f"전처리 완료. 총 {len(all_documents)}개의 Document 객체 생성.")
+        all_documents.extend(process_file(file_path, report))
+
+    report.finish()
+    print(f"전처리 완료. 총 {len(all_documents)}개의 Document 객체 생성. ({report.elapsed_s:.1f}초)")
     return all_documents
 
 def save_documents_to_pickle(documents: List[Document], output_path: str):
@@ -174,7 +247,10 @@ if __name__ == "__main__":
     
     # 전처리 실행
     print("🚀 전처리 파이프라인 시작!")
-    processed_docs = run_preprocessing_pipeline(raw_data_dir=raw_data_path)
+    from src.preprocessing.ingest_report import report_path_for
+    report = IngestionReport(raw_data_path)
+    processed_docs = run_preprocessing_pipeline(raw_data_dir=raw_data_path, report=report)
+    report.save(report_path_for(output_path))
     
     if processed_docs:
         # 결과 저장
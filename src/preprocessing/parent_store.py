@@ -0,0 +1,139 @@
+# src/preprocessing/parent_store.py
+"""
+부모-자식(parent-child) 검색용 부모 문서 저장소
+
+인덱스에는 500자 단위로 분할된 작은 자식 청크를 넣어 정확하게 매칭하고,
+답변 컨텍스트에는 청크가 속한 부모 문서(엑셀 한 행 = 상담 한 건, PDF 한 페이지, Word 한 섹션) 전체를 넣습니다.
+
+- 분할 전에 각 부모 문서에 parent_id(정수)를 기록하면 텍스트 분할기가 자식 청크의 메타데이터로 복사합니다.
+- 부모의 메타데이터는 자식 청크에 이미 있으므로, 저장소에는 부모 텍스트만 리스트로 보관합니다.
+  (parent_id = 리스트 인덱스, O(1) 조회, 벡터 인덱스 크기는 그대로)
+- 인덱스 버전 디렉토리에 parents.pkl로 함께 게시되므로 핫 리로드 시 인덱스와 같이 교체됩니다.
+"""
+import os
+import pickle
+from typing import TYPE_CHECKING, List, Optional
+
+from src.preprocessing.citations import CHUNK_ID_KEY, parent_citation_id
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+PARENTS_FILE = "parents.pkl"
+PARENT_ID_KEY = "parent_id"
+# 부모 문서에서는 의미가 없는 자식 청크 전용 메타데이터
+CHILD_ONLY_KEYS = ("start_index",)
+
+
+class ParentStore:
+    """
+    parent_id → 부모 텍스트 저장소.
+
+    Args:
+        texts (List[str]): parent_id 순서의 부모 문서 텍스트
+    """
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @classmethod
+    def from_documents(cls, documents: List["Document"]) -> "ParentStore":
+        """
+        부모 문서마다 parent_id를 메타데이터에 기록하고 저장소를 만듭니다.
+        (분할 전에 호출해야 자식 청크에 parent_id가 전달됩니다.)
+        """
+        for parent_id, doc in enumerate(documents):
+            doc.metadata[PARENT_ID_KEY] = parent_id
+        return cls([doc.page_content for doc in documents])
+
+    def append(self, documents: List["Document"]) -> List[int]:
+        """
+        새 부모 문서를 추가하고 이어지는 parent_id를 기록합니다. (감시 모드의 증분 색인)
+
+        Returns:
+            List[int]: 부여된 parent_id 리스트
+        """
+        parent_ids = []
+        for doc in documents:
+            doc.metadata[PARENT_ID_KEY] = len(self.texts)
+            parent_ids.append(len(self.texts))
+            self.texts.append(doc.page_content)
+        return parent_ids
+
+    def remove(self, parent_ids) -> int:
+        """
+        부모 문서를 비웁니다. 다른 청크의 parent_id가 바뀌지 않도록 자리는 남겨 둡니다. (압축: `corpus compact`)
+
+        Returns:
+            int: 비운 부모 문서 수
+        """
+        removed = 0
+        for parent_id in set(parent_ids):
+            if self.get(parent_id):
+                self.texts[parent_id] = ""
+                removed += 1
+        return removed
+
+    def get(self, parent_id: int) -> Optional[str]:
+        if isinstance(parent_id, int) and 0 <= parent_id < len(self.texts):
+            return self.texts[parent_id] or None
+        return None
+
+    def expand(self, chunks: List["Document"], k: Optional[int] = None) -> List["Document"]:
+        """
+        검색된 자식 청크를 부모 문서로 바꿉니다. 같은 부모의 청크는 가장 높은 순위 하나로 합치고,
+        parent_id가 없는 청크(이전 인덱스 등)는 그대로 둡니다.
+
+        Args:
+            chunks (List[Document]): 유사도 순으로 정렬된 자식 청크
+            k (int): 반환할 최대 부모 문서 수
+
+        Returns:
+            List[Document]: 부모 문서 리스트 (metadata["matched_chunks"]에 매칭된 청크 수)
+        """
+        from langchain_core.documents import Document
+
+        parents: List[Document] = []
+        by_id = {}
+        for chunk in chunks:
+            parent_id = chunk.metadata.get(PARENT_ID_KEY)
+            text = self.get(parent_id)
+            if text is None:
+                parents.append(chunk)
+                continue
+            if parent_id in by_id:
+                by_id[parent_id].metadata["matched_chunks"] += 1
+                continue
+            metadata = {key: value for key, value in chunk.metadata.items() if key not in CHILD_ONLY_KEYS}
+            metadata["matched_chunks"] = 1
+            # 모델이 부모 문서 전체를 근거로 답하므로 첫 자식 청크가 아닌 부모 ID로 인용하게 합니다.
+            metadata[CHUNK_ID_KEY] = parent_citation_id(parent_id)
+            by_id[parent_id] = Document(page_content=text, metadata=metadata)
+            parents.append(by_id[parent_id])
+        return parents[:k] if k else parents
+
+    def save(self, directory: str):
+        with open(os.path.join(directory, PARENTS_FILE), 'wb') as f:
+            pickle.dump(self.texts, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["ParentStore"]:
+        """directory의 parents.pkl을 로드합니다. 파일이 없으면 None."""
+        path = os.path.join(directory, PARENTS_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return cls(pickle.load(f))
+
+
+def attach_parent_store(vectorstore, parent_store: Optional[ParentStore]):
+    """벡터 저장소에 부모 저장소를 연결합니다. (SharedIndex 버전과 함께 교체되도록)"""
+    vectorstore.parent_store = parent_store
+    return vectorstore
+
+
+def get_parent_store(vectorstore) -> Optional[ParentStore]:
+    return getattr(vectorstore, "parent_store", None)
@@ -1,7 +1,10 @@
 import pandas as pd
 import os
+import sys
 from typing import List, Dict, Any
 
+from src.preprocessing.compact_metadata import SCHEMA_KEY, column_key, intern_schema
+
 def parse_excel_for_hr_data(file_path: str) -> List[Dict[str, Any]]:
     """
     Excel/CSV 파일을 읽어서 HR 관련 데이터를 파싱합니다.
@@ -58,11 +61,21 @@ def process_dataframe(df: pd.DataFrame, file_path: str, sheet_name: str = None)
         
     Returns:
         List[Dict[str, Any]]: 처리된 데이터 리스트
+
+    메타데이터의 컬럼 이름/파일 경로는 intern되고, 컬럼 목록(schema)은 시트의 모든 행이 같은 튜플을 공유합니다.
+    긴 값은 정규화 후 compact_metadata.compact_row_metadata()가 본문 위치로 바꿉니다. (load_excel_documents)
     """
     processed_data = []
     
     # NaN 값을 빈 문자열로 대체
     df = df.fillna('')
+
+    # 시트의 모든 행이 공유하는 값 (pickle에도 한 번만 기록됨)
+    schema = intern_schema(df.columns)
+    keys = {column: column_key(column) for column in schema}
+    source = sys.intern(os.path.basename(file_path))
+    source_type = 'excel' if file_path.endswith(('.xlsx', '.xls')) else 'csv'
+    file_path = sys.intern(file_path)
     
     # 각 행을 처리
     for index, row in df.iterrows():
@@ -79,19 +92,20 @@ def process_dataframe(df: pd.DataFrame, file_path: str, sheet_name: str = None)
             
             # 메타데이터 생성
             metadata = {
-                'source': os.path.basename(file_path),
-                'source_type': 'excel' if file_path.endswith(('.xlsx', '.xls')) else 'csv',
+                'source': source,
+                'source_type': source_type,
                 'row_index': index,
-                'file_path': file_path
+                'file_path': file_path,
+                SCHEMA_KEY: schema,
             }
             
             if sheet_name:
                 metadata['sheet_name'] = sheet_name
             
-            # 각 컬럼의 개별 값도 메타데이터에 저장
-            for col, value in row.items():
+            # 각 컬럼의 개별 값도 메타데이터에 저장 (긴 값은 정규화 후 본문 위치로 압축)
+            for col, value in zip(schema, row.values):
                 if pd.notna(value) and str(value).strip():
-                    metadata[f'column_{col}'] = str(value).strip()
+                    metadata[keys[col]] = str(value).strip()
             
             processed_data.append({
                 'text': row_text,
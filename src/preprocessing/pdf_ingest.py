@@ -0,0 +1,342 @@
+# src/preprocessing/pdf_ingest.py
+"""
+PDF 수집: 페이지 병렬 추출, 레이아웃 기반 표 감지, 파일 해시별 페이지 캐시
+
+PyPDFLoader(file_path).load()는 페이지를 순서대로 하나씩 추출하고, 표는 clean_text()를 거치며
+공백이 합쳐져 열 구분이 사라집니다. 이 모듈은
+- pypdf의 레이아웃 모드(extraction_mode="layout")로 글자의 가로 위치를 공백으로 보존하여 페이지를 추출하고,
+  페이지 범위를 여러 워커 프로세스에 나눠 병렬로 처리합니다. (pypdf는 순수 파이썬이라 스레드로는 빨라지지 않음)
+- 넓은 공백(6칸 이상)으로 열이 나뉜 줄이 이어지는 구역을 표로 보고, 모든 줄이 비어 있는 글자 위치로 열을 나눠
+  process_dataframe()과 같은 "열: 값 | 열: 값" 형식의 행 단위 Document로 만듭니다. 표 줄은 페이지 본문에서 뺍니다.
+- 페이지별 추출 결과를 파일 내용의 SHA-256 해시로 캐시하여(data/processed/pdf_cache/) 바뀐 PDF만 다시 추출합니다.
+
+표 감지는 선/좌표 정보 없이 공백 배치만 보는 휴리스틱이라, 여러 줄에 걸친 머리글/병합 셀은
+첫 열이 빈 줄을 머리글이나 이전 행에 이어 붙이는 정도로만 복원합니다. (셀 텍스트는 빠짐없이 어느 행에든 들어갑니다)
+
+설정:
+    HR_RAG_PDF_WORKERS: 추출 워커 프로세스 수 (기본 0 = CPU 수, 1 = 순차 추출)
+"""
+import hashlib
+import json
+import math
+import os
+import re
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..', '..'))
+PDF_CACHE_DIR = os.path.join(PROJECT_ROOT, 'data', 'processed', 'pdf_cache')
+
+# 추출 방식(레이아웃 모드/표 감지 입력)이 바뀌면 올려서 기존 캐시를 무효화합니다.
+PDF_CACHE_VERSION = 1
+PDF_WORKERS = int(os.getenv("HR_RAG_PDF_WORKERS", "0"))
+# 이보다 페이지가 적으면 프로세스 시작 비용이 더 커서 순차 추출합니다.
+MIN_PARALLEL_PAGES = 8
+
+# 본문 단어 사이 공백은 많아야 5칸 정도(한글 자간 보정)이고, 표의 열 사이는 그보다 넓습니다.
+TABLE_GAP = re.compile(r"\S {6,}\S")
+DOT_LEADER = re.compile(r"(?:\s?\.){4,}")   # 목차의 ". . . . ." 채움 문자
+MIN_TABLE_LINES = 3        # 표로 볼 최소 줄 수 (이어 붙인 줄 포함)
+MIN_TABULAR_LINES = 2      # 그중 넓은 공백이 있는 줄의 최소 수
+MAX_BRIDGE_LINES = 2       # 표 줄 사이에 끼어 있어도 표로 포함하는 일반 줄 수 (여러 줄 셀)
+MIN_COLUMN_GAP = 3         # 열 경계로 보는 최소 공백 폭 (모든 줄이 비어 있는 글자 위치)
+
+
+def file_sha256(file_path: str) -> str:
+    """파일 내용의 SHA-256 (캐시 키)."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ── 페이지 추출 ─────────────────────────────────────────────────────────────
+def _extract_page_text(page) -> str:
+    """레이아웃 모드로 추출하고, 지원하지 않거나 실패하면 일반 모드로 추출합니다."""
+    try:
+        return page.extract_text(extraction_mode="layout") or ""
+    except Exception:
+        return page.extract_text() or ""
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """워커 프로세스에서 [start, end) 페이지를 추출합니다. (파일은 범위마다 한 번만 엽니다)"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    return [_extract_page_text(reader.pages[i]) for i in range(start, min(end, len(reader.pages)))]
+
+
+def count_pages(file_path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(file_path).pages)
+
+
+def extract_pages(file_path: str, workers: Optional[int] = None) -> List[str]:
+    """
+    PDF의 모든 페이지 텍스트를 레이아웃을 보존해 추출합니다.
+
+    Args:
+        file_path (str): PDF 경로
+        workers (int): 워커 프로세스 수 (None이면 HR_RAG_PDF_WORKERS, 0이면 CPU 수)
+
+    Returns:
+        List[str]: 페이지 순서대로의 텍스트
+    """
+    num_pages = count_pages(file_path)
+    workers = PDF_WORKERS if workers is None else workers
+    workers = min(workers or os.cpu_count() or 1, num_pages)
+    if workers <= 1 or num_pages < MIN_PARALLEL_PAGES:
+        return _extract_page_range(file_path, 0, num_pages)
+
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    # 페이지마다 추출 비용이 달라 워커 수의 두 배로 나눠 부하를 고르게 합니다.
+    size = math.ceil(num_pages / (workers * 2))
+    ranges = [(start, start + size) for start in range(0, num_pages, size)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_extract_page_range, file_path, start, end) for start, end in ranges]
+            return [text for future in futures for text in future.result()]
+    except (BrokenProcessPool, OSError, PermissionError) as e:
+        # 프로세스를 만들 수 없는 환경(샌드박스 등)에서는 순차 추출
+        print(f"경고: PDF 병렬 추출 실패, 순차 추출로 진행합니다: {e}")
+        return _extract_page_range(file_path, 0, num_pages)
+
+
+class PdfPageCache:
+    """
+    파일 해시 → 페이지별 추출 텍스트 캐시 (<cache_dir>/<sha256>.json).
+
+    Args:
+        cache_dir (str): 캐시 디렉토리 (None이면 캐시 사용 안 함)
+    """
+
+    def __init__(self, cache_dir: Optional[str] = PDF_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, f"{sha256}.json")
+
+    def get(self, sha256: str) -> Optional[List[str]]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(sha256), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != PDF_CACHE_VERSION:
+            return None
+        return data.get("pages")
+
+    def put(self, sha256: str, file_path: str, pages: List[str]):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(sha256)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": PDF_CACHE_VERSION, "file": os.path.basename(file_path), "pages": pages},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+# ── 표 감지 ─────────────────────────────────────────────────────────────────
+def _is_tabular(line: str) -> bool:
+    line = line.rstrip()
+    return bool(TABLE_GAP.search(line)) and not DOT_LEADER.search(line)
+
+
+def find_table_blocks(lines: List[str]) -> List[Tuple[int, int]]:
+    """
+    페이지 줄 목록에서 표 구역을 찾습니다.
+
+    Returns:
+        List[Tuple[int, int]]: 표 구역의 [시작, 끝) 줄 번호
+    """
+    tabular = [i for i, line in enumerate(lines) if _is_tabular(line)]
+    blocks = []
+    group: List[int] = []
+    for i in tabular:
+        # 사이의 빈 줄은 세지 않고, 내용 있는 줄이 MAX_BRIDGE_LINES 이하이면 같은 표로 봅니다.
+        if group and sum(1 for line in lines[group[-1] + 1:i] if line.strip()) > MAX_BRIDGE_LINES:
+            blocks.append(group)
+            group = []
+        group.append(i)
+    if group:
+        blocks.append(group)
+
+    result = []
+    for group in blocks:
+        start, end = group[0], group[-1] + 1
+        end = _extend_block(lines, start, end)
+        content_lines = sum(1 for line in lines[start:end] if line.strip())
+        if len(group) >= MIN_TABULAR_LINES and content_lines >= MIN_TABLE_LINES:
+            result.append((start, end))
+    return result
+
+
+def _gutter_crossings(line: str, spans: List[Tuple[int, int]]) -> int:
+    """열 사이 빈 구간(gutter)에 글자가 걸친 수."""
+    crossings = 0
+    for (_, left_end), (right_start, _) in zip(spans, spans[1:]):
+        if line[left_end:right_start].strip():
+            crossings += 1
+    return crossings
+
+
+def _extend_block(lines: List[str], start: int, end: int) -> int:
+    """
+    표 바로 아래에 빈 줄 없이 붙은 줄 중, 열 사이 빈 구간의 절반 이상을 비워 둔 줄(넓은 공백 없이 끝난 마지막 행,
+    여러 줄 셀의 나머지 등)을 표에 포함합니다. 본문 줄은 거의 모든 빈 구간을 침범합니다.
+    """
+    spans = split_columns([line for line in lines[start:end] if line.strip()])
+    max_crossings = max(1, (len(spans) - 1) // 2)
+    for _ in range(MAX_BRIDGE_LINES):
+        if end >= len(lines) or not lines[end].strip() or _gutter_crossings(lines[end], spans) > max_crossings:
+            break
+        end += 1
+    return end
+
+
+def split_columns(lines: List[str]) -> List[Tuple[int, int]]:
+    """모든 줄이 MIN_COLUMN_GAP칸 이상 비어 있는 글자 위치를 경계로 열 구간 [시작, 끝)을 나눕니다."""
+    width = max((len(line) for line in lines), default=0)
+    occupied = [False] * width
+    for line in lines:
+        for c, char in enumerate(line):
+            if not char.isspace():
+                occupied[c] = True
+
+    spans = []
+    start = None
+    blank = 0
+    for c in range(width):
+        if occupied[c]:
+            if start is None:
+                start = c
+            elif blank >= MIN_COLUMN_GAP:
+                spans.append((start, c - blank))
+                start = c
+            blank = 0
+        else:
+            blank += 1
+    if start is not None:
+        spans.append((start, width - blank))
+    return spans
+
+
+def _cell(line: str, span: Tuple[int, int]) -> str:
+    return " ".join(line[span[0]:span[1]].split())
+
+
+def parse_table(lines: List[str]) -> Tuple[List[str], List[List[str]]]:
+    """
+    표 구역을 머리글과 행으로 나눕니다. 첫 줄부터 첫 열이 빈 줄까지는 여러 줄 머리글로 합치고,
+    이후 첫 열이 비어 있으면서 채워진 열이 절반 미만인 줄은 여러 줄 셀의 나머지로 보고 이전 행에 이어 붙입니다.
+
+    Returns:
+        Tuple[List[str], List[List[str]]]: (머리글, 행 리스트)
+    """
+    content = [line for line in lines if line.strip()]
+    spans = split_columns(content)
+    rows: List[List[str]] = []
+    for line in content:
+        cells = [_cell(line, span) for span in spans]
+        filled = sum(1 for cell in cells if cell)
+        if rows and not cells[0] and (len(rows) == 1 or filled * 2 < len(cells)):
+            rows[-1] = [" ".join(part for part in (prev, cell) if part) for prev, cell in zip(rows[-1], cells)]
+        else:
+            rows.append(cells)
+    if not rows:
+        return [], []
+    return rows[0], rows[1:]
+
+
+def table_row_text(header: List[str], row: List[str]) -> Tuple[str, Dict[str, str]]:
+    """행을 process_dataframe()과 같은 "열: 값 | 열: 값" 텍스트와 열별 값으로 만듭니다. (머리글이 비면 "열n")"""
+    values = {}
+    for i, value in enumerate(row):
+        if value:
+            column = (header[i] if i < len(header) else "") or f"열{i + 1}"
+            values[column] = value
+    return " | ".join(f"{column}: {value}" for column, value in values.items()), values
+
+
+def split_page(text: str) -> Tuple[str, List[Tuple[List[str], List[List[str]]]]]:
+    """
+    페이지 텍스트를 표 밖의 본문과 표 목록으로 나눕니다.
+
+    Returns:
+        Tuple[str, List]: (본문 텍스트, [(머리글, 행 리스트), ...])
+    """
+    lines = text.splitlines()
+    tables = []
+    prose_lines = []
+    cursor = 0
+    for start, end in find_table_blocks(lines):
+        prose_lines.extend(lines[cursor:start])
+        header, rows = parse_table(lines[start:end])
+        if rows:
+            tables.append((header, rows))
+        else:
+            prose_lines.extend(lines[start:end])
+        cursor = end
+    prose_lines.extend(lines[cursor:])
+    return "\n".join(prose_lines), tables
+
+
+# ── Document 변환 ───────────────────────────────────────────────────────────
+def load_pdf(file_path: str, cache: Optional[PdfPageCache] = None,
+             workers: Optional[int] = None) -> Tuple[List["Document"], Dict[str, Any]]:
+    """
+    PDF 하나를 페이지 본문 Document와 표 행 Document로 변환합니다. (정규화 전)
+
+    페이지 Document의 메타데이터는 PyPDFLoader와 같은 source/page(0부터)/total_pages이고,
+    표 행 Document에는 table_index(페이지 안 표 순서), row_index, column_<열> 값이 추가됩니다.
+
+    Args:
+        file_path (str): PDF 경로
+        cache (PdfPageCache): 페이지 캐시 (None이면 기본 캐시 디렉토리)
+        workers (int): 추출 워커 프로세스 수
+
+    Returns:
+        Tuple[List[Document], Dict[str, Any]]: (Document 리스트, {"pages", "tables", "table_rows", "cache_hit"})
+    """
+    from langchain_core.documents import Document
+
+    cache = cache or PdfPageCache()
+    sha256 = file_sha256(file_path)
+    pages = cache.get(sha256)
+    cache_hit = pages is not None
+    if pages is None:
+        pages = extract_pages(file_path, workers)
+        cache.put(sha256, file_path, pages)
+
+    documents = []
+    table_count = 0
+    row_count = 0
+    for page_number, text in enumerate(pages):
+        base = {"source": file_path, "page": page_number, "total_pages": len(pages)}
+        prose, tables = split_page(text)
+        documents.append(Document(page_content=prose, metadata=dict(base)))
+        for table_index, (header, rows) in enumerate(tables):
+            table_count += 1
+            for row_index, row in enumerate(rows):
+                row_text, values = table_row_text(header, row)
+                if not row_text:
+                    continue
+                metadata = {**base, "table_index": table_index, "row_index": row_index}
+                for column, value in values.items():
+                    metadata[f"column_{column}"] = value
+                documents.append(Document(page_content=row_text, metadata=metadata))
+                row_count += 1
+
+    return documents, {"pages": len(pages), "tables": table_count, "table_rows": row_count, "cache_hit": cache_hit}
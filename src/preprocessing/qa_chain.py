@@ -1,67 +1,75 @@
 # src/preprocessing/qa_chain.py
 import os
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-# from langchain.chains import RetrievalQA # 이 라인은 더 이상 직접 사용하지 않지만, 임시로 남겨둡니다.
-from langchain_community.callbacks import get_openai_callback
-import yaml
-from langchain_teddynote import logging
-
-# LCEL 구축을 위한 추가 임포트
-from langchain_core.runnables import RunnableParallel, RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
+import sys
 from operator import itemgetter # 딕셔너리에서 특정 키의 값을 추출하기 위해 사용
 
-# .env 파일에서 환경 변수를 로드합니다.
-load_dotenv()
-
-# LangSmith 추적 설정
-logging.langsmith("RAG-SAMPLE", set_enable=True)
+# 스크립트로 직접 실행해도 src 패키지를 찾을 수 있도록 프로젝트 루트를 경로에 추가
+_project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
 
 # retriever.py 파일에서 initialize_retriever 함수를 임포트합니다.
-from retriever import initialize_retriever
+from src.preprocessing.retriever import initialize_retriever
+from src.preprocessing.citations import CHUNK_ID_KEY, extract_citation_ids, format_location, location_of
+from src.preprocessing.rag_engine import (
+    DEFAULT_PROMPT_PATH,
+    NO_HISTORY_TEXT,
+    format_docs,
+    get_chat_model,
+    get_chat_prompt,
+    load_prompt_template,
+)
+
+def enable_langsmith(project_name: str = "RAG-SAMPLE"):
+    """
+    LangSmith 추적을 켭니다. 임포트만으로 추적이 켜지지 않도록 스크립트 실행 시에만 호출합니다.
+    (langchain_teddynote는 임포트가 무거워 이때 임포트합니다.)
+    """
+    from langchain_teddynote import logging
+
+    logging.langsmith(project_name, set_enable=True)
 
 def load_prompt_from_yaml(file_path: str):
-    """YAML 파일에서 프롬프트 템플릿을 로드합니다."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
-        return config.get("qa_template", "")
-    except Exception as e:
-        print(f"오류: YAML 파일에서 프롬프트 로드 실패 '{file_path}': {e}")
-        return ""
+    """YAML 파일에서 프롬프트 템플릿을 로드합니다. (rag_engine.load_prompt_template 사용)"""
+    return load_prompt_template(file_path)
 
-def build_qa_chain(retriever, llm_model_name: str = "gpt-4o-mini", llm_options: dict = None):
+def build_qa_chain(retriever, llm_model_name: str = "gpt-4o-mini", llm_options: dict = None, llm=None):
     """
     주어진 retriever와 LLM을 사용하여 질의응답 LCEL 체인을 구축합니다.
     llm_options를 통해 LLM의 추가 매개변수 (예: temperature)를 설정할 수 있습니다.
+    llm을 직접 전달하면 (예: 공용 엔진의 LLM, 테스트용 가짜 모델) llm_model_name 대신 사용합니다.
     """
+    # LCEL 구축용 Runnable (체인을 만들 때만 임포트)
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.runnables import RunnableParallel, RunnablePassthrough
+
     print("🚀 질의응답(QA) LCEL 체인 구축 시작...")
 
     if llm_options is None:
         llm_options = {}
 
-    # ChatOpenAI LLM 초기화
-    print(f"LLM 로드 중: ChatOpenAI (모델: {llm_model_name}, 옵션: {llm_options})")
+    # LLM 초기화
+    print(f"LLM 로드 중: (모델: {getattr(llm, 'model_name', llm_model_name)}, 옵션: {llm_options})")
     try:
-        llm = ChatOpenAI(model=llm_model_name, **llm_options)
+        llm = llm or get_chat_model(
+            llm_model_name,
+            temperature=llm_options.get("temperature", 0.0),
+            streaming=llm_options.get("streaming", False),
+            max_tokens=llm_options.get("max_tokens"),
+        )
     except Exception as e:
         print(f"오류: ChatOpenAI 모델 로드 실패. OPENAI_API_KEY가 올바르게 설정되었는지, 모델 이름('{llm_model_name}')이 유효한지 확인하세요. {e}")
         return None
 
-    # YAML 파일에서 프롬프트 템플릿 로드
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
-    prompt_file_path = os.path.join(project_root, 'src', 'prompt', 'qa_prompt.yaml')
-    
-    qa_template_string = load_prompt_from_yaml(prompt_file_path)
-
-    if not qa_template_string:
-        print("❌ 프롬프트 템플릿 로드 실패. QA 체인을 구축할 수 없습니다.")
+    # 프로세스 공용으로 컴파일된 프롬프트 사용 (src/prompt/qa_prompt.yaml, 고정 지침이 항상 앞부분에 위치)
+    try:
+        qa_prompt = get_chat_prompt(DEFAULT_PROMPT_PATH)
+    except ValueError as e:
+        print(f"❌ 프롬프트 템플릿 로드 실패. QA 체인을 구축할 수 없습니다. {e}")
         return None
 
-    QA_CHAIN_PROMPT = PromptTemplate.from_template(qa_template_string)
+    # 단발성 질의응답이므로 대화 기록 자리에는 기본 문구를 채워둡니다.
+    QA_CHAIN_PROMPT = qa_prompt.partial(chat_history=NO_HISTORY_TEXT)
 
     # LCEL 체인 구축 시작
     retrieval_and_pass_through_chain = RunnableParallel({
@@ -70,7 +78,8 @@ def build_qa_chain(retriever, llm_model_name: str = "gpt-4o-mini", llm_options:
     }).with_config(run_name="RetrieveAndPassQuestion")
 
     answer_generation_chain = (
-        QA_CHAIN_PROMPT | llm | StrOutputParser()
+        RunnablePassthrough.assign(context=lambda x: format_docs(x["context"]))
+        | QA_CHAIN_PROMPT | llm | StrOutputParser()
     ).with_config(run_name="GenerateAnswer")
 
     final_rag_chain = (
@@ -85,6 +94,11 @@ def build_qa_chain(retriever, llm_model_name: str = "gpt-4o-mini", llm_options:
     return final_rag_chain
 
 if __name__ == "__main__":
+    from langchain_community.callbacks import get_openai_callback
+
+    # LangSmith 추적 설정 (.env는 rag_engine 임포트 시 로드됨)
+    enable_langsmith("RAG-SAMPLE")
+
     current_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
 
@@ -122,6 +136,9 @@ if __name__ == "__main__":
             print(result["answer"])
 
             print("\n--- 참조 문서 ---")
+            cited_ids = extract_citation_ids(result["answer"])
             for i, doc in enumerate(result["source_documents"][:3]):
-                print(f"문서 {i+1} (Source: {doc.metadata.get('source', 'N/A')}, ID: {doc.metadata.get('column_ID', 'N/A')}):")
+                chunk_id = doc.metadata.get(CHUNK_ID_KEY, 'N/A')
+                cited = " ✅ 인용됨" if chunk_id in cited_ids else ""
+                print(f"문서 {i+1} [#{chunk_id}] ({format_location(location_of(doc.metadata))}){cited}:")
                 print(f"  {doc.page_content[:200]}...")
\ No newline at end of file
@@ -0,0 +1,1013 @@
+# src/preprocessing/rag_engine.py
+"""
+HR RAG 공용 엔진
+
+retriever.py / qa_chain.py / Streamlit 앱 / CLI가 각자 구현하던
+인덱스 로드 → 검색 → 컨텍스트 구성 → 답변 생성(스트리밍) 과정을 하나의 객체로 모았습니다.
+엔진은 프로세스당 한 번만 생성되어(get_engine) 모든 Streamlit 세션과 CLI가 공유합니다.
+
+사용법:
+    python -m src.preprocessing.rag_engine "권고사직을 당했을 때 실업급여를 받을 수 있나요?"
+"""
+import hashlib
+import os
+import pickle
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from src.preprocessing.citations import (
+    CHUNK_ID_KEY, assign_chunk_ids, format_location, get_location_table, is_parent_citation, location_of,
+)
+from src.preprocessing.parent_store import ParentStore, attach_parent_store, get_parent_store
+from src.preprocessing.index_store import (
+    SharedIndex,
+    file_fingerprint,
+    find_published_version,
+    load_published_index,
+    publish_index,
+    read_current_version,
+)
+
+# 무거운 의존성(yaml, FAISS, 텍스트 분할기, 프롬프트/retriever 클래스)은 처음 사용하는 함수 안에서 임포트합니다.
+# (Streamlit/CLI 시작 시간 단축, 예산은 import_budget.py로 확인)
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from langchain_core.prompts import ChatPromptTemplate
+
+    from src.preprocessing.adaptive_k import AdaptiveK
+
+load_dotenv()
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..', '..'))
+
+DEFAULT_DOCUMENTS_PATH = os.path.join(PROJECT_ROOT, 'data', 'processed', 'documents.pkl')
+DEFAULT_PROMPT_PATH = os.path.join(PROJECT_ROOT, 'src', 'prompt', 'qa_prompt.yaml')
+DEFAULT_INDEX_DIR = os.path.join(PROJECT_ROOT, 'data', 'processed', 'faiss_index')
+
+# HR_RAG_FAKE=1이면 API 키 없이 가짜 LLM/임베딩으로 실행합니다. (부하 테스트, 로컬 개발)
+# 기본 임베딩 제공자와 LLM이 가짜로 바뀌고, 코드에 고정된 모델 이름(요약 메모리, 질문 재작성 등)도 가짜 모델로 생성됩니다.
+FAKE_MODE = os.getenv("HR_RAG_FAKE", "") not in ("", "0")
+# 가짜 모드의 모델 이름 (속도 지정 가능, 예: "fake:ttft=0.8,tps=40")
+FAKE_LLM_MODEL = os.getenv("HR_RAG_FAKE_MODEL", "fake")
+
+NO_HISTORY_TEXT = "이전 대화 내용이 없습니다."
+NO_CONTEXT_TEXT = "관련 문서를 찾을 수 없습니다."
+
+# 게시된 인덱스의 구성 방식. 바뀌면(예: 자식 청크에 parent_id/chunk_id 추가) 기존 인덱스를 다시 구축합니다.
+INDEX_LAYOUT_VERSION = 3
+# 부모 문서 모드에서 k개의 서로 다른 부모를 얻기 위해 검색하는 자식 청크 배수
+PARENT_FETCH_FACTOR = 4
+
+
+@dataclass(frozen=True)
+class RagConfig:
+    """
+    RAG 엔진 설정. frozen dataclass이므로 get_engine()의 캐시 키로 사용됩니다.
+
+    Attributes:
+        documents_path (str): 전처리된 documents.pkl 경로
+        prompt_path (str): QA 프롬프트 YAML 경로
+        chunk_size (int): 텍스트 분할 청크 크기
+        chunk_overlap (int): 청크 간 겹침 크기
+        embedding_provider (str): "openai", "upstage" 또는 "fake" (FAKE_MODE이면 기본값 "fake")
+        embedding_model (str): 임베딩 모델 이름 (None이면 제공자 기본값)
+        llm_model (str): 기본 LLM 모델 이름 ("fake:ttft=0.8,tps=40" 형식의 가짜 모델 포함)
+        temperature (float): 기본 temperature
+        max_tokens (int): 답변 최대 토큰 수 (None이면 제한 없음)
+        k (int): 기본 검색 문서 수
+        index_dir (str): 구축된 FAISS 인덱스를 게시할 디렉토리 (None이면 디스크에 저장하지 않음)
+        reload_check_interval (float): 아티팩트 변경(핫 리로드) 확인 간격 (초)
+        parent_retrieval (bool): 검색된 청크 대신 청크가 속한 부모 문서(상담 한 건/페이지/섹션) 전체를 반환
+        mmap_index (bool): 게시된 인덱스를 메모리 맵으로 로드 (테넌트가 많을 때 상주 메모리 절약)
+        adaptive_k (bool): 검색 수를 관련도 임계값/점수 차/토큰 예산으로 정함 (k는 최대값, 임계값은 adaptive_k.json)
+    """
+    documents_path: str = DEFAULT_DOCUMENTS_PATH
+    prompt_path: str = DEFAULT_PROMPT_PATH
+    chunk_size: int = 500
+    chunk_overlap: int = 100
+    embedding_provider: str = "fake" if FAKE_MODE else "openai"
+    embedding_model: Optional[str] = None
+    llm_model: str = FAKE_LLM_MODEL if FAKE_MODE else "gpt-4o-mini"
+    temperature: float = 0.0
+    max_tokens: Optional[int] = None
+    k: int = 3
+    index_dir: Optional[str] = DEFAULT_INDEX_DIR
+    reload_check_interval: float = 10.0
+    parent_retrieval: bool = False
+    mmap_index: bool = False
+    adaptive_k: bool = False
+
+
+PROMPT_SECTIONS = ("system_template", "context_template", "turn_template")
+
+
+def _load_prompt_config(file_path: str) -> Dict[str, str]:
+    import yaml
+
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    except Exception as e:
+        print(f"오류: YAML 파일에서 프롬프트 로드 실패 '{file_path}': {e}")
+        return {}
+
+
+def load_prompt_template(file_path: str) -> str:
+    """
+    YAML 파일에서 QA 프롬프트 템플릿을 하나의 문자열로 로드합니다.
+    'qa_template' → 'template' 키를 우선 사용하고, 없으면 구역(system/context/turn)을 순서대로 이어 붙입니다.
+    """
+    config = _load_prompt_config(file_path)
+    if config.get("qa_template") or config.get("template"):
+        return config.get("qa_template") or config.get("template")
+    return "\n".join(config[key] for key in PROMPT_SECTIONS if config.get(key))
+
+
+def compile_chat_prompt(file_path: str) -> "ChatPromptTemplate":
+    """
+    프롬프트 YAML을 ChatPromptTemplate으로 컴파일합니다.
+
+    구역 형식(system_template/context_template/turn_template)이면
+    [고정 지침(system)] → [참고 문서] → [대화 기록 + 질문] 순서의 메시지로 구성하여,
+    요청마다 동일한 지침이 항상 프롬프트 앞부분(prefix)에 오도록 합니다. (제공자 측 프롬프트 캐시 적중)
+    단일 템플릿(qa_template/template)이면 기존처럼 하나의 메시지로 구성합니다.
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+
+    config = _load_prompt_config(file_path)
+    if all(config.get(key) for key in PROMPT_SECTIONS):
+        return ChatPromptTemplate.from_messages([
+            ("system", config["system_template"]),
+            ("human", config["context_template"]),
+            ("human", config["turn_template"]),
+        ])
+
+    template = load_prompt_template(file_path)
+    if not template:
+        raise ValueError(f"프롬프트 템플릿을 로드할 수 없습니다: {file_path}")
+    return ChatPromptTemplate.from_template(template)
+
+
+# (경로, 수정 시각)별로 컴파일된 프롬프트. 프로세스당 한 번만 YAML을 읽고 컴파일합니다.
+_prompts: Dict[tuple, "ChatPromptTemplate"] = {}
+_prompts_lock = threading.Lock()
+
+
+def _get_compiled(kind: str, file_path: str, compile_func):
+    key = (kind, os.path.abspath(file_path), file_fingerprint(file_path))
+    prompt = _prompts.get(key)
+    if prompt is None:
+        with _prompts_lock:
+            prompt = _prompts.get(key)
+            if prompt is None:
+                prompt = compile_func(file_path)
+                _prompts[key] = prompt
+    return prompt
+
+
+def get_chat_prompt(file_path: str = DEFAULT_PROMPT_PATH) -> "ChatPromptTemplate":
+    """컴파일된 프롬프트를 반환합니다. YAML이 수정된 경우에만 다시 컴파일합니다."""
+    return _get_compiled("qa", file_path, compile_chat_prompt)
+
+
+def _compile_condense_prompt(file_path: str) -> Optional["ChatPromptTemplate"]:
+    from langchain_core.prompts import ChatPromptTemplate
+
+    template = _load_prompt_config(file_path).get("condense_template")
+    return ChatPromptTemplate.from_template(template) if template else None
+
+
+def get_condense_prompt(file_path: str = DEFAULT_PROMPT_PATH) -> Optional["ChatPromptTemplate"]:
+    """후속 질문을 독립 질문으로 바꾸는 프롬프트 (YAML의 condense_template, 없으면 None)."""
+    return _get_compiled("condense", file_path, _compile_condense_prompt)
+
+
+def rewrite_query(llm, question: str, chat_history: Any, prompt_path: str = DEFAULT_PROMPT_PATH) -> str:
+    """
+    대화 기록(요약 포함)을 참고해 후속 질문을 독립된 검색 질의로 다시 작성합니다.
+    프롬프트가 없거나 결과가 비어 있으면 원래 질문을 반환합니다.
+    """
+    prompt = get_condense_prompt(prompt_path)
+    if prompt is None:
+        return question
+    response = llm.invoke(prompt.format_messages(
+        chat_history=format_chat_history(chat_history),
+        question=question,
+    ))
+    return _first_line(response, question)
+
+
+async def arewrite_query(llm, question: str, chat_history: Any, prompt_path: str = DEFAULT_PROMPT_PATH) -> str:
+    """rewrite_query()의 비동기 버전 (취소하면 진행 중인 LLM 호출도 중단됩니다)."""
+    prompt = get_condense_prompt(prompt_path)
+    if prompt is None:
+        return question
+    response = await llm.ainvoke(prompt.format_messages(
+        chat_history=format_chat_history(chat_history),
+        question=question,
+    ))
+    return _first_line(response, question)
+
+
+def _first_line(response, question: str) -> str:
+    """재작성 응답의 첫 줄 (비어 있으면 원래 질문)."""
+    rewritten = str(response.content).strip().splitlines()
+    return rewritten[0].strip() if rewritten and rewritten[0].strip() else question
+
+
+# 턴 준비 단계(검색/대화 기록 로드/질의 재작성)를 동시에 실행하는 프로세스 공용 스레드 풀
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-turn")
+    return _executor
+
+
+def token_usage(message) -> Dict[str, Optional[int]]:
+    """
+    응답 메시지의 토큰 사용량을 추출합니다. cached_tokens는 제공자 측 프롬프트 캐시에서 읽은 입력 토큰 수입니다.
+    (제공자가 반환하지 않는 값은 None)
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    details = usage.get("input_token_details") or {}
+    return {
+        "input_tokens": usage.get("input_tokens"),
+        "output_tokens": usage.get("output_tokens"),
+        "total_tokens": usage.get("total_tokens"),
+        "cached_tokens": details.get("cache_read"),
+    }
+
+
+async def astream_answer(llm, messages, emit, trace=None, span_name: str = "llm_stream") -> Tuple[str, Dict[str, Any]]:
+    """
+    LLM 답변을 비동기 스트리밍하며 토큰마다 emit(text)를 호출합니다.
+    취소되면 스트림(HTTP 응답)을 즉시 닫아 연결을 반환합니다.
+
+    Args:
+        emit (Callable): 토큰 문자열마다 호출되는 함수
+        trace (TurnTrace): 주어지면 span_name span에 ttft_ms와 토큰 사용량을 기록합니다.
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: (답변, token_usage() 결과, 제공자가 주지 않으면 빈 dict)
+    """
+    from src.preprocessing.tracing import TurnTrace
+
+    trace = trace or TurnTrace()
+    answer, usage = "", {}
+    with trace.span(span_name, model=getattr(llm, "model_name", None)) as span:
+        stream = llm.astream(messages)
+        try:
+            async for chunk in stream:
+                if chunk.content:
+                    if "ttft_ms" not in span.attrs:
+                        span.set(ttft_ms=round(span.duration_ms, 1))
+                    answer += chunk.content
+                    emit(chunk.content)
+                if getattr(chunk, "usage_metadata", None):
+                    usage = token_usage(chunk)
+        finally:
+            await stream.aclose()
+        # 제공자가 사용량을 주지 않으면 None (토큰 수를 추정하지 않음)
+        span.set(
+            tokens_in=usage.get("input_tokens"),
+            tokens_out=usage.get("output_tokens"),
+            cached_tokens=usage.get("cached_tokens"),
+            answer_chars=len(answer),
+        )
+    return answer, usage
+
+
+def create_embeddings(provider: str = "openai", model: Optional[str] = None):
+    """
+    설정된 제공자의 임베딩 모델을 생성합니다.
+
+    Args:
+        provider (str): "openai", "upstage" 또는 "fake" (API 키 없는 로컬 테스트용)
+        model (str): 모델 이름 (None이면 제공자 기본값)
+    """
+    if provider == "fake":
+        from src.preprocessing.fakes import HashEmbeddings
+        return HashEmbeddings()
+    if provider == "upstage":
+        from langchain_upstage import UpstageEmbeddings
+        return UpstageEmbeddings(model=model or "solar-embedding-1-large-passage")
+
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model=model) if model else OpenAIEmbeddings()
+
+
+# OpenAI 호환 클라이언트(ChatOpenAI, ChatUpstage)가 공유하는 HTTP 연결 풀 (keep-alive 재사용)
+HTTP_POOL_LIMITS = {"max_connections": 100, "max_keepalive_connections": 20, "keepalive_expiry": 60.0}
+_http_clients: Dict[str, Any] = {}
+_http_clients_lock = threading.Lock()
+
+
+def get_http_clients():
+    """
+    프로세스 공용 httpx 동기/비동기 클라이언트를 반환합니다.
+    모든 LLM 클라이언트가 같은 연결 풀을 쓰므로 모델을 바꿔도 TLS 연결을 새로 맺지 않습니다.
+    """
+    with _http_clients_lock:
+        if not _http_clients:
+            import httpx
+            limits = httpx.Limits(**HTTP_POOL_LIMITS)
+            timeout = httpx.Timeout(60.0, connect=10.0)
+            _http_clients["sync"] = httpx.Client(limits=limits, timeout=timeout)
+            # 비동기 클라이언트의 연결은 처음 사용한 이벤트 루프에 묶이므로, 프로세스당 하나의 루프에서 사용합니다.
+            _http_clients["async"] = httpx.AsyncClient(limits=limits, timeout=timeout)
+    return _http_clients["sync"], _http_clients["async"]
+
+
+def create_chat_model(model: str, temperature: float = 0.0, streaming: bool = True,
+                      max_tokens: Optional[int] = None):
+    """
+    모델 이름 접두사에 따라 알맞은 채팅 모델을 생성합니다.
+    gpt-* → ChatOpenAI, claude-* → ChatAnthropic, solar-* → ChatUpstage, fake → FakeChatModel
+    FAKE_MODE이면 모델 이름과 관계없이 FAKE_LLM_MODEL 설정의 FakeChatModel을 생성합니다.
+    직접 생성하기보다 get_chat_model()로 프로세스 공용 클라이언트를 재사용하세요.
+    """
+    if model.startswith("fake") or FAKE_MODE:
+        from src.preprocessing.fakes import FakeChatModel
+        return FakeChatModel.from_model_name(model if model.startswith("fake") else FAKE_LLM_MODEL)
+
+    options = {"temperature": temperature, "streaming": streaming}
+    if max_tokens:
+        options["max_tokens"] = max_tokens
+
+    if model.startswith("claude"):
+        from langchain_anthropic import ChatAnthropic
+        return ChatAnthropic(model=model, **options)
+
+    http_client, http_async_client = get_http_clients()
+    options.update(http_client=http_client, http_async_client=http_async_client)
+    if model.startswith("solar"):
+        from langchain_upstage import ChatUpstage
+        return ChatUpstage(model=model, **options)
+
+    from langchain_openai import ChatOpenAI
+    if streaming:
+        # 스트리밍 마지막 청크에 토큰 사용량(usage_metadata)을 포함하도록 요청 (지연/토큰 추적용)
+        options["stream_usage"] = True
+    return ChatOpenAI(model=model, **options)
+
+
+# (model, temperature, streaming, max_tokens)별 프로세스 공용 LLM 클라이언트
+_chat_models: Dict[tuple, Any] = {}
+_chat_models_lock = threading.Lock()
+
+
+def get_chat_model(model: str, temperature: float = 0.0, streaming: bool = True,
+                   max_tokens: Optional[int] = None):
+    """
+    채팅 모델을 설정 조합별로 프로세스당 한 번만 생성해 재사용합니다.
+    모든 엔진/세션/체인이 같은 클라이언트와 HTTP 연결 풀을 공유합니다.
+    """
+    key = (model, float(temperature), streaming, max_tokens)
+    llm = _chat_models.get(key)
+    if llm is None:
+        with _chat_models_lock:
+            llm = _chat_models.get(key)
+            if llm is None:
+                llm = create_chat_model(model, temperature, streaming, max_tokens)
+                _chat_models[key] = llm
+    return llm
+
+
+def format_docs(docs: List["Document"]) -> str:
+    """검색된 문서를 출처 표시와 함께 프롬프트에 주입할 형식으로 포맷팅합니다."""
+    if not docs:
+        return NO_CONTEXT_TEXT
+
+    formatted_docs = []
+    for i, doc in enumerate(docs, 1):
+        # chunk_id가 있으면 "[#chunk_id]"로 라벨링하여 모델이 같은 형식으로 인용하도록 합니다.
+        chunk_id = doc.metadata.get(CHUNK_ID_KEY)
+        label = f"[#{chunk_id}]" if chunk_id else f"[문서 {i}]"
+        location = location_of(doc.metadata)
+        formatted_docs.append(
+            f"{label} ({format_location(location)}, {location['type'] or '알 수 없음'})\n{doc.page_content}\n"
+        )
+
+    return "\n".join(formatted_docs)
+
+
+def format_chat_history(chat_history: Any) -> str:
+    """
+    메모리에서 가져온 대화 기록(메시지 리스트 또는 문자열)을 프롬프트용 문자열로 변환합니다.
+    """
+    if not chat_history:
+        return NO_HISTORY_TEXT
+    if isinstance(chat_history, str):
+        return chat_history
+
+    formatted_history = []
+    for msg in chat_history:
+        if not hasattr(msg, 'content'):
+            continue
+        msg_type = getattr(msg, 'type', '')
+        if msg_type == "human":
+            role = "사용자"
+        elif msg_type == "system":
+            role = "요약"
+        else:
+            role = "AI"
+        formatted_history.append(f"{role}: {msg.content}")
+    return "\n".join(formatted_history) or NO_HISTORY_TEXT
+
+
+# 인덱스 설정(index_key)별 공용 인덱스. 설정이 다른 엔진끼리도 인덱스는 공유됩니다.
+_indexes: Dict[tuple, SharedIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+_retriever_class = None
+
+
+def _engine_retriever_class():
+    """
+    EngineRetriever 클래스를 처음 필요할 때 정의합니다. (BaseRetriever 임포트가 무거워 모듈 로드 시 피함)
+    """
+    global _retriever_class
+    if _retriever_class is None:
+        from langchain_core.retrievers import BaseRetriever
+
+        class EngineRetriever(BaseRetriever):
+            """
+            RagEngine을 통해 검색하는 retriever. 호출할 때마다 공용 인덱스의 현재 버전을 사용하므로
+            핫 리로드 후에도 체인을 다시 만들 필요가 없습니다.
+            """
+            engine: Any
+            k: Optional[int] = None  # None이면 config.k (적응형이면 보정된 max_k)
+
+            def _get_relevant_documents(self, query: str, *, run_manager=None) -> List["Document"]:
+                return self.engine.retrieve(query, self.k)
+
+            async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> List["Document"]:
+                return await self.engine.aretrieve(query, self.k)
+
+        _retriever_class = EngineRetriever
+    return _retriever_class
+
+
+def __getattr__(name: str):
+    # 기존 코드의 `from src.preprocessing.rag_engine import EngineRetriever` 호환
+    if name == "EngineRetriever":
+        return _engine_retriever_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class RagEngine:
+    """
+    인덱스 로드, 검색, 컨텍스트 구성, 답변 생성/스트리밍을 담당하는 공용 RAG 엔진.
+
+    벡터 저장소와 프롬프트는 최초 사용 시 한 번만 구축되며, 이후 모든 호출이 재사용합니다.
+    """
+
+    def __init__(self, config: Optional[RagConfig] = None):
+        self.config = config or RagConfig()
+        self._shared_index: Optional[SharedIndex] = None
+
+    # ── 인덱스 ──────────────────────────────────────────────────────────────
+    def load_documents(self) -> List["Document"]:
+        """documents.pkl에서 전처리된 Document 리스트를 로드합니다."""
+        with open(self.config.documents_path, 'rb') as f:
+            documents = pickle.load(f)
+        print(f"'{self.config.documents_path}'에서 {len(documents)}개의 Document 객체를 로드했습니다.")
+        return documents
+
+    def split_documents(self, documents: List["Document"]) -> List["Document"]:
+        """설정된 청크 크기로 문서를 분할합니다. 청크에는 start_index가 기록됩니다."""
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.config.chunk_size,
+            chunk_overlap=self.config.chunk_overlap,
+            length_function=len,
+            add_start_index=True,
+        )
+        split_docs = text_splitter.split_documents(documents)
+        print(f"✅ 원본 {len(documents)}개의 문서가 {len(split_docs)}개의 청크로 분할되었습니다.")
+        return split_docs
+
+    def build_index(self):
+        """
+        문서를 로드·분할·임베딩하여 FAISS 벡터 저장소를 구축합니다.
+        원본 문서는 부모 저장소로 연결되어, 자식 청크의 parent_id로 부모 문서를 찾을 수 있습니다.
+        청크에는 안정적인 chunk_id가 부여되며 docstore ID로도 사용됩니다. (인용 → 출처 대응)
+        """
+        from langchain_community.vectorstores import FAISS
+
+        print("🚀 FAISS 인덱스 구축 시작...")
+        documents = self.load_documents()
+        if not documents:
+            raise ValueError(f"로드된 문서가 없습니다: {self.config.documents_path}")
+
+        parent_store = ParentStore.from_documents(documents)
+        split_docs = self.split_documents(documents)
+        embeddings = create_embeddings(self.config.embedding_provider, self.config.embedding_model)
+        vectorstore = FAISS.from_documents(split_docs, embeddings, ids=assign_chunk_ids(split_docs))
+        attach_parent_store(vectorstore, parent_store)
+        print(f"✅ FAISS 벡터 저장소 구축 완료. (부모 문서 {len(parent_store)}개)")
+        return vectorstore
+
+    @property
+    def index_key(self) -> tuple:
+        """인덱스 구성에 영향을 주는 설정 값. LLM/k 설정이 달라도 같은 인덱스를 공유합니다."""
+        c = self.config
+        return (c.documents_path, c.chunk_size, c.chunk_overlap, c.embedding_provider, c.embedding_model)
+
+    @property
+    def index_root(self) -> Optional[str]:
+        """이 인덱스 설정의 버전 디렉토리 루트 (index_dir/<설정 해시>)."""
+        if not self.config.index_dir:
+            return None
+        digest = hashlib.sha1(repr(self.index_key).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.config.index_dir, digest)
+
+    def artifact_fingerprint(self) -> tuple:
+        """documents.pkl과 게시된 인덱스 버전의 현재 상태. 값이 바뀌면 핫 리로드합니다."""
+        index_root = self.index_root
+        return (
+            file_fingerprint(self.config.documents_path),
+            read_current_version(index_root) if index_root else None,
+        )
+
+    def index_manifest(self, source_fingerprint) -> Dict[str, Any]:
+        """게시할 인덱스의 manifest (인덱스 설정, 구성 방식, 원본 documents.pkl 지문)."""
+        return {
+            "index_key": list(self.index_key),
+            "layout": INDEX_LAYOUT_VERSION,
+            "source_fingerprint": list(source_fingerprint or []),
+        }
+
+    def _load_or_build_index(self):
+        """
+        게시된 인덱스가 현재 documents.pkl로 만들어진 것이면 그대로 로드하고(재임베딩 없음),
+        아니면 새로 구축한 뒤 게시합니다.
+        CURRENT가 아직 갱신되지 않았더라도 현재 documents.pkl과 맞는 버전이 게시되어 있으면 그 버전을 로드합니다.
+        """
+        index_root = self.index_root
+        source_fingerprint = file_fingerprint(self.config.documents_path)
+
+        if index_root:
+            expected = self.index_manifest(source_fingerprint)
+            version = find_published_version(
+                index_root, lambda manifest: all(manifest.get(key) == value for key, value in expected.items())
+            )
+            if version:
+                embeddings = create_embeddings(self.config.embedding_provider, self.config.embedding_model)
+                loaded = load_published_index(index_root, embeddings, mmap=self.config.mmap_index, version=version)
+                if loaded is not None:
+                    print(f"✅ 저장된 FAISS 인덱스를 로드했습니다: {version}")
+                    return loaded[0]
+
+        vectorstore = self.build_index()
+        if index_root:
+            try:
+                publish_index(vectorstore, index_root, self.index_manifest(source_fingerprint))
+            except Exception as e:
+                print(f"경고: FAISS 인덱스 저장 실패 (메모리 인덱스로 계속 진행): {e}")
+        return vectorstore
+
+    @property
+    def shared_index(self) -> SharedIndex:
+        """이 엔진의 인덱스 설정에 해당하는 프로세스 공용 인덱스."""
+        if self._shared_index is None:
+            with _indexes_lock:
+                shared_index = _indexes.get(self.index_key)
+                if shared_index is None:
+                    shared_index = SharedIndex(
+                        loader=self._load_or_build_index,
+                        fingerprint=self.artifact_fingerprint,
+                        check_interval=self.config.reload_check_interval,
+                    )
+                    _indexes[self.index_key] = shared_index
+            self._shared_index = shared_index
+        return self._shared_index
+
+    def load_index(self):
+        """공용 인덱스를 (프로세스당 최초 1회만) 로드하고 현재 벡터 저장소를 반환합니다."""
+        return self.shared_index.current()
+
+    @property
+    def vectorstore(self):
+        return self.load_index()
+
+    def as_retriever(self, k: Optional[int] = None):
+        """LCEL 체인에서 사용할 retriever를 반환합니다. (항상 공용 인덱스의 현재 버전 사용)"""
+        return _engine_retriever_class()(engine=self, k=k)
+
+    # ── 검색 / 컨텍스트 ───────────────────────────────────────────────────────
+    def _parent_store_for(self, vectorstore, parents: Optional[bool]) -> Optional[ParentStore]:
+        """부모 문서 모드이면 벡터 저장소에 연결된 부모 저장소를, 아니면 None을 반환합니다."""
+        if not (self.config.parent_retrieval if parents is None else parents):
+            return None
+        return get_parent_store(vectorstore)
+
+    def adaptive_policy(self, k: Optional[int] = None) -> "AdaptiveK":
+        """
+        이 엔진의 임베딩 설정으로 보정된 적응형 검색 정책.
+        호출자가 k를 직접 준 경우에만 최대 청크 수로 사용하고, 아니면 보정된 max_k를 그대로 씁니다.
+        """
+        from src.preprocessing.adaptive_k import load_policy
+        return load_policy(self.config).with_max_k(k)
+
+    def _use_adaptive(self, adaptive: Optional[bool]) -> bool:
+        return self.config.adaptive_k if adaptive is None else adaptive
+
+    def retrieve(self, question: str, k: Optional[int] = None, parents: Optional[bool] = None,
+                 adaptive: Optional[bool] = None) -> List["Document"]:
+        """
+        질문과 관련된 청크를 k개 검색합니다.
+
+        Args:
+            parents (bool): True이면 자식 청크를 더 넓게 검색한 뒤, 중복을 제거한 부모 문서 k개를 반환
+                (None이면 config.parent_retrieval)
+            adaptive (bool): True이면 k를 최대값으로, 관련도/토큰 예산에 따라 개수를 정함 (None이면 config.adaptive_k)
+                k를 주지 않으면 최대값은 보정된 정책의 max_k입니다.
+        """
+        return self.search(question, k, parents, adaptive)[0]
+
+    def search(self, question: str, k: Optional[int] = None, parents: Optional[bool] = None,
+               adaptive: Optional[bool] = None) -> Tuple[List["Document"], Dict[str, Any]]:
+        """
+        retrieve()와 같지만 검색 정보를 함께 반환합니다.
+
+        Returns:
+            Tuple[List[Document], Dict[str, Any]]: (문서, {"chunks", "top_score"} + 적응형이면 cut/context_tokens 등)
+        """
+        with self.shared_index.acquire() as vectorstore:
+            parent_store = self._parent_store_for(vectorstore, parents)
+            if self._use_adaptive(adaptive):
+                from src.preprocessing.adaptive_k import relevance_scores, select_documents
+
+                policy = self.adaptive_policy(k)
+                fetch_k = policy.max_k * PARENT_FETCH_FACTOR if parent_store is not None else policy.max_k
+                scored = vectorstore.similarity_search_with_score(question, k=fetch_k)
+                return select_documents(relevance_scores(vectorstore, scored), policy, parent_store)
+            k = k or self.config.k
+            fetch_k = k if parent_store is None else k * PARENT_FETCH_FACTOR
+            scored = vectorstore.similarity_search_with_score(question, k=fetch_k)
+            return self._select_fixed(vectorstore, scored, k, parent_store)
+
+    async def aretrieve(self, question: str, k: Optional[int] = None, parents: Optional[bool] = None,
+                        adaptive: Optional[bool] = None) -> List["Document"]:
+        """retrieve()의 비동기 버전."""
+        return (await self.asearch(question, k, parents, adaptive))[0]
+
+    async def asearch(self, question: str, k: Optional[int] = None, parents: Optional[bool] = None,
+                      adaptive: Optional[bool] = None) -> Tuple[List["Document"], Dict[str, Any]]:
+        """
+        search()의 비동기 버전. 질문 임베딩은 aembed_query로, FAISS 검색은 기본 스레드 풀에서 실행합니다.
+        인덱스를 처음 로드해야 하면 이벤트 루프를 막지 않도록 스레드에서 로드합니다.
+        """
+        import asyncio
+
+        if not self.shared_index.loaded:
+            await asyncio.to_thread(self.shared_index.current)
+        with self.shared_index.acquire() as vectorstore:
+            parent_store = self._parent_store_for(vectorstore, parents)
+            if self._use_adaptive(adaptive):
+                from src.preprocessing.adaptive_k import relevance_scores, select_documents
+
+                policy = self.adaptive_policy(k)
+                fetch_k = policy.max_k * PARENT_FETCH_FACTOR if parent_store is not None else policy.max_k
+                scored = await vectorstore.asimilarity_search_with_score(question, k=fetch_k)
+                return select_documents(relevance_scores(vectorstore, scored), policy, parent_store)
+            k = k or self.config.k
+            fetch_k = k if parent_store is None else k * PARENT_FETCH_FACTOR
+            scored = await vectorstore.asimilarity_search_with_score(question, k=fetch_k)
+            return self._select_fixed(vectorstore, scored, k, parent_store)
+
+    @staticmethod
+    def _select_fixed(vectorstore, scored, k: int,
+                      parent_store: Optional[ParentStore]) -> Tuple[List["Document"], Dict[str, Any]]:
+        """고정 k 검색 결과와 검색 정보 (top_score: 가장 관련도 높은 청크의 관련도, 모델 캐스케이드 판단용)."""
+        from src.preprocessing.adaptive_k import relevance_scores
+
+        docs = [doc for doc, _ in scored]
+        if parent_store is not None:
+            docs = parent_store.expand(docs, k)
+        top_score = max((score for _, score in relevance_scores(vectorstore, scored)), default=None)
+        return docs, {"chunks": len(docs), "top_score": round(top_score, 4) if top_score is not None else None}
+
+    def retrieve_batch(self, questions: List[str], k: Optional[int] = None,
+                       parents: Optional[bool] = None) -> List[List["Document"]]:
+        """
+        여러 질문을 한 번에 검색합니다.
+        질문 임베딩을 한 번의 배치 호출로 계산하고, FAISS 검색도 행렬 단위로 한 번에 수행합니다.
+
+        Returns:
+            List[List[Document]]: 질문 순서대로의 검색 결과
+        """
+        import numpy as np
+        from langchain_community.vectorstores.faiss import dependable_faiss_import
+        from langchain_core.documents import Document
+
+        if not questions:
+            return []
+        k = k or self.config.k
+        with self.shared_index.acquire() as vectorstore:
+            parent_store = self._parent_store_for(vectorstore, parents)
+            fetch_k = k * PARENT_FETCH_FACTOR if parent_store is not None else k
+            # 인덱스 구축과 같은 임베딩 모델로 질문들을 한 번에 임베딩
+            vectors = np.asarray(vectorstore._embed_documents(list(questions)), dtype=np.float32)
+            if getattr(vectorstore, "_normalize_L2", False):
+                dependable_faiss_import().normalize_L2(vectors)
+            _, indices = vectorstore.index.search(vectors, fetch_k)
+
+            results = []
+            for row in indices:
+                docs = []
+                for i in row:
+                    if i == -1:
+                        continue
+                    doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+                    if isinstance(doc, Document):
+                        docs.append(doc)
+                results.append(parent_store.expand(docs, k) if parent_store is not None else docs)
+        return results
+
+    def format_context(self, docs: List["Document"]) -> str:
+        return format_docs(docs)
+
+    def resolve_citations(self, answer: str) -> List[Dict[str, Any]]:
+        """
+        답변에 인용된 [#chunk_id]를 현재 인덱스의 위치 표로 출처에 대응시킵니다. (검색 호출 없음)
+        부모 문서 인용([#p12])은 부모 문서 전체 텍스트로 해석합니다.
+
+        Returns:
+            List[Dict[str, Any]]: 인용 순서대로의 {"id", "label", "text", file/page/row/sheet/start_index...}
+        """
+        from langchain_core.documents import Document
+
+        with self.shared_index.acquire() as vectorstore:
+            citations = get_location_table(vectorstore).resolve(answer)
+            parent_store = get_parent_store(vectorstore)
+            for citation in citations:
+                if is_parent_citation(citation["id"]):
+                    text = parent_store.get(citation["parent_id"]) if parent_store is not None else None
+                    citation["text"] = text or ""
+                    continue
+                doc = vectorstore.docstore.search(citation["id"])
+                citation["text"] = doc.page_content if isinstance(doc, Document) else ""
+        return citations
+
+    # ── 프롬프트 / LLM ───────────────────────────────────────────────────────
+    @property
+    def prompt(self) -> "ChatPromptTemplate":
+        """프로세스 공용으로 컴파일된 QA 프롬프트 (고정 지침 → 참고 문서 → 대화 기록/질문 순서)."""
+        return get_chat_prompt(self.config.prompt_path)
+
+    def build_messages(self, question: str, context: str, chat_history: Any = None):
+        """대화 기록, 참고 문서, 질문으로 LLM 입력 메시지를 구성합니다."""
+        return self.prompt.format_messages(
+            chat_history=format_chat_history(chat_history),
+            context=context,
+            question=question,
+        )
+
+    def get_llm(self, model: Optional[str] = None, temperature: Optional[float] = None,
+                streaming: bool = True, max_tokens: Optional[int] = None):
+        """
+        프로세스 공용 LLM 풀에서 (model, temperature, streaming, max_tokens) 조합의 채팅 모델을 가져옵니다.
+        max_tokens를 주면 config.max_tokens 대신 사용합니다. (엔진/인덱스를 따로 만들지 않고 답변 길이만 제한)
+        """
+        model = model or self.config.llm_model
+        temperature = self.config.temperature if temperature is None else temperature
+        return get_chat_model(model, temperature, streaming, max_tokens or self.config.max_tokens)
+
+    # ── 생성 ────────────────────────────────────────────────────────────────
+    def prepare_turn(self, question: str, load_history=None, k: Optional[int] = None,
+                     condenser=None, rewrite_timeout: float = 3.0, trace=None,
+                     parents: Optional[bool] = None, adaptive: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        대화형 턴의 생성 직전 상태를 준비합니다. 서로 독립적인 단계를 동시에 실행하여 첫 토큰까지의 시간을 줄입니다.
+
+        1) 원래 질문으로 검색 (스레드 풀)
+        2) 그동안 현재 스레드에서 대화 기록 로드 (load_history)
+        3) condenser가 재작성이 필요하다고 판단하면, 독립 질문으로 재작성 → 재검색 (스레드 풀, 1과 병렬)
+        재작성 검색이 rewrite_timeout 안에 결과를 내면 그것을, 아니면 원래 질문의 검색 결과를 사용합니다.
+
+        Args:
+            load_history (Callable): 대화 기록(메시지 리스트 또는 문자열)을 반환하는 함수
+            condenser (QueryCondenser): 후속 질문 재작성기 (None이면 재작성하지 않음)
+            trace (TurnTrace): 주어지면 단계별 span을 기록합니다.
+            parents (bool): 부모 문서 모드 (None이면 config.parent_retrieval)
+            adaptive (bool): 적응형 검색 수 (None이면 config.adaptive_k, k는 최대값)
+
+        Returns:
+            Dict[str, Any]: question, query(검색에 사용한 질의), chat_history, messages, source_documents,
+                retrieval(사용한 검색의 정보: chunks, top_score ...)
+        """
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+
+        from src.preprocessing.tracing import TurnTrace
+
+        trace = trace or TurnTrace()
+        executor = get_executor()
+
+        retrieval: Dict[str, Dict[str, Any]] = {}
+
+        def timed_retrieve(span_name: str, query: str) -> List["Document"]:
+            with trace.span(span_name, k=k or self.config.k) as span:
+                docs, info = self.search(query, k, parents, adaptive)
+                span.set(**info)
+            retrieval[query] = info
+            return docs
+
+        raw_future = executor.submit(timed_retrieve, "retrieve", question)
+
+        chat_history = None
+        if load_history is not None:
+            with trace.span("load_memory") as span:
+                chat_history = load_history()
+                span.set(messages=len(chat_history) if isinstance(chat_history, list) else 0)
+
+        query, docs = question, None
+        if condenser is not None and not condenser.needs_condensing(question, chat_history):
+            condenser.record_bypass()
+        elif condenser is not None:
+            def rewrite_and_retrieve():
+                with trace.span("rewrite_query") as span:
+                    rewritten, info = condenser.condense(question, chat_history)
+                    span.set(rewritten=rewritten != question, **info)
+                if rewritten == question:
+                    return rewritten, None
+                return rewritten, timed_retrieve("retrieve_rewritten", rewritten)
+
+            rewrite_future = executor.submit(rewrite_and_retrieve)
+            try:
+                rewritten, rewritten_docs = rewrite_future.result(timeout=rewrite_timeout)
+                if rewritten_docs:
+                    query, docs = rewritten, rewritten_docs
+            except FutureTimeoutError:
+                trace.set(rewrite_timeout=True)
+            except Exception as e:
+                print(f"경고: 질의 재작성 실패 (원래 질문으로 검색): {e}")
+
+        if docs is None:
+            docs = raw_future.result()
+
+        with trace.span("format_messages") as span:
+            messages = self.build_messages(question, self.format_context(docs), chat_history)
+            span.set(prompt_chars=sum(len(str(m.content)) for m in messages))
+        return {"question": question, "query": query, "chat_history": chat_history,
+                "messages": messages, "source_documents": docs, "retrieval": retrieval.get(query, {})}
+
+    async def aprepare_turn(self, question: str, load_history=None, k: Optional[int] = None,
+                            condenser=None, rewrite_timeout: float = 3.0, trace=None,
+                            parents: Optional[bool] = None, adaptive: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        prepare_turn()의 비동기 버전. 검색, 대화 기록 로드, 질의 재작성을 같은 이벤트 루프에서 동시에 실행합니다.
+        취소되면 진행 중인 검색과 재작성 LLM 호출도 함께 취소되고, rewrite_timeout을 넘긴 재작성은 중단됩니다.
+
+        Args:
+            load_history (Callable): 대화 기록(메시지 리스트 또는 문자열)을 반환하는 코루틴 함수
+
+        Returns:
+            Dict[str, Any]: prepare_turn()과 같음
+        """
+        import asyncio
+
+        from src.preprocessing.tracing import TurnTrace
+
+        trace = trace or TurnTrace()
+
+        retrieval: Dict[str, Dict[str, Any]] = {}
+
+        async def timed_retrieve(span_name: str, query: str) -> List["Document"]:
+            with trace.span(span_name, k=k or self.config.k) as span:
+                docs, info = await self.asearch(query, k, parents, adaptive)
+                span.set(**info)
+            retrieval[query] = info
+            return docs
+
+        raw_task = asyncio.ensure_future(timed_retrieve("retrieve", question))
+        # 재작성 결과를 사용해 기다리지 않게 된 원래 검색의 예외는 조용히 버립니다.
+        raw_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            chat_history = None
+            if load_history is not None:
+                with trace.span("load_memory") as span:
+                    chat_history = await load_history()
+                    span.set(messages=len(chat_history) if isinstance(chat_history, list) else 0)
+
+            query, docs = question, None
+            if condenser is not None and not condenser.needs_condensing(question, chat_history):
+                condenser.record_bypass()
+            elif condenser is not None:
+                async def rewrite_and_retrieve():
+                    with trace.span("rewrite_query") as span:
+                        rewritten, info = await condenser.acondense(question, chat_history)
+                        span.set(rewritten=rewritten != question, **info)
+                    if rewritten == question:
+                        return rewritten, None
+                    return rewritten, await timed_retrieve("retrieve_rewritten", rewritten)
+
+                try:
+                    rewritten, rewritten_docs = await asyncio.wait_for(rewrite_and_retrieve(), rewrite_timeout)
+                    if rewritten_docs:
+                        query, docs = rewritten, rewritten_docs
+                except asyncio.TimeoutError:
+                    trace.set(rewrite_timeout=True)
+                except Exception as e:
+                    print(f"경고: 질의 재작성 실패 (원래 질문으로 검색): {e}")
+
+            if docs is None:
+                docs = await raw_task
+        finally:
+            raw_task.cancel()
+
+        with trace.span("format_messages") as span:
+            messages = self.build_messages(question, self.format_context(docs), chat_history)
+            span.set(prompt_chars=sum(len(str(m.content)) for m in messages))
+        return {"question": question, "query": query, "chat_history": chat_history,
+                "messages": messages, "source_documents": docs, "retrieval": retrieval.get(query, {})}
+
+    def prepare(self, question: str, chat_history: Any = None, k: Optional[int] = None) -> Dict[str, Any]:
+        """검색과 프롬프트 구성을 수행해 생성 직전 상태를 반환합니다."""
+        docs = self.retrieve(question, k)
+        messages = self.build_messages(question, self.format_context(docs), chat_history)
+        return {"question": question, "messages": messages, "source_documents": docs}
+
+    def generate(self, question: str, chat_history: Any = None, k: Optional[int] = None,
+                 model: Optional[str] = None, temperature: Optional[float] = None) -> Dict[str, Any]:
+        """질문에 대한 답변과 참조 문서를 반환합니다."""
+        prepared = self.prepare(question, chat_history, k)
+        llm = self.get_llm(model, temperature, streaming=False)
+        response = llm.invoke(prepared["messages"])
+        return {"answer": response.content, "source_documents": prepared["source_documents"],
+                "usage": token_usage(response)}
+
+    def stream(self, question: str, chat_history: Any = None, k: Optional[int] = None,
+               model: Optional[str] = None, temperature: Optional[float] = None) -> Iterator[str]:
+        """질문에 대한 답변을 토큰 단위로 스트리밍합니다."""
+        prepared = self.prepare(question, chat_history, k)
+        llm = self.get_llm(model, temperature, streaming=True)
+        for chunk in llm.stream(prepared["messages"]):
+            if chunk.content:
+                yield chunk.content
+
+
+_engines: Dict[RagConfig, RagEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(config: Optional[RagConfig] = None) -> RagEngine:
+    """
+    설정별 RagEngine을 프로세스당 하나만 생성하여 반환합니다.
+    Streamlit은 스크립트를 매번 재실행하지만 모듈은 유지되므로 모든 세션이 같은 엔진을 공유합니다.
+    """
+    config = config or RagConfig()
+    with _engines_lock:
+        engine = _engines.get(config)
+        if engine is None:
+            engine = RagEngine(config)
+            _engines[config] = engine
+    return engine
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HR RAG 엔진 CLI")
+    parser.add_argument("question", nargs="?", default="권고사직을 당했을 때 실업급여를 받을 수 있나요?")
+    parser.add_argument("--k", type=int, default=3, help="검색할 문서 수")
+    # 기본값은 RagConfig를 따릅니다. (HR_RAG_FAKE=1이면 가짜 LLM/임베딩)
+    parser.add_argument("--model", default=RagConfig().llm_model, help="LLM 모델 이름")
+    parser.add_argument("--embedding-provider", default=RagConfig().embedding_provider,
+                        choices=["openai", "upstage", "fake"])
+    parser.add_argument("--retrieve-only", action="store_true", help="답변 생성 없이 검색 결과만 출력")
+    parser.add_argument("--parents", action="store_true", help="청크 대신 부모 문서(상담 한 건/페이지/섹션) 전체를 검색")
+    parser.add_argument("--tenant", default=None, help="고객사(테넌트) 이름 (기본: default, data/processed/documents.pkl)")
+    args = parser.parse_args()
+
+    config = RagConfig(k=args.k, llm_model=args.model, embedding_provider=args.embedding_provider,
+                       parent_retrieval=args.parents)
+    if args.tenant:
+        from src.preprocessing.tenants import tenant_config
+        config = tenant_config(args.tenant, config)
+    engine = get_engine(config)
+
+    print(f"질문: {args.question}")
+    if args.retrieve_only:
+        for i, doc in enumerate(engine.retrieve(args.question), 1):
+            print(f"\n--- 문서 {i} ---")
+            print(f"Content 미리보기: {doc.page_content[:200]}...")
+            print(f"Metadata: {doc.metadata}")
+    else:
+        print("\n--- 답변 ---")
+        for token in engine.stream(args.question):
+            print(token, end="", flush=True)
+        print()
@@ -1,19 +1,21 @@
-# src/preprocessing/retriever.py (이 코드로 파일을 업데이트 해주세요)
-print("DEBUG: Script started.")
-
+# src/preprocessing/retriever.py
 import os
+import sys
 import pickle
-from typing import List
-from langchain_core.documents import Document
-from langchain_upstage import UpstageEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from dotenv import load_dotenv
+from typing import TYPE_CHECKING, List
+
+# 스크립트로 직접 실행해도 src 패키지를 찾을 수 있도록 프로젝트 루트를 경로에 추가
+_project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+# 환경 변수(.env)는 rag_engine 임포트 시 한 번 로드됩니다.
+from src.preprocessing.rag_engine import RagConfig, get_engine
 
-load_dotenv()
-print("DEBUG: Environment variables loaded.")
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
 
-def load_documents_from_pickle(input_path: str) -> List[Document]:
+def load_documents_from_pickle(input_path: str) -> List["Document"]:
     """
     저장된 pickle 파일에서 Document 객체 리스트를 로드합니다.
     """
@@ -26,56 +28,26 @@ def load_documents_from_pickle(input_path: str) -> List[Document]:
         print(f"오류: pickle 파일 로드 실패 '{input_path}': {e}")
         return []
 
-def initialize_retriever(processed_data_path: str):
+def initialize_retriever(processed_data_path: str, k: int = 4):
     """
-    Document를 로드하고, 텍스트 분할, 임베딩 모델을 사용하여 FAISS 벡터 저장소를 구축한 후, retriever를 반환합니다.
+    공용 RagEngine으로 FAISS 벡터 저장소를 (프로세스당 한 번) 구축한 후, retriever를 반환합니다.
+    임베딩 설정은 기본 RagConfig를 따르므로, 기본 문서 경로이면 get_engine()과 같은 엔진과 인덱스를 공유합니다.
+    k는 엔진 설정이 아니라 retriever에만 적용합니다. (k가 달라도 같은 엔진 사용)
     """
     print("🚀 Retriever 초기화 시작...")
 
-    documents = load_documents_from_pickle(processed_data_path)
-
-    if not documents:
-        print("❌ 로드된 문서가 없습니다. retriever를 초기화할 수 없습니다.")
-        return None
-
-    print("텍스트 분할(Text Splitting) 중...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=100,
-        length_function=len,
-        add_start_index=True,
-    )
-    
-    split_documents = text_splitter.split_documents(documents)
-    print(f"✅ 원본 {len(documents)}개의 문서가 {len(split_documents)}개의 청크로 분할되었습니다.")
-
-    # 2. 임베딩 모델 로드
-    # UpstageEmbeddings에 'model' 인자를 추가하여 사용할 모델 이름을 명시합니다.
-    model_name = "solar-embedding-1-large-passage" # <-- 모델 이름 변경
-    print(f"임베딩 모델 로드 중: UpstageEmbeddings (모델: {model_name})")
-
-    try:
-        embeddings = UpstageEmbeddings(model=model_name)
-    except Exception as e:
-        print(f"오류: UpstageEmbeddings 모델 로드 실패. UPSTAGE_API_KEY가 올바르게 설정되었는지 확인하거나, 모델 이름('{model_name}')을 확인하세요. {e}")
-        return None
+    config = RagConfig(documents_path=processed_data_path)
 
-    # 3. FAISS 벡터 저장소 구축 (분할된 문서 사용)
-    print("FAISS 벡터 저장소 구축 중...")
     try:
-        vectorstore = FAISS.from_documents(split_documents, embeddings)
-        print("✅ FAISS 벡터 저장소 구축 완료.")
+        retriever = get_engine(config).as_retriever(k)
     except Exception as e:
-        print(f"오류: FAISS 벡터 저장소 구축 실패: {e}")
+        print(f"오류: Retriever 초기화 실패. 임베딩 API 키와 문서 경로('{processed_data_path}')를 확인하세요. {e}")
         return None
 
-    # 4. retriever 반환
-    retriever = vectorstore.as_retriever()
     print("✅ Retriever 초기화 완료!")
     return retriever
 
 if __name__ == "__main__":
-    print("DEBUG: Inside __main__ block.")
     current_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
 
@@ -0,0 +1,360 @@
+# src/preprocessing/session_store.py
+"""
+대화 세션 저장소 (st.session_state 밖의 영구 저장소)
+
+세션 목록, 메시지, ConversationSummaryBufferMemory의 누적 요약을 저장합니다.
+    - SQLiteSessionStore (기본): WAL 모드로 여러 프로세스(레플리카)가 같은 DB를 읽고 쓸 수 있으며,
+      쓰기는 모아서 백그라운드 스레드가 한 트랜잭션으로 기록합니다(batched writes).
+    - InMemorySessionStore: 프로세스 메모리에만 보관 (HR_RAG_SESSION_DB=memory)
+
+크기 제한:
+    - max_messages_per_session: 세션당 보관할 최근 메시지 수 (초과분은 오래된 것부터 삭제)
+    - max_sessions_per_owner: 사용자(브라우저)당 보관할 세션 수 (초과분은 오래된 세션부터 삭제)
+
+get_session_store()가 프로세스 공용 저장소를 반환합니다. 경로는 HR_RAG_SESSION_DB로 변경할 수 있습니다.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+DEFAULT_SESSION_DB = os.path.join(PROJECT_ROOT, '.cache', 'sessions.db')
+
+# (role, content) — role은 "human" 또는 "ai"
+# 화면에만 보여 주고 대화 메모리에는 넣지 않는 메시지(인사 등 템플릿으로 답한 턴)는 "display_human" / "display_ai"
+Message = Tuple[str, str]
+DISPLAY_ONLY_PREFIX = "display_"
+
+
+def display_only(messages: List[Message]) -> List[Message]:
+    """메시지를 화면 전용 role로 바꿉니다. (요약 메모리 복원에서 제외)"""
+    return [(DISPLAY_ONLY_PREFIX + role, content) for role, content in messages]
+
+
+def conversation_messages(messages: List[Message], limit: Optional[int] = None) -> List[Message]:
+    """화면 전용 메시지를 뺀 대화 메시지 중 최근 limit개 (오래된 순)."""
+    conversation = [(role, content) for role, content in messages if not role.startswith(DISPLAY_ONLY_PREFIX)]
+    return conversation[-limit:] if limit else conversation
+
+
+class SessionStore(ABC):
+    """
+    세션 저장소 인터페이스. 구현체는 아래 메서드를 제공합니다.
+    list_sessions()는 생성 시각 역순, load_messages()는 오래된 순으로 반환합니다.
+    """
+
+    def __init__(self, max_messages_per_session: int = 200, max_sessions_per_owner: int = 50):
+        self.max_messages_per_session = max_messages_per_session
+        self.max_sessions_per_owner = max_sessions_per_owner
+
+    @abstractmethod
+    def list_sessions(self, owner_id: str) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def create_session(self, owner_id: str, session_id: str, title: str):
+        ...
+
+    @abstractmethod
+    def update_title(self, session_id: str, title: str):
+        ...
+
+    @abstractmethod
+    def delete_session(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def append_messages(self, session_id: str, messages: List[Message]):
+        ...
+
+    @abstractmethod
+    def load_messages(self, session_id: str, limit: Optional[int] = None) -> List[Message]:
+        ...
+
+    @abstractmethod
+    def clear_messages(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def save_summary(self, session_id: str, summary: str, buffer_len: int):
+        """누적 요약과, 요약되지 않고 버퍼에 남아 있는 최근 메시지 수를 저장합니다."""
+
+    @abstractmethod
+    def load_summary(self, session_id: str) -> Tuple[str, int]:
+        """(누적 요약, 버퍼 메시지 수)를 반환합니다. 없으면 ("", 0)."""
+
+    def flush(self):
+        """대기 중인 쓰기를 기록합니다. (즉시 기록하는 구현은 아무것도 하지 않음)"""
+
+
+class InMemorySessionStore(SessionStore):
+    """프로세스 메모리에만 보관하는 저장소 (재시작 시 사라짐)."""
+
+    def __init__(self, **limits):
+        super().__init__(**limits)
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._messages: Dict[str, List[Message]] = {}
+
+    def list_sessions(self, owner_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            sessions = [dict(s) for s in self._sessions.values() if s["owner_id"] == owner_id]
+        return sorted(sessions, key=lambda s: s["created_at"], reverse=True)
+
+    def create_session(self, owner_id: str, session_id: str, title: str):
+        with self._lock:
+            self._sessions[session_id] = {
+                "session_id": session_id, "owner_id": owner_id, "title": title,
+                "created_at": time.time(), "summary": "", "buffer_len": 0,
+            }
+            self._messages[session_id] = []
+            owned = sorted((s for s in self._sessions.values() if s["owner_id"] == owner_id),
+                           key=lambda s: s["created_at"], reverse=True)
+            for stale in owned[self.max_sessions_per_owner:]:
+                self._sessions.pop(stale["session_id"], None)
+                self._messages.pop(stale["session_id"], None)
+
+    def update_title(self, session_id: str, title: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id]["title"] = title
+
+    def delete_session(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._messages.pop(session_id, None)
+
+    def append_messages(self, session_id: str, messages: List[Message]):
+        with self._lock:
+            stored = self._messages.setdefault(session_id, [])
+            stored.extend(messages)
+            del stored[:-self.max_messages_per_session]
+
+    def load_messages(self, session_id: str, limit: Optional[int] = None) -> List[Message]:
+        with self._lock:
+            stored = list(self._messages.get(session_id, []))
+        return stored[-limit:] if limit else stored
+
+    def clear_messages(self, session_id: str):
+        with self._lock:
+            self._messages[session_id] = []
+            if session_id in self._sessions:
+                self._sessions[session_id].update(summary="", buffer_len=0)
+
+    def save_summary(self, session_id: str, summary: str, buffer_len: int):
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id].update(summary=summary, buffer_len=buffer_len)
+
+    def load_summary(self, session_id: str) -> Tuple[str, int]:
+        with self._lock:
+            session = self._sessions.get(session_id) or {}
+        return session.get("summary", ""), session.get("buffer_len", 0)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite 세션 저장소. WAL 모드와 synchronous=NORMAL로 동시 읽기와 빠른 커밋을 사용하고,
+    쓰기는 flush_interval초마다(또는 max_pending개가 모이면) 한 트랜잭션으로 기록합니다.
+    읽기 전에는 대기 중인 쓰기를 먼저 기록하므로 같은 프로세스에서는 항상 최신 상태를 읽습니다.
+
+    Args:
+        db_path (str): SQLite 파일 경로
+        flush_interval (float): 백그라운드 쓰기 간격 (초)
+        max_pending (int): 이 개수 이상 쓰기가 쌓이면 즉시 기록
+    """
+
+    def __init__(self, db_path: str = DEFAULT_SESSION_DB, flush_interval: float = 0.5,
+                 max_pending: int = 64, **limits):
+        super().__init__(**limits)
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._pending: List[Tuple[str, tuple]] = []
+        self._touched: set = set()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                owner_id   TEXT NOT NULL,
+                title      TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                summary    TEXT NOT NULL DEFAULT '',
+                buffer_len INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_owner ON sessions(owner_id, created_at);
+            CREATE TABLE IF NOT EXISTS messages (
+                id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+                role       TEXT NOT NULL,
+                content    TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id);
+        """)
+        self._conn.commit()
+
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._flush_loop, name="session-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # ── 쓰기 (배치) ───────────────────────────────────────────────────────────
+    def _enqueue(self, sql: str, params: tuple, session_id: Optional[str] = None):
+        with self._lock:
+            self._pending.append((sql, params))
+            if session_id:
+                self._touched.add(session_id)
+            should_flush = len(self._pending) >= self.max_pending
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            touched, self._touched = self._touched, set()
+            failed = 0
+            try:
+                with self._conn:
+                    for sql, params in pending:
+                        try:
+                            self._conn.execute(sql, params)
+                        except sqlite3.IntegrityError:
+                            # 이미 삭제된 세션에 대한 쓰기 등은 건너뜀
+                            failed += 1
+                    for session_id in touched:
+                        self._conn.execute(
+                            "DELETE FROM messages WHERE session_id = ? AND id NOT IN "
+                            "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                            (session_id, session_id, self.max_messages_per_session),
+                        )
+            except sqlite3.Error as e:
+                # 트랜잭션은 롤백되었으므로 배치를 대기열 앞에 되돌려 다음 기록 때 다시 시도합니다.
+                self._pending[:0] = pending
+                self._touched |= touched
+                print(f"경고: 세션 저장소 기록 실패 ({len(pending)}건, 다음 기록 때 재시도): {e}")
+                return
+            if failed:
+                print(f"경고: 세션 저장소 쓰기 {failed}건을 건너뛰었습니다 (삭제된 세션).")
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """남은 쓰기를 기록하고 연결을 닫습니다."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        self.flush()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # ── 세션 ─────────────────────────────────────────────────────────────────
+    def list_sessions(self, owner_id: str) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT session_id, title, created_at FROM sessions WHERE owner_id = ? ORDER BY created_at DESC",
+            (owner_id,),
+        )
+        return [{"session_id": r[0], "owner_id": owner_id, "title": r[1], "created_at": r[2]} for r in rows]
+
+    def create_session(self, owner_id: str, session_id: str, title: str):
+        self._enqueue("INSERT OR IGNORE INTO sessions (session_id, owner_id, title, created_at) VALUES (?, ?, ?, ?)",
+                      (session_id, owner_id, title, time.time()))
+        self._enqueue(
+            "DELETE FROM sessions WHERE owner_id = ? AND session_id NOT IN "
+            "(SELECT session_id FROM sessions WHERE owner_id = ? ORDER BY created_at DESC LIMIT ?)",
+            (owner_id, owner_id, self.max_sessions_per_owner),
+        )
+
+    def update_title(self, session_id: str, title: str):
+        self._enqueue("UPDATE sessions SET title = ? WHERE session_id = ?", (title, session_id))
+
+    def delete_session(self, session_id: str):
+        self._enqueue("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    # ── 메시지 / 요약 ─────────────────────────────────────────────────────────
+    def append_messages(self, session_id: str, messages: List[Message]):
+        now = time.time()
+        for role, content in messages:
+            self._enqueue("INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                          (session_id, role, content, now), session_id)
+
+    def load_messages(self, session_id: str, limit: Optional[int] = None) -> List[Message]:
+        rows = self._query(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, limit or self.max_messages_per_session),
+        )
+        return [(role, content) for role, content in reversed(rows)]
+
+    def clear_messages(self, session_id: str):
+        self._enqueue("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        self.save_summary(session_id, "", 0)
+
+    def save_summary(self, session_id: str, summary: str, buffer_len: int):
+        self._enqueue("UPDATE sessions SET summary = ?, buffer_len = ? WHERE session_id = ?",
+                      (summary, buffer_len, session_id))
+
+    def load_summary(self, session_id: str) -> Tuple[str, int]:
+        rows = self._query("SELECT summary, buffer_len FROM sessions WHERE session_id = ?", (session_id,))
+        return (rows[0][0], rows[0][1]) if rows else ("", 0)
+
+
+def evict_idle(entries: Dict[str, Any], last_used: Dict[str, float], idle_seconds: float,
+               max_entries: int, keep: Optional[str] = None) -> List[str]:
+    """
+    메모리 캐시(dict)에서 idle_seconds 이상 사용되지 않은 항목과, max_entries를 넘는 가장 오래된 항목을 제거합니다.
+    제거된 항목은 저장소에 남아 있으므로 다음 사용 시 다시 로드됩니다.
+
+    Args:
+        keep (str): 제거하지 않을 키 (현재 세션)
+
+    Returns:
+        List[str]: 제거된 키 목록
+    """
+    now = time.time()
+    candidates = sorted((key for key in entries if key != keep), key=lambda key: last_used.get(key, 0))
+    overflow = max(0, len(entries) - max_entries)
+    evicted = []
+    for key in candidates:
+        if overflow > 0 or now - last_used.get(key, 0) > idle_seconds:
+            entries.pop(key, None)
+            last_used.pop(key, None)
+            evicted.append(key)
+            overflow -= 1
+    return evicted
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """
+    프로세스 공용 세션 저장소를 반환합니다.
+    HR_RAG_SESSION_DB=memory 이면 InMemorySessionStore, 그 외에는 해당 경로의 SQLiteSessionStore를 사용합니다.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                target = os.getenv("HR_RAG_SESSION_DB", DEFAULT_SESSION_DB)
+                _store = InMemorySessionStore() if target == "memory" else SQLiteSessionStore(target)
+    return _store
@@ -16,14 +16,19 @@ import os
 import time
 from typing import Generator, Optional
 
-# 현재 디렉토리를 Python 경로에 추가
+# 현재 디렉토리와 프로젝트 루트를 Python 경로에 추가
 current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
 sys.path.insert(0, current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
 # 환경변수 로드
 from dotenv import load_dotenv
 load_dotenv()
 
+from src.preprocessing.rag_engine import FAKE_LLM_MODEL, FAKE_MODE, RagConfig, format_docs, get_engine
+
 # 페이지 설정
 st.set_page_config(
     page_title="🏢 HR RAG 채팅봇",
@@ -36,47 +41,44 @@ def init_session_state():
     """세션 상태 초기화"""
     if "messages" not in st.session_state:
         st.session_state.messages = []
-    if "retriever" not in st.session_state:
-        st.session_state.retriever = None
     if "qa_chain" not in st.session_state:
         st.session_state.qa_chain = None
     if "system_ready" not in st.session_state:
         st.session_state.system_ready = False
 
+# 답변 최대 토큰 수
+MAX_ANSWER_TOKENS = 1000
+
+def get_rag_engine():
+    """프로세스 공용 RagEngine을 반환합니다. (OpenAI 키가 없으면 Upstage 임베딩, HR_RAG_FAKE=1이면 가짜 임베딩 사용)"""
+    if FAKE_MODE:
+        return get_engine(RagConfig())
+    provider = "openai" if os.getenv("OPENAI_API_KEY") else "upstage"
+    return get_engine(RagConfig(embedding_provider=provider))
+
 def load_rag_system(temperature: float = 0.1, k: int = 3):
-    """RAG 시스템 로드 및 초기화"""
+    """
+    RAG 시스템 로드 및 초기화
+    temperature/k는 질문마다 체인 입력으로 전달되므로, 설정을 바꿔도 체인을 다시 만들지 않습니다.
+    """
     try:
-        # 캐싱을 위해 이미 로드된 경우 재사용
-        if st.session_state.system_ready and st.session_state.retriever is not None:
-            # temperature 변경 시에만 QA 체인 재생성
-            if hasattr(st.session_state, 'last_temperature') and st.session_state.last_temperature != temperature:
-                st.session_state.qa_chain = create_qa_chain_with_temperature(st.session_state.retriever, temperature, k)
-                st.session_state.last_temperature = temperature
+        # 인덱스는 공용 엔진이 프로세스당 한 번만 구축하므로 여기서는 체인만 관리
+        if st.session_state.system_ready and st.session_state.qa_chain is not None:
             return True
         
         # 처음 로드하는 경우
         with st.spinner("🚀 RAG 시스템 초기화 중..."):
-            # retriever 로드
-            from src.preprocessing.retriever import initialize_retriever
-            
-            processed_data_path = os.path.join(current_dir, 'data', 'processed', 'documents.pkl')
-            retriever = initialize_retriever(processed_data_path)
-            
-            if not retriever:
-                st.error("❌ 검색기 초기화 실패")
-                return False
-            
-            st.session_state.retriever = retriever
+            engine = get_rag_engine()
+            engine.load_index()
             
             # QA 체인 생성
-            qa_chain = create_qa_chain_with_temperature(retriever, temperature, k)
+            qa_chain = create_qa_chain()
             if not qa_chain:
                 st.error("❌ QA 체인 생성 실패")
                 return False
                 
             st.session_state.qa_chain = qa_chain
             st.session_state.system_ready = True
-            st.session_state.last_temperature = temperature
             
             st.success("✅ RAG 시스템 초기화 완료!")
             return True
@@ -85,80 +87,38 @@ def load_rag_system(temperature: float = 0.1, k: int = 3):
         st.error(f"❌ RAG 시스템 로드 중 오류: {str(e)}")
         return False
 
-def create_qa_chain_with_temperature(retriever, temperature: float, k: int):
-    """지정된 temperature로 QA 체인 생성"""
+def create_qa_chain():
+    """
+    QA 체인 생성 (공용 RagEngine의 프롬프트/LLM 풀 사용)
+    입력: {"question": str, "temperature": float, "k": int}
+    """
     try:
-        from langchain_openai import ChatOpenAI
-        from langchain_upstage import ChatUpstage
-        from langchain_core.prompts import ChatPromptTemplate
         from langchain_core.output_parsers import StrOutputParser
-        from langchain_core.runnables import RunnablePassthrough
+        from langchain_core.runnables import RunnableLambda, RunnablePassthrough
         
-        # LLM 초기화
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        upstage_api_key = os.getenv("UPSTAGE_API_KEY")
+        engine = get_rag_engine()
         
-        if openai_api_key:
-            llm = ChatOpenAI(
-                model="gpt-3.5-turbo",
-                temperature=temperature,
-                max_tokens=1000,
-                streaming=True  # 스트리밍 활성화
-            )
-        elif upstage_api_key:
-            llm = ChatUpstage(
-                model="solar-1-mini-chat",
-                temperature=temperature,
-                max_tokens=1000,
-                streaming=True  # 스트리밍 활성화
-            )
+        # LLM 모델 선택 (클라이언트는 temperature별로 프로세스 공용 풀에서 재사용)
+        if FAKE_MODE:
+            model = FAKE_LLM_MODEL
+        elif os.getenv("OPENAI_API_KEY"):
+            model = "gpt-3.5-turbo"
+        elif os.getenv("UPSTAGE_API_KEY"):
+            model = "solar-1-mini-chat"
         else:
             st.error("❌ API 키가 설정되지 않았습니다.")
             return None
         
-        # 프롬프트 템플릿
-        template = """당신은 대한민국의 노무 전문가입니다. 주어진 문서를 기반으로 정확하고 실용적인 답변을 제공해주세요.
-
-**답변 원칙:**
-1. 법적 근거를 명확히 제시해주세요
-2. 실무적인 절차와 방법을 구체적으로 안내해주세요  
-3. 주의사항이나 예외 상황도 함께 설명해주세요
-4. 관련 기관이나 담당 부서 정보도 포함해주세요
-
-**참고 문서:**
-{context}
-
-**질문:** {question}
-
-**답변:**"""
-
-        prompt = ChatPromptTemplate.from_template(template)
+        def generate(inputs):
+            llm = engine.get_llm(model, inputs["temperature"], max_tokens=MAX_ANSWER_TOKENS)
+            return llm.invoke(engine.build_messages(inputs["question"], inputs["context"]))
         
-        # 문서 포맷팅 함수
-        def format_docs(docs):
-            if not docs:
-                return "관련 문서를 찾을 수 없습니다."
-            
-            formatted_docs = []
-            for i, doc in enumerate(docs, 1):
-                source = doc.metadata.get('source', '알 수 없음')
-                source_type = doc.metadata.get('source_type', '알 수 없음')
-                doc_info = f"[문서 {i}] ({source}, {source_type})\n{doc.page_content}\n"
-                formatted_docs.append(doc_info)
-            
-            return "\n".join(formatted_docs)
-        
-        # retriever에 k 설정 적용
-        retriever_with_k = retriever.with_config({"search_kwargs": {"k": k}})
-        
-        # QA 체인 구성
+        # QA 체인 구성 (요청마다 k개 검색)
         qa_chain = (
-            {
-                "context": retriever_with_k | format_docs,
-                "question": RunnablePassthrough()
-            }
-            | prompt 
-            | llm 
+            RunnablePassthrough.assign(
+                context=lambda x: format_docs(engine.retrieve(x["question"], x["k"]))
+            )
+            | RunnableLambda(generate)
             | StrOutputParser()
         )
         
@@ -176,14 +136,14 @@ def stream_response(response_text: str) -> Generator[str, None, None]:
         if i % 3 == 0:  # 3단어마다 잠시 대기
             time.sleep(0.05)
 
-def get_rag_response(question: str) -> Optional[str]:
+def get_rag_response(question: str, temperature: float = 0.1, k: int = 3) -> Optional[str]:
     """RAG 시스템에서 답변 생성"""
     try:
         if not st.session_state.qa_chain:
             return None
             
-        # QA 체인 실행
-        response = st.session_state.qa_chain.invoke(question)
+        # QA 체인 실행 (사이드바 설정을 요청마다 전달)
+        response = st.session_state.qa_chain.invoke({"question": question, "temperature": temperature, "k": k})
         return response
         
     except Exception as e:
@@ -273,7 +233,7 @@ def main():
         # AI 응답 생성 및 표시
         with st.chat_message("assistant"):
             with st.spinner("🤔 답변 생성 중..."):
-                response = get_rag_response(prompt)
+                response = get_rag_response(prompt, temperature, k)
                 
             if response:
                 # 스트리밍 방식으로 응답 출력
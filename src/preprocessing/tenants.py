@@ -0,0 +1,193 @@
+# src/preprocessing/tenants.py
+"""
+멀티 테넌트(고객사별) 코퍼스
+
+고객사마다 입력 폴더 하나 → 전처리 결과/인덱스 아티팩트 하나를 갖습니다.
+    입력:   data/tenants/<tenant>/                       (Excel/CSV/PDF/Word)
+    문서:   data/processed/tenants/<tenant>/documents.pkl
+    인덱스: data/processed/tenants/<tenant>/faiss_index/
+기본 테넌트("default")는 기존 경로(01. consultations/output, data/processed/documents.pkl)를 그대로 사용합니다.
+
+TenantRegistry는 테넌트의 인덱스를 첫 요청 시 메모리 맵으로 지연 로드하고,
+로드된 인덱스의 추정 메모리 합계가 상한을 넘으면 가장 오래 사용하지 않은 테넌트부터 내립니다.
+(내려간 테넌트는 다음 요청에서 재임베딩 없이 게시된 인덱스를 다시 로드)
+
+사용법:
+    python run_preprocessing.py --tenant acme
+    python -m src.preprocessing.rag_engine "연차 사용 촉진" --tenant acme
+    streamlit run src/preprocessing/hr_rag_chat.py   # 사이드바 또는 ?tenant=acme
+"""
+import os
+import re
+import threading
+import time
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+
+from src.preprocessing.rag_engine import PROJECT_ROOT, RagConfig, RagEngine, get_engine
+
+DEFAULT_TENANT = "default"
+TENANT_INPUT_ROOT = os.path.join(PROJECT_ROOT, 'data', 'tenants')
+TENANT_OUTPUT_ROOT = os.path.join(PROJECT_ROOT, 'data', 'processed', 'tenants')
+DEFAULT_RAW_DATA_DIR = os.path.join(PROJECT_ROOT, '01. consultations', 'output')
+
+# 로드된 테넌트 인덱스의 추정 메모리 상한 (MB)
+DEFAULT_TENANT_MEMORY_MB = float(os.getenv("HR_RAG_TENANT_MEMORY_MB", "1024"))
+
+TENANT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+
+def validate_tenant(tenant: Optional[str]) -> str:
+    """테넌트 이름을 검증합니다. 경로에 쓰이므로 영문/숫자/-/_만 허용합니다. (비어 있으면 기본 테넌트)"""
+    tenant = (tenant or DEFAULT_TENANT).strip()
+    if not TENANT_NAME_PATTERN.match(tenant):
+        raise ValueError(f"잘못된 테넌트 이름입니다: {tenant!r} (영문/숫자/-/_, 최대 64자)")
+    return tenant
+
+
+def tenant_raw_dir(tenant: str) -> str:
+    """테넌트의 원시 데이터 입력 폴더."""
+    tenant = validate_tenant(tenant)
+    if tenant == DEFAULT_TENANT:
+        return DEFAULT_RAW_DATA_DIR
+    return os.path.join(TENANT_INPUT_ROOT, tenant)
+
+
+def tenant_documents_path(tenant: str) -> str:
+    """테넌트의 documents.pkl 경로."""
+    tenant = validate_tenant(tenant)
+    if tenant == DEFAULT_TENANT:
+        return RagConfig().documents_path
+    return os.path.join(TENANT_OUTPUT_ROOT, tenant, 'documents.pkl')
+
+
+def tenant_config(tenant: str, base: Optional[RagConfig] = None) -> RagConfig:
+    """base 설정에서 문서/인덱스 경로만 테넌트의 것으로 바꾼 설정 (인덱스는 메모리 맵으로 로드)."""
+    tenant = validate_tenant(tenant)
+    base = base or RagConfig()
+    if tenant == DEFAULT_TENANT:
+        return replace(base, mmap_index=True)
+    return replace(
+        base,
+        documents_path=tenant_documents_path(tenant),
+        index_dir=os.path.join(TENANT_OUTPUT_ROOT, tenant, 'faiss_index') if base.index_dir else None,
+        mmap_index=True,
+    )
+
+
+def list_tenants() -> List[str]:
+    """전처리된 문서가 있는 테넌트 목록 (기본 테넌트가 항상 첫 번째)."""
+    tenants = [DEFAULT_TENANT]
+    if os.path.isdir(TENANT_OUTPUT_ROOT):
+        for name in sorted(os.listdir(TENANT_OUTPUT_ROOT)):
+            if (name != DEFAULT_TENANT and TENANT_NAME_PATTERN.match(name)
+                    and os.path.exists(os.path.join(TENANT_OUTPUT_ROOT, name, 'documents.pkl'))):
+                tenants.append(name)
+    return tenants
+
+
+def estimate_index_bytes(vectorstore) -> int:
+    """
+    벡터 저장소의 추정 메모리 (벡터 float32 + 청크/부모 텍스트). 인덱스 버전마다 한 번만 계산합니다.
+    메모리 맵 인덱스의 벡터는 페이지 캐시에 올라가므로 상한 계산에는 함께 포함합니다.
+    """
+    cached = getattr(vectorstore, "estimated_bytes", None)
+    if cached is not None:
+        return cached
+    index = vectorstore.index
+    total = index.ntotal * index.d * 4
+    for doc in vectorstore.docstore._dict.values():
+        total += len(doc.page_content.encode('utf-8')) + 64 * len(doc.metadata)
+    parent_store = getattr(vectorstore, "parent_store", None)
+    if parent_store is not None:
+        total += sum(len(text.encode('utf-8')) for text in parent_store.texts)
+    vectorstore.estimated_bytes = total
+    return total
+
+
+class TenantRegistry:
+    """
+    테넌트별 RagEngine과 인덱스 수명을 관리합니다. 스레드 안전합니다.
+
+    Args:
+        max_memory_mb (float): 로드된 테넌트 인덱스의 추정 메모리 합계 상한
+        base_config (RagConfig): 테넌트 설정의 기준 (경로 외의 청크/임베딩/모델 설정)
+    """
+
+    def __init__(self, max_memory_mb: float = DEFAULT_TENANT_MEMORY_MB, base_config: Optional[RagConfig] = None):
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self.base_config = base_config or RagConfig()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def engine(self, tenant: Optional[str] = None) -> RagEngine:
+        """
+        테넌트의 엔진을 반환합니다. 인덱스는 첫 검색 시 지연 로드되며,
+        호출마다 사용 시각을 갱신하고 메모리 상한을 넘은 다른 테넌트를 내립니다.
+        """
+        tenant = validate_tenant(tenant)
+        engine = get_engine(tenant_config(tenant, self.base_config))
+        with self._lock:
+            self._last_used[tenant] = time.time()
+        self.enforce_limit(keep=tenant)
+        return engine
+
+    def loaded_bytes(self) -> Dict[str, int]:
+        """현재 인덱스가 로드된 테넌트별 추정 메모리."""
+        loaded = {}
+        for tenant in list(self._last_used):
+            vectorstore = get_engine(tenant_config(tenant, self.base_config)).shared_index.peek()
+            if vectorstore is not None:
+                loaded[tenant] = estimate_index_bytes(vectorstore)
+        return loaded
+
+    def enforce_limit(self, keep: Optional[str] = None) -> List[str]:
+        """
+        추정 메모리 합계가 상한 이하가 될 때까지 가장 오래 사용하지 않은 테넌트의 인덱스를 내립니다.
+
+        Returns:
+            List[str]: 내린 테넌트 목록
+        """
+        evicted = []
+        with self._lock:
+            loaded = self.loaded_bytes()
+            total = sum(loaded.values())
+            for tenant in sorted(loaded, key=lambda t: self._last_used.get(t, 0.0)):
+                if total <= self.max_bytes:
+                    break
+                if tenant == keep:
+                    continue
+                if get_engine(tenant_config(tenant, self.base_config)).shared_index.unload():
+                    total -= loaded[tenant]
+                    evicted.append(tenant)
+                    self.evictions += 1
+                    print(f"♻️ 테넌트 '{tenant}' 인덱스를 내렸습니다. (추정 {loaded[tenant] / 1024 / 1024:.1f} MB)")
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        loaded = self.loaded_bytes()
+        return {
+            "loaded_tenants": sorted(loaded, key=lambda t: self._last_used.get(t, 0.0), reverse=True),
+            "loaded_mb": round(sum(loaded.values()) / 1024 / 1024, 1),
+            "max_mb": round(self.max_bytes / 1024 / 1024, 1),
+            "evictions": self.evictions,
+        }
+
+
+_registry: Optional[TenantRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> TenantRegistry:
+    """프로세스 공용 TenantRegistry (상한: HR_RAG_TENANT_MEMORY_MB, 기본 1024MB)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = TenantRegistry()
+    return _registry
+
+
+def get_tenant_engine(tenant: Optional[str] = None) -> RagEngine:
+    """테넌트의 엔진 (get_registry().engine(tenant))."""
+    return get_registry().engine(tenant)
@@ -0,0 +1,266 @@
+# src/preprocessing/tracing.py
+"""
+채팅 턴 단위 지연 시간 추적 (LangSmith 없이 동작)
+
+한 턴을 단계(span)별로 측정합니다:
+    get_session_memory → load_memory → retrieve → format_messages → llm_stream → save_context
+각 span은 소요 시간(ms)과 속성(토큰 수, 검색 청크 수, 캐시 적중 등)을 가집니다.
+
+끝난 턴은 프로세스 공용 TraceRecorder에 기록되어
+    - JSONL 파일 (.cache/traces/turns.jsonl, HR_RAG_TRACE_PATH로 변경)
+    - Prometheus 텍스트 (render_prometheus / start_metrics_server)
+    - 최근 턴 목록 (Streamlit 사이드바 디버그 패널)
+로 내보내집니다.
+
+사용법:
+    trace = TurnTrace(session_id="abc")
+    with trace.span("retrieve") as span:
+        docs = retriever.invoke(question)
+        span.set(chunks=len(docs))
+    trace.finish()
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+DEFAULT_TRACE_PATH = os.path.join(PROJECT_ROOT, '.cache', 'traces', 'turns.jsonl')
+
+# Prometheus 히스토그램 버킷 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Span:
+    """턴 안의 한 단계."""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs: Dict[str, Any] = dict(attrs)
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+
+    def set(self, **attrs):
+        """span 속성을 추가/갱신합니다. (예: span.set(chunks=3, cache_hit=True))"""
+        self.attrs.update(attrs)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "duration_ms": round(self.duration_ms, 2), **self.attrs}
+
+
+class TurnTrace:
+    """
+    채팅 한 턴의 추적 정보. span()으로 단계를 측정하고 finish()로 기록합니다.
+    """
+
+    def __init__(self, name: str = "chat_turn", recorder: Optional["TraceRecorder"] = None, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs: Dict[str, Any] = dict(attrs)
+        self.spans: List[Span] = []
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+        self._recorder = recorder
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        span = Span(name, **attrs)
+        self.spans.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.end = time.perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def incr(self, key: str, amount: int = 1):
+        """턴 단위 카운터 (예: cache_hits)를 증가시킵니다."""
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    @property
+    def duration_ms(self) -> float:
+        end = self._end if self._end is not None else time.perf_counter()
+        return (end - self._start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 2),
+            **self.attrs,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+    def finish(self) -> Dict[str, Any]:
+        """턴을 종료하고 공용 recorder에 기록합니다. 여러 번 호출해도 한 번만 기록됩니다."""
+        if self._end is None:
+            self._end = time.perf_counter()
+            (self._recorder or get_recorder()).record(self)
+        return self.to_dict()
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.sum += seconds
+        self.count += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+
+class TraceRecorder:
+    """
+    끝난 턴을 JSONL로 기록하고, 단계별 지연 히스토그램과 토큰/캐시 카운터를 집계합니다.
+
+    Args:
+        jsonl_path (str): 턴 기록 JSONL 경로 (None이면 파일에 기록하지 않음)
+        keep_recent (int): 메모리에 보관할 최근 턴 수
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = DEFAULT_TRACE_PATH, keep_recent: int = 50):
+        self.jsonl_path = jsonl_path
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=keep_recent)
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, _Histogram] = {}
+        self._counters: Dict[str, float] = {}
+
+    def record(self, trace: TurnTrace):
+        data = trace.to_dict()
+        with self._lock:
+            self.recent.append(data)
+            self._observe(trace.name, trace.duration_ms / 1000)
+            for span in trace.spans:
+                self._observe(span.name, span.duration_ms / 1000)
+                for key in ("tokens_in", "tokens_out", "cached_tokens", "chunks", "context_tokens"):
+                    if isinstance(span.attrs.get(key), (int, float)):
+                        self._counters[key] = self._counters.get(key, 0) + span.attrs[key]
+                if span.attrs.get("cache_hit") is True:
+                    self._counters["cache_hits"] = self._counters.get("cache_hits", 0) + 1
+            for key, value in trace.attrs.items():
+                if key.endswith("_hits") and isinstance(value, (int, float)):
+                    self._counters[key] = self._counters.get(key, 0) + value
+            if isinstance(trace.attrs.get("cost_usd"), (int, float)):
+                self._counters["cost_usd"] = self._counters.get("cost_usd", 0) + trace.attrs["cost_usd"]
+            if "escalated" in trace.attrs:
+                self._counters["cascade_turns"] = self._counters.get("cascade_turns", 0) + 1
+                self._counters["escalations"] = self._counters.get("escalations", 0) + int(bool(trace.attrs["escalated"]))
+            if trace.attrs.get("short_circuit") is True:
+                self._counters["short_circuit_turns"] = self._counters.get("short_circuit_turns", 0) + 1
+            self._counters["turns"] = self._counters.get("turns", 0) + 1
+
+            if self.jsonl_path:
+                try:
+                    os.makedirs(os.path.dirname(self.jsonl_path), exist_ok=True)
+                    with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(data, ensure_ascii=False, default=str) + "\n")
+                except OSError as e:
+                    print(f"경고: trace 기록 실패 '{self.jsonl_path}': {e}")
+
+    def _observe(self, stage: str, seconds: float):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._histograms[stage] = _Histogram()
+        histogram.observe(seconds)
+
+    def last(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.recent[-1] if self.recent else None
+
+    def stage_summary(self) -> List[Dict[str, Any]]:
+        """단계별 호출 수와 평균 지연(ms) 요약."""
+        with self._lock:
+            return [
+                {"stage": stage, "count": h.count, "avg_ms": round(h.sum / h.count * 1000, 1) if h.count else 0.0}
+                for stage, h in sorted(self._histograms.items())
+            ]
+
+    def render_prometheus(self) -> str:
+        """단계별 지연 히스토그램과 카운터를 Prometheus 텍스트 형식으로 반환합니다."""
+        lines = [
+            "# HELP hr_rag_stage_seconds 채팅 턴 단계별 소요 시간",
+            "# TYPE hr_rag_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                for bound, count in zip(LATENCY_BUCKETS, h.buckets):
+                    lines.append(f'hr_rag_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'hr_rag_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'hr_rag_stage_seconds_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'hr_rag_stage_seconds_count{{stage="{stage}"}} {h.count}')
+            for key, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE hr_rag_{key}_total counter")
+                lines.append(f"hr_rag_{key}_total {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+_recorder: Optional[TraceRecorder] = None
+_recorder_lock = threading.Lock()
+_metrics_server = None
+
+
+def get_recorder() -> TraceRecorder:
+    """프로세스 공용 TraceRecorder를 반환합니다. (HR_RAG_TRACE_PATH=off 이면 파일 기록 끔)"""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                path = os.getenv("HR_RAG_TRACE_PATH", DEFAULT_TRACE_PATH)
+                _recorder = TraceRecorder(None if path.lower() == "off" else path)
+    return _recorder
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """
+    /metrics 에서 Prometheus 텍스트를 제공하는 HTTP 서버를 백그라운드 스레드로 (프로세스당 한 번) 시작합니다.
+    Streamlit처럼 자체 HTTP 엔드포인트가 없는 앱에서 사용합니다.
+    """
+    global _metrics_server
+    with _recorder_lock:
+        if _metrics_server is not None:
+            return _metrics_server
+
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class _MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = get_recorder().render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            print(f"경고: 지표 서버를 시작할 수 없습니다 ({host}:{port}): {e}")
+            return None
+        threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"✅ 지표 엔드포인트: http://{host}:{port}/metrics")
+        return _metrics_server
@@ -0,0 +1,171 @@
+# src/preprocessing/turn_executor.py
+"""
+비동기 채팅 턴 실행기
+
+Streamlit 스크립트는 동기 코드이므로, 한 턴 전체를 프로세스 공용 이벤트 루프 스레드에서 코루틴으로 실행하고
+스크립트 스레드는 큐로 토큰을 받아 화면에 그립니다.
+    대화 기록 로드(aload_memory_variables) ∥ 검색(aretrieve) → 프롬프트 → LLM 스트리밍(astream)
+    → 요약 메모리 저장(asave_context) → 저장소 기록
+
+TurnHandle.cancel()은 실행 중인 태스크를 취소합니다. 스트리밍 중이던 HTTP 응답이 바로 닫혀
+제공자 연결이 풀로 돌아가고, 그 뒤의 토큰은 생성/과금되지 않습니다.
+답변 스트리밍이 끝난 뒤의 요약 저장/기록은 취소해도 끝까지 실행됩니다. (완성된 답변은 대화 기록에 남김)
+
+공용 httpx.AsyncClient의 연결은 처음 사용한 이벤트 루프에 묶이므로, 모든 턴이 같은 루프 하나를 사용합니다.
+
+사용법:
+    handle = get_turn_executor().submit(engine, question, memory, llm, k=3, trace=trace)
+    for text in handle.tokens(poll_interval=0.2):
+        ...  # text가 None이면 새 토큰 없이 poll_interval이 지난 것 (화면 갱신/중지 확인)
+    result = handle.result()
+    handle.cancel()  # 완료 후에 호출하면 아무 일도 하지 않음
+"""
+import asyncio
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from src.preprocessing.cascade import ModelCascade, answer_cost
+from src.preprocessing.rag_engine import RagEngine, astream_answer
+from src.preprocessing.tracing import TurnTrace
+
+# 답변 스트리밍이 끝났음을 알리는 큐 항목
+_STREAM_END = object()
+
+
+async def run_turn(engine: RagEngine, question: str, memory, llm, emit: Callable[[Any], None],
+                   k: Optional[int] = None, condenser=None, trace: Optional[TurnTrace] = None,
+                   parents: Optional[bool] = None, adaptive: Optional[bool] = None,
+                   persist: Optional[Callable[[str], None]] = None,
+                   cascade: Optional[ModelCascade] = None) -> Dict[str, Any]:
+    """
+    채팅 한 턴을 비동기로 실행합니다.
+
+    Args:
+        memory: ConversationSummaryBufferMemory (대화 기록 로드와 요약 저장)
+        llm: 답변 생성용 채팅 모델 (astream 사용)
+        emit (Callable): 토큰 문자열마다 호출되고, 스트리밍이 끝나면 _STREAM_END로 한 번 더 호출됩니다.
+        persist (Callable): 요약 저장 후 완성된 답변으로 호출 (저장소 기록, 스레드에서 실행)
+        cascade (ModelCascade): 주어지면 llm 대신 소형 모델로 먼저 답하고 필요할 때만 대형 모델로 다시 답합니다.
+
+    Returns:
+        Dict[str, Any]: answer, usage, query, source_documents
+    """
+    trace = trace or TurnTrace()
+
+    async def load_history():
+        return (await memory.aload_memory_variables({})).get("chat_history", "")
+
+    prepared = await engine.aprepare_turn(question, load_history=load_history, k=k,
+                                          condenser=condenser, trace=trace, parents=parents,
+                                          adaptive=adaptive)
+    if prepared["query"] != question:
+        trace.set(rewritten_query=prepared["query"])
+
+    if cascade is not None:
+        result = await cascade.arun(engine, prepared, emit, trace)
+        answer, usage = result["answer"], result["usage"]
+    else:
+        answer, usage = await astream_answer(llm, prepared["messages"], emit, trace)
+        trace.set(cost_usd=answer_cost(getattr(llm, "model_name", ""), usage))
+    emit(_STREAM_END)
+
+    async def save():
+        with trace.span("save_context"):
+            await memory.asave_context(inputs={"human": question}, outputs={"ai": answer})
+            if persist is not None:
+                await asyncio.to_thread(persist, answer)
+
+    if answer:
+        await asyncio.shield(save())
+    return {"answer": answer, "usage": usage, "query": prepared["query"],
+            "source_documents": prepared["source_documents"]}
+
+
+class TurnHandle:
+    """
+    실행 중인 턴. 스크립트 스레드에서 토큰을 받고, 결과를 기다리거나 취소합니다.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue" = queue.Queue()
+        self._future = None
+        self.stream_complete = False
+
+    def _emit(self, item):
+        self._queue.put(item)
+
+    def tokens(self, poll_interval: float = 0.2) -> Iterator[Optional[str]]:
+        """
+        답변 토큰을 순서대로 반환합니다. 스트리밍이 끝나거나 턴이 실패/취소되면 끝납니다.
+        poll_interval 동안 새 토큰이 없으면 None을 반환하므로, 호출자는 그 사이에 화면 갱신이나 중지 확인을 할 수 있습니다.
+        """
+        while True:
+            try:
+                item = self._queue.get(timeout=poll_interval)
+            except queue.Empty:
+                if self._future.done() and self._queue.empty():
+                    return
+                yield None
+                continue
+            if item is _STREAM_END:
+                self.stream_complete = True
+                return
+            yield item
+
+    def result(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """턴 결과 (요약 저장까지 완료). 실패하면 예외를, 취소되었으면 CancelledError를 발생시킵니다."""
+        return self._future.result(timeout)
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def cancelled(self) -> bool:
+        return self._future.cancelled()
+
+    def cancel(self) -> bool:
+        """
+        턴을 취소합니다. 이벤트 루프의 태스크가 취소되어 진행 중인 검색/재작성/스트리밍 HTTP 요청이 중단됩니다.
+
+        Returns:
+            bool: 실행 중이던 턴을 취소했으면 True (이미 끝났으면 False)
+        """
+        return self._future.cancel()
+
+
+class TurnExecutor:
+    """프로세스 공용 이벤트 루프 스레드에서 턴 코루틴을 실행합니다."""
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="rag-turn-loop", daemon=True)
+        self._thread.start()
+
+    def submit(self, engine: RagEngine, question: str, memory, llm, **options) -> TurnHandle:
+        """
+        턴을 이벤트 루프에 제출하고 바로 반환합니다.
+
+        Args:
+            **options: run_turn()의 k, condenser, trace, parents, adaptive, persist, cascade
+
+        Returns:
+            TurnHandle: 토큰 수신 / 결과 대기 / 취소 핸들
+        """
+        handle = TurnHandle()
+        handle._future = asyncio.run_coroutine_threadsafe(
+            run_turn(engine, question, memory, llm, handle._emit, **options), self._loop
+        )
+        return handle
+
+
+_turn_executor: Optional[TurnExecutor] = None
+_turn_executor_lock = threading.Lock()
+
+
+def get_turn_executor() -> TurnExecutor:
+    """프로세스 공용 TurnExecutor (이벤트 루프 스레드는 처음 사용할 때 시작)."""
+    global _turn_executor
+    with _turn_executor_lock:
+        if _turn_executor is None:
+            _turn_executor = TurnExecutor()
+    return _turn_executor
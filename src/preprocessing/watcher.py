@@ -0,0 +1,316 @@
+# src/preprocessing/watcher.py
+"""
+전처리 감시 모드: 입력 폴더에 새 상담 결과 파일이 들어오면 자동으로 증분 색인합니다.
+
+    1) 폴더를 주기적으로 스캔(polling)하여 파일별 (수정 시각, 크기)를 비교합니다.
+    2) 변경이 감지되면 debounce 시간 동안 추가 변경이 없을 때까지 기다립니다. (복사 중인 파일/연속 업로드 묶기)
+    3) 새로 생기거나 바뀐 파일만 파싱하고, 바뀌거나 삭제된 파일의 기존 청크는 인덱스에서 제거합니다.
+    4) 새 청크만 임베딩하여 현재 인덱스에 추가하고 새 버전으로 게시합니다.
+       버전 디렉토리 저장 → documents.pkl 교체 → CURRENT 갱신 순서로 진행되므로,
+       채팅 앱은 재시작이나 재임베딩 없이 핫 리로드로 새 버전을 사용합니다.
+
+처리한 파일 목록은 documents.pkl 옆의 documents.sources.json에 기록됩니다.
+
+사용법:
+    python run_preprocessing.py --watch
+    python -m src.preprocessing.watcher --tenant acme --interval 2 --debounce 5
+"""
+import json
+import os
+import pickle
+import posixpath
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.preprocessing.citations import assign_chunk_ids
+from src.preprocessing.index_store import _write_atomic, activate_version, file_fingerprint, publish_index
+from src.preprocessing.ingest_report import IngestionReport, print_summary
+from src.preprocessing.main_preprocessor import SUPPORTED_EXTENSIONS, load_documents_from_pickle, process_file
+from src.preprocessing.parent_store import PARENT_ID_KEY, ParentStore, attach_parent_store, get_parent_store
+from src.preprocessing.rag_engine import RagEngine
+
+Snapshot = Dict[str, Tuple[int, int]]
+
+
+def sources_path_for(documents_path: str) -> str:
+    """처리한 파일 목록 경로 (documents.pkl → documents.sources.json)."""
+    return os.path.splitext(documents_path)[0] + ".sources.json"
+
+
+def scan_directory(raw_data_dir: str) -> Snapshot:
+    """입력 폴더의 지원 파일별 (수정 시각 ns, 크기). Office 잠금 파일(~$)과 임시 파일은 제외합니다."""
+    snapshot = {}
+    for root, _, files in os.walk(raw_data_dir):
+        for name in files:
+            if name.startswith(("~$", ".")) or not name.lower().endswith(SUPPORTED_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            fingerprint = file_fingerprint(path)
+            if fingerprint is not None:
+                snapshot[path] = fingerprint
+    return snapshot
+
+
+def diff_snapshots(known: Snapshot, current: Snapshot) -> Tuple[List[str], List[str]]:
+    """
+    Returns:
+        (새로 생기거나 바뀐 파일, 삭제된 파일)
+    """
+    changed = sorted(path for path, fingerprint in current.items() if known.get(path) != tuple(fingerprint))
+    removed = sorted(path for path in known if path not in current)
+    return changed, removed
+
+
+def _path_parts(path: str) -> List[str]:
+    """'/'와 '\\'를 모두 구분자로 보고 정규화한 경로 구성 요소."""
+    normalized = posixpath.normpath(str(path).replace("\\", "/"))
+    return [part for part in normalized.split("/") if part not in ("", ".")]
+
+
+def source_key(path: str, raw_data_dir: str) -> str:
+    """
+    문서와 입력 파일을 대응시키는 키 (입력 폴더 기준 상대 경로, '/' 구분).
+    하위 폴더에 같은 이름의 파일이 있어도 서로의 청크를 지우지 않도록 파일 이름이 아닌 경로로 구분합니다.
+    이전 전처리 결과의 file_path는 Windows 경로이거나 다른 위치에서 만든 경로일 수 있으므로,
+    입력 폴더 아래가 아니면 입력 폴더 이름 뒤의 경로를 사용합니다.
+    """
+    root_parts = _path_parts(os.path.abspath(raw_data_dir))
+    candidates = [(_path_parts(path), _path_parts(raw_data_dir)), (_path_parts(os.path.abspath(path)), root_parts)]
+    for parts, root in candidates:
+        if root and parts[:len(root)] == root:
+            return "/".join(parts[len(root):])
+
+    parts = _path_parts(path)
+    if root_parts and root_parts[-1] in parts[:-1]:
+        index = len(parts) - 2 - parts[-2::-1].index(root_parts[-1])
+        return "/".join(parts[index + 1:])
+    return "/".join(parts)
+
+
+def _doc_source_key(metadata: Dict[str, Any], raw_data_dir: str) -> str:
+    return source_key(metadata.get("file_path") or metadata.get("source_file") or metadata.get("source") or "",
+                      raw_data_dir)
+
+
+class DirectoryWatcher:
+    """
+    폴링 방식 폴더 감시기. (추가 의존성 없이 Windows/Linux/네트워크 드라이브에서 동일하게 동작)
+
+    Args:
+        raw_data_dir (str): 감시할 입력 폴더
+        interval (float): 스캔 간격 (초)
+        debounce (float): 마지막 변경 이후 이 시간 동안 추가 변경이 없어야 처리합니다. (초)
+    """
+
+    def __init__(self, raw_data_dir: str, interval: float = 2.0, debounce: float = 5.0):
+        self.raw_data_dir = raw_data_dir
+        self.interval = interval
+        self.debounce = debounce
+
+    def wait_for_changes(self, known: Snapshot) -> Snapshot:
+        """known과 다른 스냅샷이 debounce 동안 안정될 때까지 기다린 뒤 반환합니다."""
+        while True:
+            snapshot = scan_directory(self.raw_data_dir)
+            if snapshot != known:
+                break
+            time.sleep(self.interval)
+
+        print(f"👀 변경 감지: {self.debounce:.0f}초 동안 추가 변경이 없으면 처리합니다...")
+        stable_since = time.time()
+        while time.time() - stable_since < self.debounce:
+            time.sleep(min(self.interval, self.debounce))
+            latest = scan_directory(self.raw_data_dir)
+            if latest != snapshot:
+                snapshot, stable_since = latest, time.time()
+        return snapshot
+
+
+class IncrementalIndexer:
+    """
+    documents.pkl과 게시된 인덱스를 파일 단위로 증분 갱신합니다.
+
+    Args:
+        engine (RagEngine): 인덱스 설정(청크/임베딩/index_dir)을 제공하는 엔진. 채팅 앱과 같은 설정이어야 합니다.
+        raw_data_dir (str): 입력 폴더
+    """
+
+    def __init__(self, engine: RagEngine, raw_data_dir: str):
+        if not engine.index_root:
+            raise ValueError("감시 모드는 인덱스를 게시할 index_dir 설정이 필요합니다.")
+        self.engine = engine
+        self.raw_data_dir = raw_data_dir
+        self.documents_path = engine.config.documents_path
+        self.sources_path = sources_path_for(self.documents_path)
+        self.documents = []
+        self.sources: Snapshot = {}
+        self.vectorstore = None
+
+    def start(self):
+        """이전 상태(documents.pkl, 처리한 파일 목록, 게시된 인덱스)를 로드합니다."""
+        if os.path.exists(self.documents_path):
+            self.documents = load_documents_from_pickle(self.documents_path)
+            # 현재 documents.pkl과 맞는 인덱스를 로드 (없으면 한 번 전체 구축 후 게시)
+            self.vectorstore = self.engine._load_or_build_index()
+            if get_parent_store(self.vectorstore) is None:
+                attach_parent_store(self.vectorstore, ParentStore([]))
+
+        if os.path.exists(self.sources_path):
+            with open(self.sources_path, 'r', encoding='utf-8') as f:
+                self.sources = {path: tuple(fp) for path, fp in json.load(f).items()}
+        elif self.documents:
+            # 감시 모드를 처음 켠 경우: 기존 documents.pkl에 포함된 파일은 처리된 것으로 간주합니다.
+            ingested = {_doc_source_key(doc.metadata, self.raw_data_dir) for doc in self.documents}
+            self.sources = {
+                path: fp for path, fp in scan_directory(self.raw_data_dir).items()
+                if source_key(path, self.raw_data_dir) in ingested
+            }
+            self._save_sources()
+            print(f"📋 기존 documents.pkl의 파일 {len(self.sources)}개를 처리된 것으로 기록했습니다.")
+
+    def apply(self, snapshot: Snapshot) -> Optional[Dict[str, Any]]:
+        """
+        스냅샷과 처리한 파일 목록의 차이만큼 문서/인덱스를 갱신하고 새 버전을 게시합니다.
+
+        Returns:
+            Dict[str, Any]: 변경 요약 (변경이 없으면 None)
+        """
+        changed, removed = diff_snapshots(self.sources, snapshot)
+        if not changed and not removed:
+            return None
+        print(f"🔄 증분 색인: 새/변경 {len(changed)}개, 삭제 {len(removed)}개")
+
+        report = IngestionReport(self.raw_data_dir)
+        new_docs = []
+        for path in changed:
+            new_docs.extend(process_file(path, report))
+        report.finish()
+
+        stale_keys = {source_key(path, self.raw_data_dir) for path in changed + removed}
+        self.documents = [doc for doc in self.documents if _doc_source_key(doc.metadata, self.raw_data_dir) not in stale_keys]
+        self.documents.extend(new_docs)
+
+        if self.vectorstore is None:
+            # 아직 인덱스가 없으면 documents.pkl을 처음 만들고 전체 구축합니다.
+            self._publish(lambda: self.engine.build_index())
+        else:
+            self._publish(lambda: self._update_index(new_docs, stale_keys))
+
+        self.sources = {path: fp for path, fp in snapshot.items() if path in self.sources or path in changed}
+        self._save_sources()
+
+        summary = {"changed": len(changed), "removed": len(removed), "documents": len(new_docs),
+                   "total_documents": len(self.documents)}
+        print_summary(report.to_dict())
+        print(f"✅ 증분 색인 완료: {summary}")
+        return summary
+
+    def _update_index(self, new_docs, stale_keys):
+        """바뀌거나 삭제된 파일의 청크를 지우고 새 문서의 청크만 임베딩해 추가합니다."""
+        vectorstore = self.vectorstore
+        parent_store = get_parent_store(vectorstore)
+
+        stale_ids, stale_parents = [], []
+        for chunk_id, chunk in vectorstore.docstore._dict.items():
+            if _doc_source_key(chunk.metadata, self.raw_data_dir) in stale_keys:
+                stale_ids.append(chunk_id)
+                stale_parents.append(chunk.metadata.get(PARENT_ID_KEY))
+        if stale_ids:
+            vectorstore.delete(stale_ids)
+            parent_store.remove(stale_parents)
+
+        if new_docs:
+            parent_store.append(new_docs)
+            chunks = self.engine.split_documents(new_docs)
+            # 다른 폴더의 같은 파일처럼 기존 청크와 ID가 겹치면 docstore 추가가 실패하므로 기존 ID를 피해 부여합니다.
+            vectorstore.add_documents(chunks, ids=assign_chunk_ids(chunks, existing=vectorstore.docstore._dict))
+        print(f"   청크 삭제 {len(stale_ids)}개, 인덱스 총 {vectorstore.index.ntotal}개")
+        return vectorstore
+
+    def _publish(self, build):
+        """
+        documents.pkl과 인덱스를 원자적으로 게시합니다.
+        임시 documents 파일의 지문(이름을 바꿔도 유지)으로 버전을 먼저 저장하고,
+        documents.pkl 교체 → CURRENT 갱신 순서로 전환하여 읽는 쪽이 어느 시점에도 맞는 버전을 찾게 합니다.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.documents_path)), exist_ok=True)
+        tmp_path = f"{self.documents_path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self.documents, f)
+
+        if self.vectorstore is None:
+            # build_index()는 documents_path를 읽으므로 먼저 교체합니다. (최초 1회)
+            os.replace(tmp_path, self.documents_path)
+            self.vectorstore = build()
+            source_fingerprint = file_fingerprint(self.documents_path)
+            version = publish_index(self.vectorstore, self.engine.index_root,
+                                    self.engine.index_manifest(source_fingerprint), activate=False)
+        else:
+            self.vectorstore = build()
+            source_fingerprint = file_fingerprint(tmp_path)
+            version = publish_index(self.vectorstore, self.engine.index_root,
+                                    self.engine.index_manifest(source_fingerprint), activate=False)
+            os.replace(tmp_path, self.documents_path)
+        activate_version(self.engine.index_root, version)
+
+    def _save_sources(self):
+        _write_atomic(self.sources_path, json.dumps(
+            {path: list(fp) for path, fp in self.sources.items()}, ensure_ascii=False, indent=2,
+        ))
+
+
+def watch(engine: RagEngine, raw_data_dir: str, interval: float = 2.0, debounce: float = 5.0, once: bool = False):
+    """
+    입력 폴더를 감시하며 변경될 때마다 증분 색인합니다. (once=True이면 현재 변경만 반영하고 종료)
+    """
+    indexer = IncrementalIndexer(engine, raw_data_dir)
+    indexer.start()
+    # 감시를 시작하기 전까지 쌓인 변경 먼저 반영
+    indexer.apply(scan_directory(raw_data_dir))
+    if once:
+        return
+
+    watcher = DirectoryWatcher(raw_data_dir, interval, debounce)
+    print(f"👀 '{raw_data_dir}' 감시 중... (간격 {interval}초, debounce {debounce}초, 종료: Ctrl+C)")
+    while True:
+        snapshot = watcher.wait_for_changes(indexer.sources)
+        try:
+            indexer.apply(snapshot)
+        except Exception as e:
+            # 처리한 파일 목록은 갱신되지 않으므로 다음 스캔에서 다시 시도합니다.
+            print(f"❌ 증분 색인 실패 (다음 변경 시 재시도): {e}")
+            time.sleep(debounce)
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    from dataclasses import replace
+
+    from src.preprocessing.rag_engine import RagConfig
+    from src.preprocessing.tenants import DEFAULT_TENANT, tenant_config, tenant_raw_dir
+
+    parser = argparse.ArgumentParser(description="전처리 감시 모드 (증분 색인 + 인덱스 게시)")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="고객사(테넌트) 이름")
+    parser.add_argument("--raw-dir", default=None, help="입력 폴더 (기본: 테넌트 입력 폴더)")
+    parser.add_argument("--interval", type=float, default=2.0, help="스캔 간격 (초)")
+    parser.add_argument("--debounce", type=float, default=5.0, help="마지막 변경 후 대기 시간 (초)")
+    # 채팅 앱과 같은 인덱스 디렉토리에 게시하도록 기본값은 RagConfig를 따릅니다. (HR_RAG_FAKE=1이면 fake)
+    parser.add_argument("--embedding-provider", default=RagConfig().embedding_provider,
+                        choices=["openai", "upstage", "fake"])
+    parser.add_argument("--once", action="store_true", help="현재 변경만 반영하고 종료")
+    args = parser.parse_args(argv)
+
+    # 인덱스를 직접 수정하므로 메모리 맵(읽기 전용) 로드는 사용하지 않습니다.
+    config = replace(tenant_config(args.tenant, RagConfig(embedding_provider=args.embedding_provider)),
+                     mmap_index=False)
+    engine = RagEngine(config)
+    raw_data_dir = args.raw_dir or tenant_raw_dir(args.tenant)
+    if not os.path.isdir(raw_data_dir):
+        raise SystemExit(f"❌ 입력 폴더가 없습니다: {raw_data_dir}")
+    try:
+        watch(engine, raw_data_dir, args.interval, args.debounce, args.once)
+    except KeyboardInterrupt:
+        print("\n👋 감시를 종료합니다.")
+
+
+if __name__ == "__main__":
+    main()